@@ -1,146 +1,323 @@
-import pymongo
-import psycopg2
+import sys
 import logging
-from datetime import datetime
-import os
-
-# Configure Logging
-LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# Generate timestamped log file
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-LOG_FILE = os.path.join(LOG_DIR, f"etl_mongo_2_pg_odds_{timestamp}.log")
-
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
-
-logging.info("Starting Odds ETL Process...")
-
-try:
-    # MongoDB Connection
-    mongo_client = pymongo.MongoClient("mongodb://localhost:27017/")
-    mongo_db = mongo_client["nfl-msf"]
-    odds_collection = mongo_db["odds"]
-
-    # PostgreSQL Connection
-    pg_conn = psycopg2.connect(
-        dbname="SAL-db",
-        user="postgres",
-        password="password",
-        host="localhost",
-        port="5432"
-    )
-    pg_cursor = pg_conn.cursor()
-
-    # Fetch all odds documents
-    odds_documents = odds_collection.find()
-
-    for odds_doc in odds_documents:
-        logging.info(f"Processing season {odds_doc['season']} - {odds_doc['season_type']} (Week {odds_doc['week']})")
-
-        for game_line in odds_doc.get("response", {}).get("gameLines", []):
-            game_id = game_line["game"]["id"]
-            logging.debug(f"Processing Game ID: {game_id}")
-
-            for line in game_line.get("lines", []):
-                source = line["source"]
-
-                # Check if book exists, insert if not
-                pg_cursor.execute("""SELECT id FROM "msf-nfl".books WHERE name = %s""", (source["name"],))
-                book_id = pg_cursor.fetchone()
-
-                if book_id is None:
-                    pg_cursor.execute("""
-                        INSERT INTO "msf-nfl".books (name, region, is_online, is_las_vegas)
-                        VALUES (%s, %s, %s, %s) RETURNING id
-                    """, (source["name"], source.get("region"), source["isOnlineSportsbook"], source["isLasVegas"]))
-                    book_id = pg_cursor.fetchone()[0]
-                    logging.debug(f"Inserted new book: {source['name']} (ID: {book_id})")
-                else:
-                    book_id = book_id[0]
-
-                # Process each wager type (moneyline, point spread, over/under)
-                wager_types = {
-                    "moneyLines": "moneyline",
-                    "pointSpreads": "point_spread",
-                    "overUnders": "over_under"
-                }
-
-                for wager_key, odds_type in wager_types.items():
-                    for wager in line.get(wager_key, []):
-                        as_of_time = wager["asOfTime"]
-                        game_segment = wager[wager_key[:-1]]["gameSegment"]  # Strip the plural "s"
-
-                        # Insert into game_odds
+import argparse
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+import metrics
+from etl_batches import SavepointBatch
+from odds_partitions import PartitionRouter
+from sal_config import connect_db, release_db, get_mongo_db, setup_logging
+
+
+# Wager arrays in an MSF line and the odds_type they load as
+WAGER_TYPES = {
+    "moneyLines": "moneyline",
+    "pointSpreads": "point_spread",
+    "overUnders": "over_under"
+}
+
+
+def ensure_columns(cursor):
+    """ last_seen_time: the latest asOfTime at which a stored quote was still being offered unchanged. """
+    cursor.execute('ALTER TABLE "msf-nfl".game_odds ADD COLUMN IF NOT EXISTS last_seen_time TIMESTAMPTZ;')
+
+
+def odds_rows(odds_type, odds_data):
+    """ (outcome_type, american, decimal, fractional, spread, over_under) for each priced outcome of a quote. """
+    if odds_type == "moneyline":
+        outcomes = [("away", odds_data["awayLine"], None, None),
+                    ("home", odds_data["homeLine"], None, None),
+                    ("draw", odds_data["drawLine"], None, None)]
+    elif odds_type == "point_spread":
+        outcomes = [("away", odds_data["awayLine"], odds_data["awaySpread"], None),
+                    ("home", odds_data["homeLine"], odds_data["homeSpread"], None)]
+    else:
+        outcomes = [("over", odds_data["overLine"], None, odds_data["overUnder"]),
+                    ("under", odds_data["underLine"], None, odds_data["overUnder"])]
+    return [(outcome, line_data["american"], line_data["decimal"], line_data["fractional"], spread, over_under)
+            for outcome, line_data, spread, over_under in outcomes if line_data["american"] is not None]
+
+
+def quote_signature(rows):
+    """ What makes two quotes the same price; decimal/fractional are derived from american. """
+    return tuple(sorted((outcome, american, spread, over_under) for outcome, american, _, _, spread, over_under in rows))
+
+
+def as_utc(value):
+    """ Aware UTC datetime from an MSF asOfTime string or a (possibly naive) Postgres timestamp. """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def load_latest_quotes(cursor):
+    """
+    The newest stored quote per (game, book, segment, odds_type), so a change-only run
+    continues the series already in Postgres instead of re-inserting its last price.
+    """
+    cursor.execute("""
+        SELECT DISTINCT ON (game_id, book_id, game_segment, odds_type)
+               id, game_id, book_id, game_segment, odds_type, as_of_time, COALESCE(last_seen_time, as_of_time)
+        FROM "msf-nfl".game_odds
+        ORDER BY game_id, book_id, game_segment, odds_type, as_of_time DESC;
+    """)
+    latest = {(game_id, book_id, segment, odds_type): {"id": id, "as_of_time": as_utc(as_of_time),
+                                                       "last_seen": as_utc(last_seen)}
+              for id, game_id, book_id, segment, odds_type, as_of_time, last_seen in cursor.fetchall()}
+    by_id = {quote["id"]: quote for quote in latest.values()}
+    cursor.execute("""
+        SELECT game_odds_id, outcome_type, odds_american, spread, over_under
+        FROM "msf-nfl".odds WHERE game_odds_id = ANY(%s);
+    """, (list(by_id),))
+    rows = {}
+    for game_odds_id, outcome, american, spread, over_under in cursor.fetchall():
+        rows.setdefault(game_odds_id, []).append((outcome, american, None, None,
+                                                  float(spread) if spread is not None else None,
+                                                  float(over_under) if over_under is not None else None))
+    for game_odds_id, quote in by_id.items():
+        quote["signature"] = quote_signature(rows.get(game_odds_id, []))
+        quote["pending"] = False
+    return latest
+
+
+def flush_last_seen(cursor, latest):
+    """ Write the extended last_seen_time of every quote that was repeated during the run. """
+    # Only stored quotes; a dead-lettered quote carries its repeats in its dead-letter payload
+    pending = [(quote["id"], quote["as_of_time"], quote["last_seen"]) for quote in latest.values()
+               if quote["pending"] and quote["id"] is not None]
+    if pending:
+        execute_values(cursor, """
+            UPDATE "msf-nfl".game_odds g SET last_seen_time = v.last_seen
+            FROM (VALUES %s) AS v (id, as_of_time, last_seen)
+            WHERE g.id = v.id AND g.as_of_time = v.as_of_time;
+        """, pending, template="(%s, %s::timestamptz, %s::timestamptz)")
+    for quote in latest.values():
+        quote["pending"] = False
+    return len(pending)
+
+
+def load_quote(cursor, quote):
+    """ Insert one quote into game_odds (its partition when quote["table"] names one) and its odds rows. """
+    cursor.execute(f"""
+        INSERT INTO {quote["table"]} (game_id, book_id, as_of_time, game_segment, odds_type, last_seen_time)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """, (quote["game_id"], quote["book_id"], quote["as_of_time"], quote["game_segment"], quote["odds_type"],
+          quote.get("last_seen_time")))
+    game_odds_id = cursor.fetchone()[0]
+    logging.debug(f"Inserted game_odds (Game ID: {quote['game_id']}, Type: {quote['odds_type']}, Book ID: {quote['book_id']})")
+
+    for outcome, american, decimal, fractional, spread, over_under in quote["rows"]:
+        cursor.execute("""
+            INSERT INTO "msf-nfl".odds (game_odds_id, outcome_type, odds_american, odds_decimal, odds_fractional, spread, over_under)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (game_odds_id, outcome, american, decimal, fractional, spread, over_under))
+        logging.debug(f"Inserted odds: {quote['odds_type']} {outcome} {american}")
+    return game_odds_id
+
+
+def load_batch(cursor, quotes):
+    """
+    Batch path of load_quote: one multi-row INSERT ... RETURNING id per target table, then
+    every odds row in one statement. Returns the game_odds ids in quote order.
+    """
+    ids = [None] * len(quotes)
+    by_table = {}
+    for position, quote in enumerate(quotes):
+        by_table.setdefault(quote["table"], []).append(position)
+    for table, positions in by_table.items():
+        # One page, so the returned ids line up with the VALUES rows
+        returned = execute_values(cursor, f"""
+            INSERT INTO {table} (game_id, book_id, as_of_time, game_segment, odds_type, last_seen_time)
+            VALUES %s RETURNING id
+        """, [(quotes[p]["game_id"], quotes[p]["book_id"], quotes[p]["as_of_time"], quotes[p]["game_segment"],
+               quotes[p]["odds_type"], quotes[p].get("last_seen_time")) for p in positions],
+            page_size=len(positions), fetch=True)
+        for position, (game_odds_id,) in zip(positions, returned):
+            ids[position] = game_odds_id
+
+    rows = [(game_odds_id, *row) for game_odds_id, quote in zip(ids, quotes) for row in quote["rows"]]
+    if rows:
+        execute_values(cursor, """
+            INSERT INTO "msf-nfl".odds (game_odds_id, outcome_type, odds_american, odds_decimal, odds_fractional, spread, over_under)
+            VALUES %s
+        """, rows, page_size=len(rows))
+    logging.debug(f"Inserted {len(quotes)} game_odds and {len(rows)} odds rows.")
+    return ids
+
+
+def replay_quote(cursor, quote):
+    """ Load a dead-lettered quote again; through the parent table, which routes it to its partition. """
+    load_quote(cursor, {**quote, "table": '"msf-nfl".game_odds'})
+
+
+def load_odds(changes_only=False):
+    """
+    Load every Mongo odds document into game_odds/odds. With changes_only a quote is stored
+    only when its prices differ from the previous quote for the same (game, book, segment,
+    odds_type); a repeat just moves that quote's last_seen_time forward. as_of_time stays the
+    first time a price was seen, so "latest as_of_time <= t" still gives the exact price at t.
+    Returns the quotes stored; raises after logging if the load fails, so callers see it.
+    """
+    logging.info(f"Starting Odds ETL Process ({'changes only' if changes_only else 'all quotes'})...")
+
+    try:
+        # MongoDB Connection (shared client)
+        mongo_db = get_mongo_db("nfl-msf")
+        odds_collection = mongo_db["odds"]
+
+        # PostgreSQL Connection (borrowed from the pool)
+        pg_conn = connect_db()
+        pg_cursor = pg_conn.cursor()
+
+        # Monthly partition each quote belongs in (plain game_odds before the migration)
+        router = PartitionRouter(pg_cursor)
+        ensure_columns(pg_cursor)
+        latest = load_latest_quotes(pg_cursor) if changes_only else {}
+
+        # Fetch all odds documents
+        odds_documents = odds_collection.find()
+        repeated = 0
+        odds_rows_loaded = []
+
+        def stored(entry, row_count):
+            def on_loaded(game_odds_id):
+                odds_rows_loaded.append(row_count)
+                if entry is not None:
+                    entry["id"] = game_odds_id
+                    entry["previous"] = None   # Stored for good; nothing falls back past it
+            return on_loaded
+
+        def dead_lettered(quote, key, entry):
+            def on_failed():
+                # Repeats already collapsed into the quote travel with it, so replay restores them
+                if entry["last_seen"] > entry["as_of_time"]:
+                    quote["last_seen_time"] = entry["last_seen"]
+                entry["dead"] = True
+                # Later quotes compare against the newest price that is really stored
+                if latest.get(key) is entry:
+                    previous = entry["previous"]
+                    while previous is not None and previous.get("dead"):
+                        previous = previous["previous"]
+                    if previous is None:
+                        del latest[key]
+                    else:
+                        latest[key] = previous
+            return on_failed
+
+        # Whole batches in bulk; a failing batch falls back to load_quote one quote at a time
+        batch = SavepointBatch(pg_cursor, "odds", load_quote, load_batch=load_batch)
+
+        for odds_doc in odds_documents:
+            logging.info(f"Processing season {odds_doc['season']} - {odds_doc['season_type']} (Week {odds_doc['week']})")
+
+            for game_line in odds_doc.get("response", {}).get("gameLines", []):
+                game_id = game_line["game"]["id"]
+                logging.debug(f"Processing Game ID: {game_id}")
+
+                for line in game_line.get("lines", []):
+                    source = line["source"]
+
+                    # Check if book exists, insert if not
+                    pg_cursor.execute("""SELECT id FROM "msf-nfl".books WHERE name = %s""", (source["name"],))
+                    book_id = pg_cursor.fetchone()
+
+                    if book_id is None:
                         pg_cursor.execute("""
-                            INSERT INTO "msf-nfl".game_odds (game_id, book_id, as_of_time, game_segment, odds_type)
-                            VALUES (%s, %s, %s, %s, %s)
-                            RETURNING id
-                        """, (game_id, book_id, as_of_time, game_segment, odds_type))
-                        game_odds_id = pg_cursor.fetchone()[0]
-                        logging.debug(f"Inserted game_odds (Game ID: {game_id}, Type: {odds_type}, Book ID: {book_id})")
-
-                        # Insert into odds table
-                        odds_data = wager[wager_key[:-1]]  # Get the correct odds object
-
-                        # Moneyline
-                        if odds_type == "moneyline":
-                            for outcome, line_data in [("away", odds_data["awayLine"]), 
-                                                       ("home", odds_data["homeLine"]), 
-                                                       ("draw", odds_data["drawLine"])]:
-                                if line_data["american"] is not None:
-                                    pg_cursor.execute("""
-                                        INSERT INTO "msf-nfl".odds (game_odds_id, outcome_type, odds_american, odds_decimal, odds_fractional)
-                                        VALUES (%s, %s, %s, %s, %s)
-                                    """, (game_odds_id, outcome, line_data["american"], 
-                                          line_data["decimal"], line_data["fractional"]))
-                                    logging.debug(f"Inserted odds: {odds_type} {outcome} {line_data['american']}")
-
-                        # Point Spread
-                        elif odds_type == "point_spread":
-                            for outcome, spread_value, line_data in [
-                                ("away", odds_data["awaySpread"], odds_data["awayLine"]),
-                                ("home", odds_data["homeSpread"], odds_data["homeLine"])]:
-                                if line_data["american"] is not None:
-                                    pg_cursor.execute("""
-                                        INSERT INTO "msf-nfl".odds (game_odds_id, outcome_type, odds_american, odds_decimal, odds_fractional, spread)
-                                        VALUES (%s, %s, %s, %s, %s, %s)
-                                    """, (game_odds_id, outcome, line_data["american"], 
-                                          line_data["decimal"], line_data["fractional"], spread_value))
-                                    logging.debug(f"Inserted odds: {odds_type} {outcome} {line_data['american']}")
-
-                        # Over/Under
-                        elif odds_type == "over_under":
-                            for outcome, line_data in [
-                                ("over", odds_data["overLine"]),
-                                ("under", odds_data["underLine"])]:
-                                if line_data["american"] is not None:
-                                    pg_cursor.execute("""
-                                        INSERT INTO "msf-nfl".odds (game_odds_id, outcome_type, odds_american, odds_decimal, odds_fractional, over_under)
-                                        VALUES (%s, %s, %s, %s, %s, %s)
-                                    """, (game_odds_id, outcome, line_data["american"], 
-                                          line_data["decimal"], line_data["fractional"], odds_data["overUnder"]))
-                                    logging.debug(f"Inserted odds: {odds_type} {outcome} {line_data['american']}")
-
-    # Commit transactions
-    pg_conn.commit()
-    logging.info("ETL Process for Odds Complete!")
-
-except Exception as e:
-    logging.critical("Critical error in Odds ETL process", exc_info=True)
-
-finally:
+                            INSERT INTO "msf-nfl".books (name, region, is_online, is_las_vegas)
+                            VALUES (%s, %s, %s, %s) RETURNING id
+                        """, (source["name"], source.get("region"), source["isOnlineSportsbook"], source["isLasVegas"]))
+                        book_id = pg_cursor.fetchone()[0]
+                        logging.debug(f"Inserted new book: {source['name']} (ID: {book_id})")
+                    else:
+                        book_id = book_id[0]
+
+                    # Process each wager type (moneyline, point spread, over/under)
+                    for wager_key, odds_type in WAGER_TYPES.items():
+                        wagers = line.get(wager_key, [])
+                        if changes_only:
+                            # Comparing with the previous quote needs them in time order
+                            wagers = sorted(wagers, key=lambda wager: wager["asOfTime"])
+
+                        for wager in wagers:
+                            as_of_time = wager["asOfTime"]
+                            odds_data = wager[wager_key[:-1]]  # Strip the plural "s"
+                            game_segment = odds_data["gameSegment"]
+                            rows = odds_rows(odds_type, odds_data)
+
+                            if changes_only:
+                                key = (game_id, book_id, game_segment, odds_type)
+                                previous = latest.get(key)
+                                quoted_at = as_utc(as_of_time)
+                                if previous and quoted_at <= previous["last_seen"]:
+                                    continue  # Already covered by a stored quote
+                                signature = quote_signature(rows)
+                                if previous and signature == previous["signature"]:
+                                    previous["last_seen"] = quoted_at
+                                    previous["pending"] = True
+                                    repeated += 1
+                                    continue
+
+                            # Partition picked (and created) here, outside the batch savepoint
+                            quote = {"table": router.table_for(as_of_time), "game_id": game_id, "book_id": book_id,
+                                     "as_of_time": as_of_time, "game_segment": game_segment,
+                                     "odds_type": odds_type, "rows": rows}
+                            entry = on_failed = None
+                            if changes_only:
+                                # id is filled in once the quote's batch is stored
+                                entry = latest[key] = {"id": None, "as_of_time": quoted_at, "last_seen": quoted_at,
+                                                       "signature": signature, "pending": False,
+                                                       "previous": previous}
+                                on_failed = dead_lettered(quote, key, entry)
+                            source_ref = {"odds_doc": str(odds_doc.get("_id")), "season": odds_doc["season"],
+                                          "week": odds_doc["week"], "game_id": game_id, "book": source["name"],
+                                          "odds_type": odds_type, "game_segment": game_segment, "as_of_time": as_of_time}
+                            batch.add(quote, source_ref, on_loaded=stored(entry, len(rows)), on_failed=on_failed)
+
+        batch.flush()
+        if batch.dead:
+            logging.warning(f"{batch.dead} quotes went to the dead-letter table; replay with: python etl_batches.py replay odds")
+
+        if changes_only:
+            extended = flush_last_seen(pg_cursor, latest)
+            logging.info(f"Skipped {repeated} unchanged quotes; extended last_seen_time on {extended} stored quotes.")
+            metrics.inc("etl_unchanged_quotes_total", repeated, table="game_odds")
+
+        # Commit transactions
+        with metrics.timer("postgres_commit_seconds", etl="odds"):
+            pg_conn.commit()
+        metrics.inc("etl_rows_total", batch.loaded, table="game_odds")
+        metrics.inc("etl_rows_total", sum(odds_rows_loaded), table="odds")
+        logging.info("ETL Process for Odds Complete!")
+        return batch.loaded
+
+    except Exception:
+        logging.critical("Critical error in Odds ETL process", exc_info=True)
+        raise
+
+    finally:
+        try:
+            if 'pg_cursor' in locals():
+                pg_cursor.close()
+            if 'pg_conn' in locals():
+                release_db(pg_conn)
+            logging.info("Database connections closed.")
+        except Exception as e:
+            logging.warning(f"Error closing connections: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load MSF odds from Mongo into msf-nfl game_odds/odds.")
+    parser.add_argument("--changes-only", action="store_true",
+                        help="Store a quote only when its prices changed; repeats extend last_seen_time")
+    args = parser.parse_args()
+
+    setup_logging("etl_mongo_2_pg_odds", logging.DEBUG)
     try:
-        if 'pg_cursor' in locals():
-            pg_cursor.close()
-        if 'pg_conn' in locals():
-            pg_conn.close()
-        if 'mongo_client' in locals():
-            mongo_client.close()
-        logging.info("Database connections closed.")
-    except Exception as e:
-        logging.warning(f"Error closing connections: {e}")
+        load_odds(args.changes_only)
+    except Exception:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import io
+import csv
+import sys
+import logging
+import argparse
+import pymongo
+import psycopg2
+import metrics
+from etl_batches import SavepointBatch
+from sal_config import connect_db, release_db, get_mongo_db, setup_logging
+
+
+# MongoDB Configuration
+DATABASE_NAME = "nfl-msf"
+PBP_COLLECTION = "pbp"
+
+# Load Configuration
+COPY_BATCH_ROWS = 50000   # Buffered rows per COPY; batches always end on a game boundary
+
+# Play sub-objects; whichever one a play carries is its play type
+PLAY_TYPES = ["rush", "pass", "sack", "kick", "punt", "fieldGoalAttempt", "extraPointAttempt", "penalty"]
+
+PLAY_COLUMNS = [
+    "game_id", "game_key", "play_index", "quarter", "seconds_elapsed", "game_seconds",
+    "down", "yards_to_go", "los_team", "los_yard_line", "possession_team_id", "possession_team",
+    "play_type", "offense_team_id", "yards_gained", "kick_yards", "return_yards", "penalty_yards",
+    "is_no_play", "is_completed", "is_touchdown", "is_good", "is_safety",
+    "passer_id", "receiver_id", "rusher_id", "kicker_id", "returner_id", "interceptor_id",
+    "tackler_ids", "penalty_count", "description",
+]
+
+
+def ensure_tables(cursor):
+    """ Create the plays fact table and its per-game load state if they do not exist yet. """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS "msf-nfl".plays (
+            game_id INTEGER NOT NULL,
+            game_key TEXT NOT NULL,
+            play_index INTEGER NOT NULL,
+            quarter SMALLINT,
+            seconds_elapsed SMALLINT,
+            game_seconds INTEGER,
+            down SMALLINT,
+            yards_to_go SMALLINT,
+            los_team TEXT,
+            los_yard_line SMALLINT,
+            possession_team_id INTEGER,
+            possession_team TEXT,
+            play_type TEXT NOT NULL,
+            offense_team_id INTEGER,
+            yards_gained SMALLINT,
+            kick_yards SMALLINT,
+            return_yards SMALLINT,
+            penalty_yards SMALLINT,
+            is_no_play BOOLEAN,
+            is_completed BOOLEAN,
+            is_touchdown BOOLEAN,
+            is_good BOOLEAN,
+            is_safety BOOLEAN,
+            passer_id INTEGER,
+            receiver_id INTEGER,
+            rusher_id INTEGER,
+            kicker_id INTEGER,
+            returner_id INTEGER,
+            interceptor_id INTEGER,
+            tackler_ids INTEGER[],
+            penalty_count SMALLINT NOT NULL DEFAULT 0,
+            description TEXT,
+            PRIMARY KEY (game_id, play_index)
+        );
+    """)
+    cursor.execute('CREATE INDEX IF NOT EXISTS plays_play_type_idx ON "msf-nfl".plays (play_type);')
+    cursor.execute('CREATE INDEX IF NOT EXISTS plays_possession_idx ON "msf-nfl".plays (possession_team_id);')
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS "msf-nfl".plays_loaded (
+            game_id INTEGER PRIMARY KEY,
+            game_key TEXT NOT NULL,
+            last_updated_on TEXT,
+            play_count INTEGER NOT NULL,
+            loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def player_id(player):
+    return player.get("id") if player else None
+
+
+def play_type_of(play):
+    for key in PLAY_TYPES:
+        if play.get(key):
+            return key, play[key]
+    return "other", {}
+
+
+def flatten_play(game_id, game_key, play_index, play):
+    """ Flatten one MSF play into a row ordered like PLAY_COLUMNS. """
+    status = play.get("playStatus") or {}
+    possession = status.get("teamInPossession") or {}
+    scrimmage = status.get("lineOfScrimmage") or {}
+    quarter = status.get("quarter")
+    seconds_elapsed = status.get("secondsElapsed")
+    game_seconds = (quarter - 1) * 900 + seconds_elapsed if quarter and seconds_elapsed is not None else None
+
+    play_type, detail = play_type_of(play)
+    offense = detail.get("team") or detail.get("kickingTeam") or {}
+
+    yards_gained = None
+    if play_type == "rush":
+        yards_gained = detail.get("yardsRushed")
+    elif play_type == "pass":
+        yards_gained = detail.get("totalYardsGained")
+    elif play_type == "sack":
+        yards_gained = -detail["yardsLost"] if detail.get("yardsLost") is not None else None
+
+    # Penalties are {"penalty": {...}} wrappers; a penalty-only play is one such wrapper itself
+    penalties = [detail] if play_type == "penalty" else detail.get("penalties") or []
+    penalty_yards = sum((p.get("penalty") or {}).get("yardsPenalized") or 0 for p in penalties) if penalties else None
+
+    tacklers = [player_id(detail.get(key)) for key in
+                ("soloTacklingPlayer", "assistedTacklingPlayer1", "assistedTacklingPlayer2") if detail.get(key)]
+
+    return [
+        game_id, game_key, play_index, quarter, seconds_elapsed, game_seconds,
+        status.get("currentDown"), status.get("yardsRemaining"),
+        (scrimmage.get("team") or {}).get("abbreviation"), scrimmage.get("yardLine"),
+        possession.get("id"), possession.get("abbreviation"),
+        play_type, offense.get("id"), yards_gained,
+        detail.get("yardsKicked"), detail.get("yardsReturned"), penalty_yards,
+        detail.get("isNoPlay"), detail.get("isCompleted"),
+        detail.get("isEndedWithTouchdown", detail.get("isTouchdown")),
+        detail.get("isGood"), detail.get("isSafety"),
+        player_id(detail.get("passingPlayer")), player_id(detail.get("receivingPlayer")),
+        player_id(detail.get("rushingPlayer")), player_id(detail.get("kickingPlayer")),
+        player_id(detail.get("retrievingPlayer")), player_id(detail.get("interceptingPlayer")),
+        "{" + ",".join(str(t) for t in tacklers) + "}" if tacklers else None,
+        len(penalties), play.get("description"),
+    ]
+
+
+def flatten_game(doc):
+    """ Return (game_id, game_key, last_updated_on, rows) for one pbp document. """
+    response = doc.get("response", {})
+    game_id = response.get("game", {}).get("id")
+    game_key = doc.get("game_id")
+    rows = [flatten_play(game_id, game_key, index, play) for index, play in enumerate(response.get("plays", []))]
+    return game_id, game_key, response.get("lastUpdatedOn"), rows
+
+
+def copy_rows(cursor, rows):
+    """ Stream buffered rows into the plays table with one COPY. """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f'COPY "msf-nfl".plays ({", ".join(PLAY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def load_games(cursor, games, replace):
+    """ Clear re-loaded games, COPY their plays in one stream, record load state. """
+    rows = [row for game in games for row in game["rows"]]
+    if replace:
+        cursor.execute('DELETE FROM "msf-nfl".plays WHERE game_id = ANY(%s);', ([g["game_id"] for g in games],))
+    with metrics.timer("etl_copy_seconds", table="plays"):
+        copy_rows(cursor, rows)
+    cursor.executemany("""
+        INSERT INTO "msf-nfl".plays_loaded (game_id, game_key, last_updated_on, play_count, loaded_at)
+        VALUES (%s, %s, %s, %s, now())
+        ON CONFLICT (game_id) DO UPDATE
+        SET game_key = EXCLUDED.game_key, last_updated_on = EXCLUDED.last_updated_on,
+            play_count = EXCLUDED.play_count, loaded_at = now();
+    """, [(g["game_id"], g["game_key"], g["last_updated_on"], len(g["rows"])) for g in games])
+
+
+def flush(conn, batch, loaded_rows):
+    """ Load one batch in its own transaction; a failing COPY falls back to game-by-game loads. """
+    games = len(batch.pending)
+    if not games:
+        return 0
+    before = sum(loaded_rows)
+    batch.flush()
+    conn.commit()
+    rows = sum(loaded_rows) - before
+    metrics.inc("etl_rows_total", rows, table="plays")
+    logging.info(f"Loaded {rows} plays for {games} games.")
+    return rows
+
+
+def replay_game(cursor, ref):
+    """ Reload a dead-lettered game from its pbp document (see etl_batches.replay_dead_letters). """
+    doc = get_mongo_db(DATABASE_NAME)[PBP_COLLECTION].find_one({"game_id": ref["game_key"]}, {"game_id": 1, "response": 1})
+    if doc is None:
+        raise LookupError(f"pbp document {ref['game_key']} no longer exists")
+    game_id, game_key, last_updated_on, rows = flatten_game(doc)
+    load_games(cursor, [{"game_id": game_id, "game_key": game_key, "last_updated_on": last_updated_on, "rows": rows}],
+               replace=True)
+
+
+def load_plays(full=False, game_keys=None, batch_rows=COPY_BATCH_ROWS):
+    """
+    Flatten MSF play-by-play documents into "msf-nfl".plays.
+    A full run truncates and reloads everything; otherwise only games that are new or whose
+    lastUpdatedOn changed are (re)loaded. game_keys limits the run to specific pbp game_ids.
+    """
+    pbp_collection = get_mongo_db(DATABASE_NAME)[PBP_COLLECTION]
+    conn = connect_db()
+    cursor = conn.cursor()
+    ensure_tables(cursor)
+
+    if full:
+        cursor.execute('TRUNCATE "msf-nfl".plays, "msf-nfl".plays_loaded;')
+        loaded = {}
+    else:
+        cursor.execute('SELECT game_key, last_updated_on FROM "msf-nfl".plays_loaded;')
+        loaded = dict(cursor.fetchall())
+    conn.commit()
+
+    query = {"game_id": {"$in": game_keys}} if game_keys else {}
+    candidates = [doc["game_id"] for doc in pbp_collection.find(query, {"game_id": 1, "response.lastUpdatedOn": 1})
+                  if full or game_keys or loaded.get(doc["game_id"], "") != doc.get("response", {}).get("lastUpdatedOn")]
+    logging.info(f"{len(candidates)} pbp documents to load ({'full' if full else 'incremental'}).")
+
+    # Bulk COPY per batch under a savepoint; a game whose plays fail to load is dead-lettered by
+    # reference (its rows are re-read from Mongo on replay) and the rest of the batch still loads
+    replace = not full
+    batch = SavepointBatch(cursor, "pbp", lambda cursor, game: load_games(cursor, [game], replace), batch_size=None,
+                           load_batch=lambda cursor, games: load_games(cursor, games, replace),
+                           to_payload=lambda game: {"game_id": game["game_id"], "game_key": game["game_key"]})
+    conn.commit()
+
+    buffered, total, loaded_rows = 0, 0, []
+    for doc in pbp_collection.find({"game_id": {"$in": candidates}}, {"game_id": 1, "response": 1}):
+        with metrics.timer("etl_transform_seconds", table="plays"):
+            game_id, game_key, last_updated_on, game_rows = flatten_game(doc)
+        if game_id is None:
+            logging.warning(f"Skipping pbp document {game_key}: no MSF game id.")
+            continue
+        game = {"game_id": game_id, "game_key": game_key, "last_updated_on": last_updated_on, "rows": game_rows}
+        batch.add(game, {"pbp": game_key, "game_id": game_id},
+                  on_loaded=lambda _, count=len(game_rows): loaded_rows.append(count))
+        buffered += len(game_rows)
+        if buffered >= batch_rows:
+            total += flush(conn, batch, loaded_rows)
+            buffered = 0
+    total += flush(conn, batch, loaded_rows)
+    if batch.dead:
+        logging.warning(f"{batch.dead} games went to the dead-letter table; replay with: python etl_batches.py replay pbp")
+
+    cursor.close()
+    release_db(conn)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load MSF play-by-play from Mongo into the msf-nfl.plays table.")
+    parser.add_argument("--full", action="store_true", help="Truncate and backfill every game")
+    parser.add_argument("--game", action="append", help="pbp game_id to (re)load, e.g. 20240905-BAL-KC (repeatable)")
+    parser.add_argument("--batch-rows", type=int, default=COPY_BATCH_ROWS)
+    args = parser.parse_args()
+
+    setup_logging("etl_mongo_2_pg_pbp")
+
+    try:
+        total = load_plays(args.full, args.game, args.batch_rows)
+    except (psycopg2.Error, pymongo.errors.PyMongoError):
+        logging.critical("Critical error in PBP ETL process", exc_info=True)
+        sys.exit(1)
+    print(f"Loaded {total} plays.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue as queue_module
+import logging
+import argparse
+import statistics
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from sal_config import (connect_db, release_db, get_mongo_db, mongo_endpoints, override_settings, same_instance,
+                        setting, setup_logging)
+from synthetic_data import BENCH_DATABASE
+
+BENCH_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "benchmarks")
+RESULTS_FILE = os.path.join(BENCH_DIR, "results.jsonl")
+
+# Dataset sizes passed to synthetic_data.generate_dataset
+SCALES = {
+    "small": {"weeks": 2, "games_per_week": 8, "quotes_per_book": 12, "pbp_games": 8},
+    "season": {"weeks": 18, "games_per_week": 16, "quotes_per_book": 24, "pbp_games": 64},
+    "large": {"weeks": 18, "games_per_week": 16, "quotes_per_book": 96, "pbp_games": 288},
+}
+
+QUERY_REPEATS = 5
+
+# Emptied before a run so every run loads into the same starting state
+RESET_TABLES = [
+    '"msf-nfl".plays', '"msf-nfl".plays_loaded', '"msf-nfl".odds', '"msf-nfl".game_odds',
+    '"msf-nfl".games', '"msf-nfl".seasons', '"SAL-schema".odds', '"SAL-schema".events',
+]
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process; None where the resource module is unavailable (Windows). """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def count_rows(*tables):
+    conn = connect_db()
+    try:
+        with conn.cursor() as cursor:
+            total = 0
+            for table in tables:
+                cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (table,))
+                if cursor.fetchone()[0]:
+                    cursor.execute(f"SELECT count(*) FROM {table};")
+                    total += cursor.fetchone()[0]
+            return total
+    finally:
+        release_db(conn)
+
+
+def reset_tables():
+    conn = connect_db()
+    with conn.cursor() as cursor:
+        for table in RESET_TABLES:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (table,))
+            if cursor.fetchone()[0]:
+                cursor.execute(f"TRUNCATE {table} CASCADE;")
+    conn.commit()
+    release_db(conn)
+
+
+# ----------------------------------------------------------------- Cases
+
+def run_process_json(context):
+    from process_json import process_saved_json
+    setup_logging("process_json")
+    for path in context["odds_api_files"]:
+        process_saved_json(path)
+
+
+def run_season_etl(context):
+    from ETL_season_2_postgres import load_seasons
+    setup_logging("etl_mongo_2_pg_season")
+    load_seasons()
+
+
+def run_odds_etl(context):
+    from ETL_odds_2_postgres import load_odds
+    setup_logging("etl_mongo_2_pg_odds")
+    load_odds()
+
+
+def run_pbp_etl(context):
+    from ETL_pbp_2_postgres import load_plays
+    setup_logging("etl_mongo_2_pg_pbp")
+    load_plays(full=True)
+
+
+def run_opening_lines(context):
+    from opening_lines import DATABASE_NAME, refresh_opening_lines
+    setup_logging("opening_lines")
+    refresh_opening_lines(get_mongo_db(DATABASE_NAME), force=True)
+
+
+def timed(repeats, query, *args):
+    """ Wall-clock milliseconds of each call; the last result is returned for follow-up queries. """
+    samples, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = query(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"min": round(min(samples), 2), "p50": round(statistics.median(samples), 2),
+            "max": round(max(samples), 2)}, result
+
+
+def run_queries(context):
+    """ The analysis queries the scripts issue, each repeated QUERY_REPEATS times. """
+    from compute_LLE_HTest import MONEYLINE_TO_TEST, opening_odds_query, closing_odds_query
+    from book_lead_lag import fetch_price_series
+    from game_results_index import build_from_postgres
+    from opening_lines import DATABASE_NAME, find_opening_moneylines
+    from data_completeness import expected_msf_games
+
+    def fetch(sql, params):
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    latencies = {}
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        latencies["lle_opening"], open_lines = timed(QUERY_REPEATS, fetch, opening_odds_query,
+                                                     (MONEYLINE_TO_TEST, MONEYLINE_TO_TEST))
+        keys = ([row[0] for row in open_lines], [row[1] for row in open_lines], [row[3] for row in open_lines])
+        latencies["lle_closing"], _ = timed(QUERY_REPEATS, fetch, closing_odds_query, keys)
+        latencies["lead_lag_series"], _ = timed(QUERY_REPEATS, fetch_price_series, cursor,
+                                                context["seasons"][0], "regular", "moneyline")
+        latencies["game_results"], _ = timed(QUERY_REPEATS, build_from_postgres, cursor)
+    finally:
+        cursor.close()
+        release_db(conn)
+
+    db = get_mongo_db(DATABASE_NAME)
+    latencies["opening_moneylines"], _ = timed(QUERY_REPEATS, find_opening_moneylines, db, MONEYLINE_TO_TEST)
+    latencies["expected_games"], _ = timed(QUERY_REPEATS, expected_msf_games, db, context["seasons"],
+                                           datetime.now(timezone.utc))
+    return latencies
+
+
+# Run in this order; "rows" counts what the case loaded and is evaluated after the timer stops.
+# "expected" is the row count the dataset should produce (synthetic_data.dataset_counts); a case
+# that falls short, e.g. a load that logged an error or dead-lettered rows, is not "ok".
+CASES = {
+    "process_json": {"run": run_process_json, "rows": lambda: count_rows('"SAL-schema".odds'),
+                     "expected": lambda counts: counts["odds_api_outcomes"]},
+    "season_etl": {"run": run_season_etl, "rows": lambda: count_rows('"msf-nfl".games'),
+                   "expected": lambda counts: counts["games"]},
+    "odds_etl": {"run": run_odds_etl, "rows": lambda: count_rows('"msf-nfl".game_odds', '"msf-nfl".odds'),
+                 "expected": lambda counts: counts["game_odds"] + counts["odds"]},
+    "pbp_etl": {"run": run_pbp_etl, "rows": lambda: count_rows('"msf-nfl".plays'),
+                "expected": lambda counts: counts["plays"]},
+    "opening_lines": {"run": run_opening_lines, "rows": lambda: get_mongo_db("nfl-msf")["opening_lines"].count_documents({}),
+                      "expected": None},
+    "queries": {"run": run_queries, "rows": None, "expected": None},
+}
+
+
+def _case_worker(name, overrides, context, queue):
+    """ Runs in a fresh process so peak RSS belongs to this case alone. """
+    override_settings(**overrides)
+    case = CASES[name]
+    result = {"case": name}
+    try:
+        started = time.perf_counter()
+        latencies = case["run"](context)
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        result["peak_rss_mb"] = peak_rss_mb()
+        if case["rows"] is not None:
+            result["rows"] = case["rows"]()
+            result["rows_per_sec"] = round(result["rows"] / result["seconds"], 1) if result["seconds"] else None
+        if latencies:
+            result["latency_ms"] = latencies
+        expected = case["expected"](context["counts"]) if case["expected"] else None
+        if expected is not None and result["rows"] < expected:
+            # A partial load's throughput is not comparable; keep it out of results and compare_latest
+            result.pop("rows_per_sec", None)
+            result.update({"status": "incomplete", "error": f"loaded {result['rows']} of {expected} rows"})
+        else:
+            result["status"] = "ok"
+    except BaseException as e:
+        result.update({"status": "error", "error": f"{type(e).__name__}: {e}", "peak_rss_mb": peak_rss_mb()})
+    queue.put(result)
+
+
+def run_case(name, overrides, context):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_case_worker, args=(name, overrides, context, queue))
+    process.start()
+    while True:
+        try:
+            result = queue.get(timeout=5)
+            break
+        except queue_module.Empty:
+            if not process.is_alive():
+                result = {"case": name, "status": "error", "error": f"worker exited with code {process.exitcode}"}
+                break
+    process.join()
+    return result
+
+
+# --------------------------------------------------------------- Results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def append_results(records, path=RESULTS_FILE):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_results(path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_latest(path=RESULTS_FILE):
+    """ Latest run against the previous run at the same scale, per case. """
+    records = load_results(path)
+    if not records:
+        return []
+    latest = records[-1]
+    runs = [r["run_id"] for r in records if r["scale"] == latest["scale"]]
+    previous_ids = [run_id for run_id in dict.fromkeys(runs) if run_id != latest["run_id"]]
+    if not previous_ids:
+        return []
+    previous = {r["case"]: r for r in records if r["run_id"] == previous_ids[-1]}
+    rows = []
+    for record in (r for r in records if r["run_id"] == latest["run_id"]):
+        before = previous.get(record["case"])
+        if not before or record["status"] != "ok" or before["status"] != "ok":
+            continue
+        if record.get("rows_per_sec") and before.get("rows_per_sec"):
+            rows.append((record["case"], "rows/sec", before["rows_per_sec"], record["rows_per_sec"]))
+        for query, latency in record.get("latency_ms", {}).items():
+            if query in before.get("latency_ms", {}):
+                rows.append((f"{record['case']}.{query}", "p50 ms", before["latency_ms"][query]["p50"], latency["p50"]))
+    return rows
+
+
+def run_benchmark(scale, overrides, cases=None, seed=2024, seasons=(2024,)):
+    """ Generate the dataset, load it into the scratch stores and run each case in its own process. """
+    from synthetic_data import generate_dataset, dataset_counts, load_into_mongo, write_files
+
+    dataset = generate_dataset(list(seasons), seed=seed, **SCALES[scale])
+    counts = dataset_counts(dataset)
+    files = write_files(dataset, os.path.join(BENCH_DIR, "dataset"))
+    load_into_mongo(dataset, overrides.get("MSF_MONGO_DB", BENCH_DATABASE))
+    reset_tables()
+    context = {"seasons": list(seasons), "odds_api_files": files["odds_api"], "counts": counts}
+
+    run_id = uuid.uuid4().hex[:12]
+    base = {"run_id": run_id, "recorded_at": datetime.now(timezone.utc).isoformat(), "commit": git_commit(),
+            "scale": scale, "seed": seed, "dataset": counts}
+    records = []
+    for name in cases or CASES:
+        logging.info(f"Running benchmark case {name} ({scale})")
+        result = run_case(name, overrides, context)
+        logging.info(f"{name}: {result}")
+        records.append({**base, **result})
+    append_results(records)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ETL throughput and query latency benchmarks on synthetic data.")
+    parser.add_argument("--mongo-uri", required=True, help="Scratch Mongo instance, not the configured one")
+    parser.add_argument("--mongo-db", default=BENCH_DATABASE,
+                        help="Database on it whose seasons/odds/pbp collections are replaced (never nfl-msf)")
+    parser.add_argument("--postgres-host", required=True, help="Scratch Postgres server, not the configured one")
+    parser.add_argument("--postgres-port", default="5432")
+    parser.add_argument("--postgres-db", required=True, help="Scratch Postgres database with the SAL and msf-nfl schemas")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--cases", nargs="+", choices=CASES, help="Subset of cases (default all, in order)")
+    parser.add_argument("--seed", type=int, default=2024)
+    args = parser.parse_args()
+
+    # Compared by resolved address, so localhost / 127.0.0.1 / a missing trailing slash cannot slip through
+    if args.mongo_db == "nfl-msf":
+        parser.error("Refusing to replace collections in nfl-msf; pick a scratch --mongo-db.")
+    if same_instance(mongo_endpoints(args.mongo_uri), mongo_endpoints(setting("MONGO_URI"))):
+        parser.error("Refusing to benchmark against the configured Mongo instance; point at a scratch one.")
+    if same_instance([(args.postgres_host, args.postgres_port)], [(setting("POSTGRES_HOST"), setting("POSTGRES_PORT"))]):
+        parser.error("Refusing to benchmark against the configured Postgres server; its tables would be truncated.")
+
+    setup_logging("benchmark")
+    overrides = {"MONGO_URI": args.mongo_uri, "MSF_MONGO_DB": args.mongo_db, "POSTGRES_HOST": args.postgres_host,
+                 "POSTGRES_PORT": args.postgres_port, "POSTGRES_DB": args.postgres_db}
+    override_settings(**overrides)
+
+    for record in run_benchmark(args.scale, overrides, args.cases, args.seed):
+        detail = f"{record.get('rows_per_sec')} rows/s" if record.get("rows_per_sec") is not None else ""
+        if record.get("latency_ms"):
+            detail = ", ".join(f"{q} {v['p50']}ms" for q, v in record["latency_ms"].items())
+        print(f"{record['case']:>14}: {record['status']:<5} {record.get('seconds', '-')}s "
+              f"rss {record.get('peak_rss_mb')}MB  {detail or record.get('error', '')}")
+
+    for case, metric, before, after in compare_latest():
+        print(f"{case:>32} {metric}: {before} -> {after} ({(after - before) / before:+.1%})")
+    print(f"Results appended to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import sys
+import logging
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import psycopg2
+import metrics
+from export_data import export_data
+from sal_config import connect_db, release_db, setup_logging
+
+
+# Analysis Configuration
+GRID_MINUTES = 15        # Resampling step for every book's price series
+MAX_LAG = 4              # Lags (in grid steps) tested for cross-correlation and Granger scores
+MIN_GRID_POINTS = 12     # Games with fewer grid points than this are skipped
+ODDS_TYPES = ["moneyline", "point_spread", "over_under"]
+
+
+def fetch_books(cursor):
+    """ Return book metadata keyed by id. """
+    cursor.execute('SELECT id, name, region, is_online, is_las_vegas FROM "msf-nfl".books;')
+    return {row[0]: {"name": row[1], "region": row[2], "is_online": row[3], "is_las_vegas": row[4]}
+            for row in cursor.fetchall()}
+
+
+def fetch_price_series(cursor, season_year, season_type, odds_type):
+    """
+    Fetch every canonical-side FULL game quote for one season and market, grouped per game
+    as (book_ids, epoch_seconds, values) arrays. Values rise when the market moves toward
+    home (moneyline, spread) or toward the over (totals).
+    """
+    value_expr = {
+        "moneyline": "CASE WHEN o.odds_american < 0 THEN -o.odds_american / (100.0 - o.odds_american) "
+                     "ELSE 100.0 / (o.odds_american + 100.0) END",
+        "point_spread": "-o.spread",
+        "over_under": "o.over_under",
+    }[odds_type]
+    outcome = "over" if odds_type == "over_under" else "home"
+
+    cursor.execute(f"""
+        SELECT go.game_id, go.book_id, EXTRACT(EPOCH FROM go.as_of_time)::float8, ({value_expr})::float8
+        FROM "msf-nfl".game_odds go
+        JOIN "msf-nfl".odds o ON o.game_odds_id = go.id
+        JOIN "msf-nfl".games g ON g.id = go.game_id
+        JOIN "msf-nfl".seasons s ON s.id = g.season_id
+        WHERE s.year = %s AND s.season_type = %s
+          AND go.odds_type = %s AND go.game_segment = 'FULL'
+          AND o.outcome_type = %s
+        ORDER BY go.game_id, go.book_id, go.as_of_time;
+    """, (season_year, season_type, odds_type, outcome))
+    rows = cursor.fetchall()
+    if not rows:
+        return {}
+
+    data = np.array(rows, dtype=np.float64)
+    game_ids = data[:, 0].astype(np.int64)
+    splits = np.flatnonzero(np.diff(game_ids)) + 1
+    series = {}
+    for chunk in np.split(data, splits):
+        series[int(chunk[0, 0])] = (chunk[:, 1].astype(np.int64), chunk[:, 2], chunk[:, 3])
+    return series
+
+
+def resample_to_grid(book_ids, times, values, grid_seconds):
+    """
+    Forward-fill each book's quotes onto a shared time grid.
+    Returns (books, matrix) where matrix is books x grid points, NaN before a book's first quote.
+    """
+    grid = np.arange(times.min(), times.max() + grid_seconds, grid_seconds)
+    books = np.unique(book_ids)
+    matrix = np.full((len(books), len(grid)), np.nan)
+    for row, book in enumerate(books):
+        mask = book_ids == book
+        book_times = times[mask]
+        idx = np.searchsorted(book_times, grid, side="right") - 1
+        valid = idx >= 0
+        matrix[row, valid] = values[mask][idx[valid]]
+    return books, matrix
+
+
+def standardize(changes):
+    """ Zero-mean, unit-variance rows with missing changes set to zero. """
+    mean = np.nanmean(changes, axis=1, keepdims=True)
+    std = np.nanstd(changes, axis=1, keepdims=True)
+    std[std == 0] = np.nan
+    z = (changes - mean) / std
+    return np.nan_to_num(z)
+
+
+def lagged_cross_correlation(z, max_lag):
+    """
+    corr[k-1, i, j] is the correlation of book i's change at t with book j's change at t + k.
+    A positive (corr - corr.T) means i tends to move before j.
+    """
+    n = z.shape[1]
+    corr = np.zeros((max_lag, z.shape[0], z.shape[0]))
+    for k in range(1, max_lag + 1):
+        corr[k - 1] = z[:, :-k] @ z[:, k:].T / (n - k)
+    return corr
+
+
+def granger_f_scores(changes, max_lag):
+    """
+    f[i, j] is the F statistic for "book i's lagged changes help predict book j's change"
+    beyond book j's own lags, solved for every pair at once with batched normal equations.
+    """
+    x = np.nan_to_num(changes)
+    n_books, n = x.shape
+    rows = n - max_lag
+    if rows <= 2 * max_lag + 2:
+        return np.zeros((n_books, n_books))
+
+    # lags[b, t, k] = x[b, t + max_lag - k - 1]
+    lags = np.stack([x[:, max_lag - k - 1:n - k - 1] for k in range(max_lag)], axis=2)
+    target = x[:, max_lag:]
+    ones = np.ones((n_books, rows, 1))
+
+    def rss(design, y):
+        xtx = design.transpose(0, 2, 1) @ design
+        xtx += np.eye(design.shape[2]) * 1e-9
+        beta = np.linalg.solve(xtx, design.transpose(0, 2, 1) @ y[..., None])
+        resid = y - (design @ beta)[..., 0]
+        return (resid ** 2).sum(axis=1)
+
+    # Restricted model: each target on its own lags
+    restricted = rss(np.concatenate([ones, lags], axis=2), target)
+
+    # Unrestricted model for every (leader i, follower j) pair
+    leader_lags = np.broadcast_to(lags[:, None], (n_books, n_books, rows, max_lag))
+    follower_lags = np.broadcast_to(lags[None, :], (n_books, n_books, rows, max_lag))
+    design = np.concatenate([np.ones((n_books, n_books, rows, 1)), follower_lags, leader_lags], axis=3)
+    y = np.broadcast_to(target[None, :], (n_books, n_books, rows))
+    unrestricted = rss(design.reshape(-1, rows, 2 * max_lag + 1),
+                       y.reshape(-1, rows)).reshape(n_books, n_books)
+
+    dof = rows - 2 * max_lag - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f = ((restricted[None, :] - unrestricted) / max_lag) / (unrestricted / dof)
+    f = np.nan_to_num(f, nan=0.0, posinf=0.0)
+    np.fill_diagonal(f, 0.0)
+    return f
+
+
+def analyze_game(args):
+    """ Worker: lead-lag statistics for one game. Returns None when the game is too sparse. """
+    game_id, book_ids, times, values, grid_seconds, max_lag = args
+    books, matrix = resample_to_grid(book_ids, times, values, grid_seconds)
+    if len(books) < 2 or matrix.shape[1] < MIN_GRID_POINTS:
+        return None
+
+    changes = np.diff(matrix, axis=1)
+    corr = lagged_cross_correlation(standardize(changes), max_lag)
+    lead = (corr - corr.transpose(0, 2, 1)).sum(axis=0)
+    f = granger_f_scores(changes, max_lag)
+    return game_id, books, lead, f
+
+
+def aggregate(results):
+    """ Combine per-game matrices into per-pair leadership statistics. """
+    pairs = defaultdict(lambda: {"games": 0, "lead_sum": 0.0, "f_sum": 0.0, "granger_wins": 0})
+    for result in results:
+        if result is None:
+            continue
+        _, books, lead, f = result
+        for i, leader in enumerate(books):
+            for j, follower in enumerate(books):
+                if i == j:
+                    continue
+                stats = pairs[(int(leader), int(follower))]
+                stats["games"] += 1
+                stats["lead_sum"] += lead[i, j]
+                stats["f_sum"] += f[i, j]
+                stats["granger_wins"] += int(f[i, j] > f[j, i])
+    return pairs
+
+
+def leadership_rows(pairs, books, season_year, season_type, odds_type):
+    """ Flatten aggregated pair statistics into export rows. """
+    rows = []
+    for (leader, follower), stats in sorted(pairs.items()):
+        games = stats["games"]
+        rows.append({
+            "season": season_year,
+            "season_type": season_type,
+            "odds_type": odds_type,
+            "leader_book": books.get(leader, {}).get("name", leader),
+            "follower_book": books.get(follower, {}).get("name", follower),
+            "leader_region": books.get(leader, {}).get("region"),
+            "leader_is_online": books.get(leader, {}).get("is_online"),
+            "leader_is_las_vegas": books.get(leader, {}).get("is_las_vegas"),
+            "games": games,
+            "mean_xcorr_lead": round(float(stats["lead_sum"]) / games, 6),
+            "mean_granger_f": round(float(stats["f_sum"]) / games, 6),
+            "granger_win_rate": round(stats["granger_wins"] / games, 4),
+        })
+    return rows
+
+
+def run_lead_lag(season_year, season_type, odds_types=ODDS_TYPES, grid_minutes=GRID_MINUTES,
+                 max_lag=MAX_LAG, workers=None):
+    """ Compute and export the book leadership matrix for each requested market. """
+    conn = connect_db()
+    cursor = conn.cursor()
+    books = fetch_books(cursor)
+    all_rows = []
+
+    for odds_type in odds_types:
+        with metrics.timer("analysis_phase_seconds", analysis="book_lead_lag", phase="load"):
+            series = fetch_price_series(cursor, season_year, season_type, odds_type)
+        logging.info(f"Loaded {len(series)} games for {season_year} {season_type} {odds_type}")
+        if not series:
+            continue
+
+        tasks = [(game_id, b, t, v, grid_minutes * 60, max_lag) for game_id, (b, t, v) in series.items()]
+        with metrics.timer("analysis_phase_seconds", analysis="book_lead_lag", phase="compute"):
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(analyze_game, tasks, chunksize=max(1, len(tasks) // 64)))
+
+            analyzed = sum(1 for r in results if r is not None)
+            logging.info(f"Analyzed {analyzed}/{len(tasks)} games for {odds_type}")
+            all_rows.extend(leadership_rows(aggregate(results), books, season_year, season_type, odds_type))
+
+    cursor.close()
+    release_db(conn)
+
+    if all_rows:
+        with metrics.timer("analysis_phase_seconds", analysis="book_lead_lag", phase="export"):
+            export_data(all_rows, f"book_lead_lag_{season_year}_{season_type}")
+    return all_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sportsbook lead-lag analysis over msf-nfl.game_odds.")
+    parser.add_argument("season", type=int, help="Season year (e.g., 2023)")
+    parser.add_argument("season_type", help="Season type as stored in msf-nfl.seasons (e.g., regular)")
+    parser.add_argument("--odds-type", choices=ODDS_TYPES, action="append",
+                        help="Market to analyze (repeatable, default: all)")
+    parser.add_argument("--grid-minutes", type=int, default=GRID_MINUTES)
+    parser.add_argument("--max-lag", type=int, default=MAX_LAG)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    setup_logging("book_lead_lag")
+
+    try:
+        rows = run_lead_lag(args.season, args.season_type, args.odds_type or ODDS_TYPES,
+                            args.grid_minutes, args.max_lag, args.workers)
+    except psycopg2.Error:
+        logging.critical("Critical error in lead-lag analysis", exc_info=True)
+        sys.exit(1)
+    print(f"Computed {len(rows)} book pair rows.")
+
+
+if __name__ == "__main__":
+    main()
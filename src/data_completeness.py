@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import logging
+import argparse
+from datetime import datetime, timezone
+import psycopg2
+import pymongo
+from game_identity import msf_game_slug, parse_utc
+from sal_config import connect_db, release_db, get_mongo_client, setup_logging
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(__file__), "..", "data", "gap_manifest.json")
+
+# MongoDB Configuration
+MSF_DATABASE = "nfl-msf"
+SPORTRADAR_DATABASE = "nfl-data"
+
+# Gap kinds written to the manifest, and the fetcher that fills each one
+GAP_KINDS = {
+    "odds_weeks": "get_msf_week_odds.py --manifest",
+    "pbp": "get_msf_season_pbp.py --manifest",
+    "lineups": None,
+    "rosters": "get_schedule.py --manifest",
+    "pg_games": "ETL_season_2_postgres.py",
+    "pg_game_odds": "ETL_odds_2_postgres.py",
+    "pg_plays": "ETL_pbp_2_postgres.py",
+}
+
+
+def season_type_key(season_type):
+    """ MSF season types are stored as 'Playoff', 'playoffs', 'regular', ... depending on the fetcher. """
+    season_type = (season_type or "").lower()
+    return "playoff" if season_type == "playoffs" else season_type
+
+
+def expected_msf_games(db, seasons, now):
+    """ Games that have kicked off in the requested seasons, projected from the seasons collection. """
+    season_values = [value for season in seasons for value in (season, str(season))]
+    pipeline = [
+        {"$match": {"season": {"$in": season_values}}},
+        {"$unwind": "$response.games"},
+        {"$project": {
+            "_id": 0,
+            "season": 1,
+            "season_type": 1,
+            "id": "$response.games.schedule.id",
+            "week": "$response.games.schedule.week",
+            "start_time": "$response.games.schedule.startTime",
+            "away": "$response.games.schedule.awayTeam.abbreviation",
+            "home": "$response.games.schedule.homeTeam.abbreviation",
+        }},
+    ]
+    games = {}
+    for game in db["seasons"].aggregate(pipeline):
+        if not game.get("start_time") or parse_utc(game["start_time"]) > now:
+            continue
+        slug = msf_game_slug(game["start_time"], game["away"], game["home"])
+        games[slug] = {"game_id": slug, "msf_id": game["id"], "season": int(game["season"]),
+                       "season_type": season_type_key(game["season_type"]), "week": game["week"]}
+    return games
+
+
+def expected_sportradar_games(db, seasons, now):
+    """ Sportradar games that have kicked off in the requested seasons, from the schedules collection. """
+    pipeline = [
+        {"$match": {"year": {"$in": list(seasons)}}},
+        {"$unwind": "$weeks"},
+        {"$unwind": "$weeks.games"},
+        {"$project": {"_id": 0, "season": "$year", "season_type": "$type",
+                      "game_id": "$weeks.games.id", "scheduled": "$weeks.games.scheduled"}},
+    ]
+    return {game["game_id"]: game for game in db["schedules"].aggregate(pipeline)
+            if game.get("scheduled") and parse_utc(game["scheduled"]) <= now}
+
+
+def stored_keys(collection, field, keys):
+    """ Which of the given keys already have a document, fetched as a projection of the key alone. """
+    return {doc[field] for doc in collection.find({field: {"$in": list(keys)}}, {field: 1, "_id": 0})}
+
+
+def stored_odds_weeks(collection, seasons):
+    season_values = [value for season in seasons for value in (season, str(season))]
+    return {(int(doc["season"]), season_type_key(doc["season_type"]), doc["week"])
+            for doc in collection.find({"season": {"$in": season_values}},
+                                       {"season": 1, "season_type": 1, "week": 1, "_id": 0})}
+
+
+def postgres_gaps(msf_games, pbp_present):
+    """ Games missing from "msf-nfl".games, without any game_odds, or whose stored pbp is not loaded into plays. """
+    msf_ids = [game["msf_id"] for game in msf_games.values()]
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT id FROM "msf-nfl".games WHERE id = ANY(%s);', (msf_ids,))
+    pg_games = {row[0] for row in cursor.fetchall()}
+    cursor.execute('SELECT DISTINCT game_id FROM "msf-nfl".game_odds WHERE game_id = ANY(%s);', (msf_ids,))
+    pg_odds = {row[0] for row in cursor.fetchall()}
+    cursor.execute("SELECT to_regclass('\"msf-nfl\".plays_loaded') IS NOT NULL;")
+    pg_plays = set()
+    if cursor.fetchone()[0]:
+        cursor.execute('SELECT game_key FROM "msf-nfl".plays_loaded WHERE game_key = ANY(%s);', (list(pbp_present),))
+        pg_plays = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    release_db(conn)
+
+    by_id = {game["msf_id"]: game for game in msf_games.values()}
+    return {
+        "pg_games": [by_id[game_id] for game_id in sorted(set(by_id) - pg_games)],
+        "pg_game_odds": [by_id[game_id] for game_id in sorted(set(by_id) - pg_odds)],
+        "pg_plays": [msf_games[slug] for slug in sorted(pbp_present - pg_plays)],
+    }
+
+
+def find_gaps(seasons, include_postgres=True, now=None):
+    """
+    Expected keys from seasons/schedules minus the keys each target already holds.
+    Every comparison is a set difference over projected keys; no payloads are read.
+    """
+    now = now or datetime.now(timezone.utc)
+    client = get_mongo_client()
+    msf, sportradar = client[MSF_DATABASE], client[SPORTRADAR_DATABASE]
+
+    msf_games = expected_msf_games(msf, seasons, now)
+    sr_games = expected_sportradar_games(sportradar, seasons, now)
+    expected_weeks = {(g["season"], g["season_type"], g["week"]) for g in msf_games.values()}
+
+    pbp_present = stored_keys(msf["pbp"], "game_id", msf_games)
+    lineups_present = stored_keys(msf["lineups"], "game_id", msf_games)
+    rosters_present = stored_keys(sportradar["rosters"], "id", sr_games)
+    weeks_present = stored_odds_weeks(msf["odds"], seasons)
+
+    gaps = {
+        "odds_weeks": [{"season": s, "season_type": t, "week": w} for s, t, w in sorted(expected_weeks - weeks_present)],
+        "pbp": [msf_games[slug] for slug in sorted(set(msf_games) - pbp_present)],
+        "lineups": [msf_games[slug] for slug in sorted(set(msf_games) - lineups_present)],
+        "rosters": [sr_games[game_id] for game_id in sorted(set(sr_games) - rosters_present)],
+    }
+    if include_postgres:
+        gaps.update(postgres_gaps(msf_games, pbp_present))
+
+    return {
+        "generated_at": now.isoformat(),
+        "seasons": sorted(seasons),
+        "expected": {"msf_games": len(msf_games), "sportradar_games": len(sr_games), "odds_weeks": len(expected_weeks)},
+        "counts": {kind: len(items) for kind, items in gaps.items()},
+        "gaps": gaps,
+    }
+
+
+def write_manifest(manifest, path=DEFAULT_MANIFEST):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4, default=str)
+    return path
+
+
+def load_gaps(path, kind):
+    """ The gap entries of one kind from a manifest, for fetchers run with --manifest. """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    items = manifest.get("gaps", {}).get(kind, [])
+    logging.info(f"Loaded {len(items)} '{kind}' gaps from {path} (generated {manifest.get('generated_at')})")
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect missing data across the MSF, Sportradar and Postgres stores.")
+    parser.add_argument("seasons", type=int, nargs="+", help="NFL seasons to check")
+    parser.add_argument("--output", default=DEFAULT_MANIFEST, help="Where to write the gap manifest")
+    parser.add_argument("--skip-postgres", action="store_true", help="Only check the Mongo collections")
+    args = parser.parse_args()
+
+    setup_logging("data_completeness")
+
+    try:
+        manifest = find_gaps(args.seasons, include_postgres=not args.skip_postgres)
+    except (pymongo.errors.PyMongoError, psycopg2.Error):
+        logging.critical("Critical error checking data completeness", exc_info=True)
+        sys.exit(1)
+
+    path = write_manifest(manifest, args.output)
+    for kind, count in manifest["counts"].items():
+        refetch = GAP_KINDS.get(kind)
+        logging.info(f"{kind}: {count} missing" + (f" (refetch with {refetch})" if refetch and count else ""))
+        print(f"{kind:>14}: {count}")
+    print(f"Gap manifest written to {path}")
+
+
+if __name__ == "__main__":
+    main()
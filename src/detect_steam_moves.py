@@ -0,0 +1,284 @@
+import sys
+import logging
+import argparse
+from collections import deque
+from datetime import timedelta
+import psycopg2
+import metrics
+from sal_config import connect_db, release_db, setup_logging
+
+
+# Detector Configuration
+STEAM_WINDOW_MINUTES = 10   # Moves must land inside this window to count as one steam move
+MIN_BOOKS = 3               # Distinct books that must move the same way
+FETCH_BATCH_SIZE = 10000    # Rows pulled per round trip by the server-side cursor
+WATERMARK_NAME = "steam_moves"
+
+# Each market is tracked on one canonical side so home/away and over/under
+# moves are not reported twice. Direction +1 means toward home / toward the over.
+CANONICAL_OUTCOMES = {
+    "moneyline": "home",
+    "point_spread": "home",
+    "over_under": "over",
+}
+
+
+def ensure_tables(cursor):
+    """ Create the steam event and watermark tables if they do not exist yet. """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS "msf-nfl".steam_moves (
+            id SERIAL PRIMARY KEY,
+            game_id INTEGER NOT NULL,
+            game_segment TEXT NOT NULL,
+            odds_type TEXT NOT NULL,
+            direction SMALLINT NOT NULL,
+            started_at TIMESTAMPTZ NOT NULL,
+            detected_at TIMESTAMPTZ NOT NULL,
+            book_count INTEGER NOT NULL,
+            leader_book_id INTEGER NOT NULL,
+            book_ids INTEGER[] NOT NULL,
+            start_value NUMERIC,
+            end_value NUMERIC,
+            UNIQUE (game_id, game_segment, odds_type, direction, started_at)
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS "msf-nfl".etl_watermarks (
+            name TEXT PRIMARY KEY,
+            last_value TIMESTAMPTZ,
+            last_id BIGINT,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    # Watermarks moved from as_of_time to game_odds.id: backfills insert quotes older than the last sweep
+    cursor.execute('ALTER TABLE "msf-nfl".etl_watermarks ADD COLUMN IF NOT EXISTS last_id BIGINT;')
+    cursor.execute('ALTER TABLE "msf-nfl".etl_watermarks ALTER COLUMN last_value DROP NOT NULL;')
+
+
+def get_watermark(cursor, name):
+    """ Highest game_odds.id covered by the last sweep (None before the first id-based sweep). """
+    cursor.execute('SELECT last_id FROM "msf-nfl".etl_watermarks WHERE name = %s;', (name,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(cursor, name, last_id):
+    cursor.execute("""
+        INSERT INTO "msf-nfl".etl_watermarks (name, last_id, updated_at)
+        VALUES (%s, %s, now())
+        ON CONFLICT (name) DO UPDATE
+        SET last_id = GREATEST("msf-nfl".etl_watermarks.last_id, EXCLUDED.last_id),
+            updated_at = now();
+    """, (name, last_id))
+
+
+def implied_probability(american):
+    """ Convert an American price into its implied win probability. """
+    if american is None:
+        return None
+    return abs(american) / (abs(american) + 100) if american < 0 else 100 / (american + 100)
+
+
+def quote_value(odds_type, american, spread, over_under):
+    """
+    Reduce a canonical-side quote to a (point, probability) pair where a larger
+    value always means the market moved toward home / the over.
+    """
+    prob = implied_probability(american)
+    if odds_type == "point_spread" and spread is not None:
+        return (-float(spread), prob)
+    if odds_type == "over_under" and over_under is not None:
+        return (float(over_under), prob)
+    return (0.0, prob)
+
+
+def move_direction(previous, current):
+    """ Compare two quote values; the point moves first, the price only breaks ties. """
+    if previous is None or current is None:
+        return 0
+    if current[0] != previous[0]:
+        return 1 if current[0] > previous[0] else -1
+    if previous[1] is None or current[1] is None or current[1] == previous[1]:
+        return 0
+    return 1 if current[1] > previous[1] else -1
+
+
+def new_detector_state(window_minutes=STEAM_WINDOW_MINUTES, min_books=MIN_BOOKS):
+    """ Rolling state shared by every market during a sweep. """
+    return {
+        "window": timedelta(minutes=window_minutes),
+        "min_books": min_books,
+        "last_quotes": {},   # (market, book_id) -> quote value
+        "moves": {},         # market -> deque of (as_of_time, book_id, direction, old_value, new_value)
+    }
+
+
+def process_quote(state, market, book_id, as_of_time, value):
+    """
+    Feed one quote into the detector. Quotes must arrive in as_of_time order.
+    Returns a steam event dict when this quote completes a coordinated move.
+    """
+    key = (market, book_id)
+    previous = state["last_quotes"].get(key)
+    state["last_quotes"][key] = value
+
+    direction = move_direction(previous, value)
+    if direction == 0:
+        return None
+
+    moves = state["moves"].setdefault(market, deque())
+
+    # Drop moves that fell out of the window
+    cutoff = as_of_time - state["window"]
+    while moves and moves[0][0] < cutoff:
+        moves.popleft()
+
+    # A book reversing itself cancels its own earlier moves
+    if any(m[1] == book_id and m[2] != direction for m in moves):
+        state["moves"][market] = moves = deque(m for m in moves if m[1] != book_id)
+
+    moves.append((as_of_time, book_id, direction, previous, value))
+
+    same_way = [m for m in moves if m[2] == direction]
+    books = []
+    for m in same_way:
+        if m[1] not in books:
+            books.append(m[1])
+
+    if len(books) < state["min_books"]:
+        return None
+
+    # Consume the moves that formed this event so the next one needs fresh books
+    state["moves"][market] = deque(m for m in moves if m[2] != direction)
+
+    leader = same_way[0]
+    game_id, game_segment, odds_type = market
+    return {
+        "game_id": game_id,
+        "game_segment": game_segment,
+        "odds_type": odds_type,
+        "direction": direction,
+        "started_at": leader[0],
+        "detected_at": as_of_time,
+        "book_count": len(books),
+        "leader_book_id": leader[1],
+        "book_ids": books,
+        "start_value": leader[3][0] if odds_type != "moneyline" else leader[3][1],
+        "end_value": value[0] if odds_type != "moneyline" else value[1],
+    }
+
+
+def changed_games(cursor, last_id):
+    """ Games with quotes inserted after game_odds.id `last_id`, whatever their as_of_time. """
+    cursor.execute('SELECT DISTINCT game_id FROM "msf-nfl".game_odds WHERE id > %s;', (last_id,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def stream_quotes(conn, game_ids=None):
+    """ Stream canonical-side quotes (of `game_ids`, or every game) in one time-ordered pass. """
+    cursor = conn.cursor(name="steam_quote_stream")
+    cursor.itersize = FETCH_BATCH_SIZE
+    cursor.execute(f"""
+        SELECT go.game_id, go.game_segment, go.odds_type, go.book_id, go.as_of_time,
+               o.odds_american, o.spread, o.over_under
+        FROM "msf-nfl".game_odds go
+        JOIN "msf-nfl".odds o ON o.game_odds_id = go.id
+        WHERE o.outcome_type = CASE go.odds_type WHEN 'over_under' THEN 'over' ELSE 'home' END
+          {"AND go.game_id = ANY(%s)" if game_ids is not None else ""}
+        ORDER BY go.as_of_time, go.id;
+    """, (game_ids,) if game_ids is not None else None)
+    try:
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+
+def insert_events(cursor, events):
+    """ Store steam events; an event that is already stored is ignored. """
+    cursor.executemany("""
+        INSERT INTO "msf-nfl".steam_moves
+        (game_id, game_segment, odds_type, direction, started_at, detected_at,
+         book_count, leader_book_id, book_ids, start_value, end_value)
+        VALUES (%(game_id)s, %(game_segment)s, %(odds_type)s, %(direction)s, %(started_at)s, %(detected_at)s,
+                %(book_count)s, %(leader_book_id)s, %(book_ids)s, %(start_value)s, %(end_value)s)
+        ON CONFLICT (game_id, game_segment, odds_type, direction, started_at) DO NOTHING;
+    """, events)
+
+
+def detect_steam_moves(full=False, window_minutes=STEAM_WINDOW_MINUTES, min_books=MIN_BOOKS):
+    """
+    Sweep game_odds in as_of_time order and record steam moves. The watermark is the highest
+    game_odds.id already swept, so an incremental run re-sweeps every game that received rows
+    since, including late loads and backfills with old as_of_times, and replaces its events.
+    """
+    conn = connect_db()
+    cursor = conn.cursor()
+    ensure_tables(cursor)
+    conn.commit()
+
+    state = new_detector_state(window_minutes, min_books)
+
+    with metrics.timer("analysis_phase_seconds", analysis="detect_steam_moves", phase="load"):
+        # Taken before the sweep so rows inserted while it runs are picked up next time
+        cursor.execute('SELECT max(id) FROM "msf-nfl".game_odds;')
+        max_id = cursor.fetchone()[0]
+
+        watermark = None if full else get_watermark(cursor, WATERMARK_NAME)
+        if watermark is None:
+            game_ids = None
+            cursor.execute('DELETE FROM "msf-nfl".steam_moves;')
+            logging.info("Running full steam sweep over all game_odds.")
+        else:
+            game_ids = changed_games(cursor, watermark)
+            cursor.execute('DELETE FROM "msf-nfl".steam_moves WHERE game_id = ANY(%s);', (game_ids,))
+            logging.info(f"Running incremental steam sweep over {len(game_ids)} games with rows after id {watermark}.")
+
+    events = []
+    quotes = 0
+    # The quotes stream in while they are swept, so this phase includes reading them
+    with metrics.timer("analysis_phase_seconds", analysis="detect_steam_moves", phase="compute"):
+        quote_stream = stream_quotes(conn, game_ids) if game_ids != [] else []
+        for game_id, game_segment, odds_type, book_id, as_of_time, american, spread, over_under in quote_stream:
+            if odds_type not in CANONICAL_OUTCOMES:
+                continue
+            quotes += 1
+            market = (game_id, game_segment, odds_type)
+            event = process_quote(state, market, book_id, as_of_time,
+                                  quote_value(odds_type, american, spread, over_under))
+            if event:
+                events.append(event)
+                logging.debug(f"Steam: game {game_id} {odds_type} {game_segment} dir {event['direction']} "
+                              f"led by book {event['leader_book_id']} ({event['book_count']} books)")
+
+    with metrics.timer("analysis_phase_seconds", analysis="detect_steam_moves", phase="export"):
+        if events:
+            insert_events(cursor, events)
+        if max_id is not None:
+            set_watermark(cursor, WATERMARK_NAME, max_id)
+        conn.commit()
+    cursor.close()
+    release_db(conn)
+    logging.info(f"Processed {quotes} quotes, detected {len(events)} steam moves.")
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect cross-book steam moves in msf-nfl.game_odds.")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and sweep all quotes")
+    parser.add_argument("--window-minutes", type=int, default=STEAM_WINDOW_MINUTES)
+    parser.add_argument("--min-books", type=int, default=MIN_BOOKS)
+    args = parser.parse_args()
+
+    setup_logging("detect_steam_moves")
+
+    try:
+        events = detect_steam_moves(args.full, args.window_minutes, args.min_books)
+    except psycopg2.Error:
+        logging.critical("Critical error in steam move detection", exc_info=True)
+        sys.exit(1)
+    print(f"Detected {len(events)} steam moves.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import sys
+import json
+import logging
+import argparse
+import psycopg2
+from psycopg2.extras import Json
+import metrics
+from pipeline import resolve
+from sal_config import connect_db, release_db, setup_logging
+
+
+BATCH_SIZE = 500   # Items per savepoint; a failing batch is retried one item at a time
+
+# ETL name -> "module:function" that loads one dead-lettered payload with a cursor, used by replay
+REPLAYERS = {
+    "odds": "ETL_odds_2_postgres:replay_quote",
+    "season": "ETL_season_2_postgres:replay_game",
+    "pbp": "ETL_pbp_2_postgres:replay_game",
+    "process_json": "process_json:replay_event",
+}
+
+
+def ensure_dead_letter_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS "msf-nfl".etl_dead_letters (
+            id SERIAL PRIMARY KEY,
+            etl TEXT NOT NULL,
+            source_ref JSONB NOT NULL,
+            payload JSONB NOT NULL,
+            error TEXT NOT NULL,
+            sqlstate TEXT,
+            attempts INTEGER NOT NULL DEFAULT 1,
+            failed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            replayed_at TIMESTAMPTZ
+        );
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS etl_dead_letters_pending_idx
+        ON "msf-nfl".etl_dead_letters (etl) WHERE replayed_at IS NULL;
+    """)
+
+
+def as_json(value):
+    # Mongo documents carry datetimes and ObjectIds; keep their text rather than failing the dead letter
+    return Json(value, dumps=lambda v: json.dumps(v, default=str))
+
+
+def record_dead_letter(cursor, etl, source_ref, payload, error):
+    cursor.execute("""
+        INSERT INTO "msf-nfl".etl_dead_letters (etl, source_ref, payload, error, sqlstate)
+        VALUES (%s, %s, %s, %s, %s);
+    """, (etl, as_json(source_ref), as_json(payload), f"{type(error).__name__}: {error}".strip(),
+          getattr(error, "pgcode", None)))
+
+
+class SavepointBatch:
+    """
+    Runs an ETL's inserts in savepoint-protected batches inside the caller's transaction.
+    A batch that raises is rolled back to its savepoint and retried item by item, each in its
+    own savepoint; an item that still fails is written to "msf-nfl".etl_dead_letters with its
+    source reference and error, and the load carries on. The caller still owns the commit.
+
+    load_item(cursor, item) loads one item and may return a value (passed to the item's
+    on_loaded callback); an item's on_failed() runs when it is dead-lettered, before its payload
+    is taken, so the caller can undo state that assumed it would load. load_batch(cursor, items),
+    when given, is the fast path for a whole batch and may return one on_loaded value per item.
+    on_rollback() lets the caller drop in-memory state (id caches) a rollback made stale.
+    to_payload(item) trims what is stored in the dead letter; replay must be able to load it.
+    """
+
+    def __init__(self, cursor, etl, load_item, batch_size=BATCH_SIZE, load_batch=None, on_rollback=None,
+                 to_payload=None):
+        self.cursor = cursor
+        self.etl = etl
+        self.load_item = load_item
+        self.load_batch = load_batch
+        self.batch_size = batch_size
+        self.on_rollback = on_rollback
+        self.to_payload = to_payload or (lambda item: item)
+        self.pending = []
+        self.loaded = 0
+        self.dead = 0
+        ensure_dead_letter_table(cursor)
+
+    def add(self, item, source_ref, on_loaded=None, on_failed=None):
+        self.pending.append((item, source_ref, on_loaded, on_failed))
+        if self.batch_size and len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Load everything pending; returns the number of items dead-lettered by this flush. """
+        batch, self.pending = self.pending, []
+        if not batch:
+            return 0
+        dead_before = self.dead
+        self.cursor.execute("SAVEPOINT etl_batch;")
+        try:
+            if self.load_batch:
+                results = self.load_batch(self.cursor, [item for item, _, _, _ in batch]) or [None] * len(batch)
+            else:
+                results = [self.load_item(self.cursor, item) for item, _, _, _ in batch]
+            self.cursor.execute("RELEASE SAVEPOINT etl_batch;")
+        except Exception as e:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT etl_batch; RELEASE SAVEPOINT etl_batch;")
+            self._rolled_back()
+            logging.warning(f"[{self.etl}] batch of {len(batch)} failed ({type(e).__name__}: {e}); retrying item by item.")
+            metrics.inc("etl_batch_retries_total", etl=self.etl)
+            for entry in batch:
+                self._load_one(*entry)
+            return self.dead - dead_before
+
+        for (_, _, on_loaded, _), result in zip(batch, results):
+            if on_loaded:
+                on_loaded(result)
+        self.loaded += len(batch)
+        return 0
+
+    def _load_one(self, item, source_ref, on_loaded, on_failed):
+        self.cursor.execute("SAVEPOINT etl_item;")
+        try:
+            result = self.load_item(self.cursor, item)
+            self.cursor.execute("RELEASE SAVEPOINT etl_item;")
+        except Exception as e:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT etl_item; RELEASE SAVEPOINT etl_item;")
+            self._rolled_back()
+            if on_failed:
+                on_failed()
+            record_dead_letter(self.cursor, self.etl, source_ref, self.to_payload(item), e)
+            self.dead += 1
+            metrics.inc("etl_dead_letters_total", etl=self.etl)
+            logging.error(f"[{self.etl}] dead-lettered {source_ref}: {type(e).__name__}: {e}")
+            return
+        if on_loaded:
+            on_loaded(result)
+        self.loaded += 1
+
+    def _rolled_back(self):
+        if self.on_rollback:
+            self.on_rollback()
+
+
+# ---------------------------------------------------------------- Replay
+
+def pending_dead_letters(cursor, etl=None):
+    cursor.execute("""
+        SELECT id, etl, source_ref, error, attempts, failed_at FROM "msf-nfl".etl_dead_letters
+        WHERE replayed_at IS NULL AND (%s IS NULL OR etl = %s)
+        ORDER BY id;
+    """, (etl, etl))
+    return cursor.fetchall()
+
+
+def replay_dead_letters(etl, ids=None):
+    """
+    Load pending dead letters of one ETL again, e.g. after fixing the data or the schema.
+    Each letter runs in its own savepoint: successes are marked replayed, failures keep their
+    place with the new error and one more attempt. Returns (replayed, still failing).
+    """
+    load_item = resolve(REPLAYERS[etl])
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        ensure_dead_letter_table(cursor)
+        cursor.execute("""
+            SELECT id, payload FROM "msf-nfl".etl_dead_letters
+            WHERE etl = %s AND replayed_at IS NULL AND (%s IS NULL OR id = ANY(%s))
+            ORDER BY id;
+        """, (etl, ids, ids or []))
+        replayed = failed = 0
+        for letter_id, payload in cursor.fetchall():
+            cursor.execute("SAVEPOINT etl_replay;")
+            try:
+                load_item(cursor, payload)
+                cursor.execute("RELEASE SAVEPOINT etl_replay;")
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT etl_replay; RELEASE SAVEPOINT etl_replay;")
+                cursor.execute("""
+                    UPDATE "msf-nfl".etl_dead_letters
+                    SET attempts = attempts + 1, error = %s, sqlstate = %s, failed_at = now()
+                    WHERE id = %s;
+                """, (f"{type(e).__name__}: {e}".strip(), getattr(e, "pgcode", None), letter_id))
+                failed += 1
+                logging.error(f"[{etl}] dead letter {letter_id} failed again: {e}")
+                continue
+            cursor.execute('UPDATE "msf-nfl".etl_dead_letters SET replayed_at = now() WHERE id = %s;', (letter_id,))
+            replayed += 1
+        conn.commit()
+        logging.info(f"[{etl}] replayed {replayed} dead letters, {failed} still failing.")
+        return replayed, failed
+    finally:
+        cursor.close()
+        release_db(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay ETL dead letters.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="Pending dead letters")
+    list_parser.add_argument("--etl", choices=REPLAYERS)
+    replay_parser = commands.add_parser("replay", help="Load pending dead letters again")
+    replay_parser.add_argument("etl", choices=REPLAYERS)
+    replay_parser.add_argument("--id", type=int, action="append", help="Only these dead letter ids (repeatable)")
+    args = parser.parse_args()
+
+    setup_logging("etl_dead_letters")
+    try:
+        if args.command == "replay":
+            replayed, failed = replay_dead_letters(args.etl, args.id)
+            print(f"Replayed {replayed} dead letters; {failed} still failing.")
+            sys.exit(1 if failed else 0)
+
+        conn = connect_db()
+        try:
+            with conn.cursor() as cursor:
+                ensure_dead_letter_table(cursor)
+                for letter_id, etl, source_ref, error, attempts, failed_at in pending_dead_letters(cursor, args.etl):
+                    print(f"{letter_id:>6} {etl:<12} {failed_at:%Y-%m-%d %H:%M} x{attempts} {json.dumps(source_ref)}\n"
+                          f"       {error}")
+            conn.commit()
+        finally:
+            release_db(conn)
+    except psycopg2.Error:
+        logging.critical("Dead letter command failed", exc_info=True)
+        raise
+
+
+if __name__ == "__main__":
+    main()
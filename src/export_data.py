@@ -4,7 +4,6 @@ import json
 from datetime import datetime
 
 EXPORT_DIR = "exports"
-os.makedirs(EXPORT_DIR, exist_ok=True)
 
 def serialize_data(data):
     """
@@ -25,6 +24,7 @@ def export_data(data, filename="exported_data"):
     :param data: List of dictionaries or tuples representing query results.
     :param filename: Base filename for exported files (without extension).
     """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
     csv_file = os.path.join(EXPORT_DIR, f"{filename}.csv")
     json_file = os.path.join(EXPORT_DIR, f"{filename}.json")
 
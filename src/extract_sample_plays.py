@@ -1,65 +1,146 @@
 import pymongo
-import re
 import logging
 import os
 import json
 import random
-from collections import defaultdict
+import argparse
+from pbp_model import season_of
+from sal_config import get_mongo_client
 
 # Setup Logging
 LOG_DIR = "logs"
 DATA_DIR = "data"
-os.makedirs(LOG_DIR, exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, "pbp_text_analysis.log")
 SAMPLE_FILE = os.path.join(DATA_DIR, "sample_plays.json")
 
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
-
 # MongoDB Configuration
-MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "nfl-msf"
 PBP_COLLECTION = "pbp"
 
-# Connect to MongoDB
-client = pymongo.MongoClient(MONGO_URI)
-db = client[DATABASE_NAME]
-pbp_collection = db[PBP_COLLECTION]
+# Play sub-objects; whichever one a play carries is its play type
+PLAY_TYPES = ["rush", "pass", "kick", "punt", "fieldGoalAttempt", "extraPointAttempt", "sack", "penalty"]
+STRATA = ["play_type", "quarter", "season"]
+
+
+def play_type(play):
+    for key in PLAY_TYPES:
+        if play.get(key):
+            return key
+    return "other"
+
+
+def stratum_of(play, start_time, stratify):
+    if stratify == "play_type":
+        return play_type(play)
+    if stratify == "quarter":
+        return (play.get("playStatus") or {}).get("quarter", "UNKNOWN")
+    return season_of(start_time) or "UNKNOWN"
+
+
+def reservoir_add(reservoir, item, seen, sample_size, rng):
+    """ Algorithm R: after `seen` items every one of them is in the reservoir with equal probability. """
+    if len(reservoir) < sample_size:
+        reservoir.append(item)
+        return
+    slot = rng.randrange(seen)
+    if slot < sample_size:
+        reservoir[slot] = item
+
+
+def stream_plays(pbp_collection, stratify=None):
+    """ Yield (play, game start time) one document at a time in a stable order. """
+    projection = {"response.plays": 1}
+    if stratify == "season":
+        projection["response.game.startTime"] = 1
+    cursor = pbp_collection.find({}, projection).sort("_id", pymongo.ASCENDING)
+    for doc in cursor:
+        response = doc.get("response", {})
+        start_time = response.get("game", {}).get("startTime")
+        for play in response.get("plays", []):
+            yield play, start_time
+
+
+def reservoir_sample(pbp_collection, sample_size, stratify=None, seed=None):
+    """
+    One streaming pass over the cursor. Memory is bounded by sample_size (per stratum
+    when stratifying). Seeded runs return the same sample as long as the data is unchanged.
+    Returns (sampled plays, plays seen).
+    """
+    rng = random.Random(seed)
+    reservoirs = {}
+    seen = {}
+    total = 0
+
+    for play, start_time in stream_plays(pbp_collection, stratify):
+        total += 1
+        key = stratum_of(play, start_time, stratify) if stratify else None
+        seen[key] = seen.get(key, 0) + 1
+        reservoir_add(reservoirs.setdefault(key, []), play, seen[key], sample_size, rng)
+
+    for key in sorted(seen, key=str):
+        if seen[key] < sample_size:
+            logging.warning(f"⚠️ Only {seen[key]} plays available for {stratify or 'sample'} {key}, reducing sample size.")
+
+    sampled = [play for key in sorted(reservoirs, key=str) for play in reservoirs[key]]
+    return sampled, total
+
+
+def server_sample(pbp_collection, sample_size):
+    """ Unstratified sample drawn by Mongo's $sample; nothing but the sample reaches the client. """
+    pipeline = [
+        {"$project": {"_id": 0, "plays": "$response.plays"}},
+        {"$unwind": "$plays"},
+        {"$sample": {"size": sample_size}},
+        {"$replaceRoot": {"newRoot": "$plays"}},
+    ]
+    return list(pbp_collection.aggregate(pipeline, allowDiskUse=True))
+
 
 # Function to extract a sample of play objects and save them as JSON
-def extract_sample_plays(sample_size=50):
+def extract_sample_plays(sample_size=50, stratify=None, seed=None, server_side=False):
     """Extracts a sample of play-by-play objects and saves them as JSON."""
     logging.info(f"📥 Extracting {sample_size} random play objects for AI analysis...")
 
-    # Retrieve all pbp documents and collect play objects
-    cursor = pbp_collection.find({}, {"response.plays": 1})  # Only fetch plays to keep it lightweight
-    all_plays = []
+    client = get_mongo_client()
+    pbp_collection = client[DATABASE_NAME][PBP_COLLECTION]
 
-    for doc in cursor:
-        plays = doc.get("response", {}).get("plays", [])
-        all_plays.extend(plays)
+    if server_side:
+        sampled_plays = server_sample(pbp_collection, sample_size)
+    else:
+        sampled_plays, total_plays = reservoir_sample(pbp_collection, sample_size, stratify, seed)
+        logging.info(f"Streamed {total_plays} plays.")
 
-    # If we don't have enough plays, adjust sample size
-    total_plays = len(all_plays)
-    if total_plays == 0:
+    if not sampled_plays:
         logging.warning("🚨 No plays found in database. Skipping sample extraction.")
         return
-    elif total_plays < sample_size:
-        logging.warning(f"⚠️ Only {total_plays} plays available, reducing sample size.")
-        sample_size = total_plays
-
-    # Randomly sample plays
-    sampled_plays = random.sample(all_plays, sample_size)
+    elif not stratify and len(sampled_plays) < sample_size:
+        logging.warning(f"⚠️ Only {len(sampled_plays)} plays available, reducing sample size.")
 
     # Save to JSON file
+    os.makedirs(DATA_DIR, exist_ok=True)
     with open(SAMPLE_FILE, "w", encoding="utf-8") as f:
         json.dump(sampled_plays, f, indent=4)
 
-    logging.info(f"✅ Saved {sample_size} sample plays to {SAMPLE_FILE}")
+    logging.info(f"✅ Saved {len(sampled_plays)} sample plays to {SAMPLE_FILE}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract a random sample of MSF play-by-play objects.")
+    parser.add_argument("--size", type=int, default=50, help="Sample size (per stratum when stratifying)")
+    parser.add_argument("--stratify", choices=STRATA, help="Sample separately within each play type, quarter or season")
+    parser.add_argument("--seed", type=int, help="Seed for a reproducible sample")
+    parser.add_argument("--server-side", action="store_true", help="Let Mongo draw an unstratified sample with $sample")
+    args = parser.parse_args()
+
+    if args.server_side and (args.stratify or args.seed is not None):
+        parser.error("--server-side draws an unstratified, unseeded sample")
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=LOG_FILE,
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
 
-# Run the extraction
-extract_sample_plays()
+    # Run the extraction
+    extract_sample_plays(args.size, args.stratify, args.seed, args.server_side)
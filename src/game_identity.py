@@ -0,0 +1,244 @@
+import sys
+import json
+import logging
+import argparse
+from datetime import datetime, timezone
+import pytz
+import psycopg2
+from psycopg2.extras import execute_values
+from sal_config import connect_db, release_db, get_mongo_client, setup_logging
+
+
+# MongoDB Configuration
+MSF_DATABASE = "nfl-msf"
+SPORTRADAR_DATABASE = "nfl-data"
+
+EASTERN = pytz.timezone("America/New_York")
+
+# Canonical team keys are the MSF abbreviations; every other spelling maps onto them
+TEAM_NAMES = {
+    "ARI": ["Arizona Cardinals", "Cardinals"],
+    "ATL": ["Atlanta Falcons", "Falcons"],
+    "BAL": ["Baltimore Ravens", "Ravens"],
+    "BUF": ["Buffalo Bills", "Bills"],
+    "CAR": ["Carolina Panthers", "Panthers"],
+    "CHI": ["Chicago Bears", "Bears"],
+    "CIN": ["Cincinnati Bengals", "Bengals"],
+    "CLE": ["Cleveland Browns", "Browns"],
+    "DAL": ["Dallas Cowboys", "Cowboys"],
+    "DEN": ["Denver Broncos", "Broncos"],
+    "DET": ["Detroit Lions", "Lions"],
+    "GB": ["Green Bay Packers", "Packers", "GNB"],
+    "HOU": ["Houston Texans", "Texans"],
+    "IND": ["Indianapolis Colts", "Colts"],
+    "JAX": ["Jacksonville Jaguars", "Jaguars", "JAC"],
+    "KC": ["Kansas City Chiefs", "Chiefs", "KAN"],
+    "LV": ["Las Vegas Raiders", "Oakland Raiders", "Raiders", "OAK", "LVR"],
+    "LAC": ["Los Angeles Chargers", "San Diego Chargers", "Chargers", "SD"],
+    "LA": ["Los Angeles Rams", "St. Louis Rams", "Rams", "LAR", "STL"],
+    "MIA": ["Miami Dolphins", "Dolphins"],
+    "MIN": ["Minnesota Vikings", "Vikings"],
+    "NE": ["New England Patriots", "Patriots", "NWE"],
+    "NO": ["New Orleans Saints", "Saints", "NOR"],
+    "NYG": ["New York Giants", "Giants"],
+    "NYJ": ["New York Jets", "Jets"],
+    "PHI": ["Philadelphia Eagles", "Eagles"],
+    "PIT": ["Pittsburgh Steelers", "Steelers"],
+    "SF": ["San Francisco 49ers", "49ers", "SFO"],
+    "SEA": ["Seattle Seahawks", "Seahawks"],
+    "TB": ["Tampa Bay Buccaneers", "Buccaneers", "TAM"],
+    "TEN": ["Tennessee Titans", "Titans"],
+    "WAS": ["Washington Commanders", "Washington Football Team", "Washington Redskins", "Commanders", "WSH"],
+}
+
+TEAM_LOOKUP = {name.lower(): team for team, names in TEAM_NAMES.items() for name in names + [team]}
+
+
+def normalize_team(name):
+    """ Map an abbreviation, alias or full team name from any provider to the canonical team key. """
+    if not name:
+        return None
+    return TEAM_LOOKUP.get(name.strip().lower())
+
+
+def parse_utc(start_time):
+    """ Parse provider ISO timestamps ("...000Z", "...Z", "+00:00") into an aware UTC datetime. """
+    if isinstance(start_time, datetime):
+        value = start_time
+    else:
+        value = datetime.fromisoformat(start_time.replace("Z", "+00:00"))
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def game_date(start_time):
+    """ Eastern-time game date as YYYYMMDD; late kickoffs keep the date they were played on in ET. """
+    return parse_utc(start_time).astimezone(EASTERN).strftime("%Y%m%d")
+
+
+def canonical_game_id(start_time, away_team, home_team):
+    """ YYYYMMDD-AWAY-HOME with canonical team keys (the same shape as MSF game slugs). """
+    away, home = normalize_team(away_team), normalize_team(home_team)
+    if not away or not home:
+        return None
+    return f"{game_date(start_time)}-{away}-{home}"
+
+
+def msf_game_slug(start_time, away_abbreviation, home_abbreviation):
+    """ MSF's own game slug, used in feed URLs and as the pbp/lineups game_id. """
+    return f"{game_date(start_time)}-{away_abbreviation}-{home_abbreviation}"
+
+
+def ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS "msf-nfl".game_keys (
+            provider TEXT NOT NULL,
+            provider_key TEXT NOT NULL,
+            canonical_id TEXT NOT NULL,
+            start_time TIMESTAMPTZ,
+            PRIMARY KEY (provider, provider_key)
+        );
+    """)
+    cursor.execute('CREATE INDEX IF NOT EXISTS game_keys_canonical_idx ON "msf-nfl".game_keys (canonical_id);')
+
+
+# ------------------------------------------------------------ Key sources
+
+def msf_keys(db):
+    """ (provider, key, canonical id, start time) rows from every MSF season document. """
+    for season_doc in db["seasons"].find({}, {"response.games.schedule": 1}):
+        for game in season_doc.get("response", {}).get("games", []):
+            schedule = game["schedule"]
+            away, home = schedule["awayTeam"]["abbreviation"], schedule["homeTeam"]["abbreviation"]
+            canonical = canonical_game_id(schedule["startTime"], away, home)
+            if canonical is None:
+                logging.warning(f"Unknown MSF team in game {schedule['id']}: {away} @ {home}")
+                continue
+            start = parse_utc(schedule["startTime"])
+            yield "msf_id", str(schedule["id"]), canonical, start
+            yield "msf_slug", msf_game_slug(schedule["startTime"], away, home), canonical, start
+
+
+def sportradar_keys(db):
+    """ Rows from every Sportradar season schedule document. """
+    for schedule in db["schedules"].find({}, {"weeks.games.id": 1, "weeks.games.scheduled": 1,
+                                              "weeks.games.home": 1, "weeks.games.away": 1}):
+        for week in schedule.get("weeks", []):
+            for game in week.get("games", []):
+                home = game.get("home", {})
+                away = game.get("away", {})
+                canonical = canonical_game_id(game["scheduled"], away.get("alias") or away.get("name"),
+                                              home.get("alias") or home.get("name"))
+                if canonical is None:
+                    logging.warning(f"Unknown Sportradar team in game {game['id']}")
+                    continue
+                yield "sportradar", game["id"], canonical, parse_utc(game["scheduled"])
+
+
+def oddsapi_event_keys(events):
+    """ Rows from Odds API event objects (id, commence_time, home_team, away_team). """
+    for event in events:
+        canonical = canonical_game_id(event["commence_time"], event["away_team"], event["home_team"])
+        if canonical is None:
+            continue  # other sports share the snapshot files
+        yield "oddsapi", event["id"], canonical, parse_utc(event["commence_time"])
+
+
+def oddsapi_snapshot_events(paths):
+    """ Events from saved Odds API snapshot files ({timestamp: {sport: {"data": [events]}}}). """
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for snapshot in data.values():
+            if not isinstance(snapshot, dict):
+                continue
+            for sport_content in snapshot.values():
+                if isinstance(sport_content, dict):
+                    yield from sport_content.get("data", [])
+
+
+def store_keys(cursor, rows):
+    """ Bulk upsert identity rows; the last seen mapping for a provider key wins. """
+    unique = {(provider, key): (provider, key, canonical, start) for provider, key, canonical, start in rows}
+    execute_values(cursor, """
+        INSERT INTO "msf-nfl".game_keys (provider, provider_key, canonical_id, start_time)
+        VALUES %s
+        ON CONFLICT (provider, provider_key) DO UPDATE
+        SET canonical_id = EXCLUDED.canonical_id, start_time = EXCLUDED.start_time;
+    """, list(unique.values()), page_size=1000)
+    return len(unique)
+
+
+def build_identity_index(snapshot_files=()):
+    """ Rebuild the identity table in bulk from MSF seasons, Sportradar schedules and Odds API snapshots. """
+    client = get_mongo_client()
+    rows = list(msf_keys(client[MSF_DATABASE]))
+    rows += list(sportradar_keys(client[SPORTRADAR_DATABASE]))
+    rows += list(oddsapi_event_keys(oddsapi_snapshot_events(snapshot_files)))
+
+    conn = connect_db()
+    cursor = conn.cursor()
+    ensure_table(cursor)
+    stored = store_keys(cursor, rows)
+    conn.commit()
+    cursor.close()
+    release_db(conn)
+    _index.clear()
+    logging.info(f"Stored {stored} provider game keys.")
+    return stored
+
+
+# --------------------------------------------------------------- Lookups
+
+_index = {}
+
+
+def load_identity_index(refresh=False):
+    """ Load the whole table once per process into two dicts for O(1) lookups in both directions. """
+    if _index and not refresh:
+        return _index
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT provider, provider_key, canonical_id FROM "msf-nfl".game_keys;')
+    by_key, by_canonical = {}, {}
+    for provider, key, canonical in cursor.fetchall():
+        by_key[(provider, key)] = canonical
+        by_canonical.setdefault(canonical, {})[provider] = key
+    cursor.close()
+    release_db(conn)
+    _index.update({"by_key": by_key, "by_canonical": by_canonical})
+    return _index
+
+
+def canonical_id(provider, key):
+    """ Canonical game id for a provider's game key, e.g. canonical_id("sportradar", uuid). """
+    return load_identity_index()["by_key"].get((provider, str(key)))
+
+
+def provider_key(canonical, provider):
+    """ A provider's key for a canonical game id, e.g. provider_key("20240905-BAL-KC", "oddsapi"). """
+    return load_identity_index()["by_canonical"].get(canonical, {}).get(provider)
+
+
+def translate(provider, key, target_provider):
+    """ Map one provider's game key straight to another's. """
+    canonical = canonical_id(provider, key)
+    return provider_key(canonical, target_provider) if canonical else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the cross-provider game identity index.")
+    parser.add_argument("snapshots", nargs="*", help="Odds API snapshot JSON files to index")
+    args = parser.parse_args()
+
+    setup_logging("game_identity")
+
+    try:
+        stored = build_identity_index(args.snapshots)
+    except psycopg2.Error:
+        logging.critical("Critical error building the game identity index", exc_info=True)
+        sys.exit(1)
+    print(f"Stored {stored} provider game keys.")
+
+
+if __name__ == "__main__":
+    main()
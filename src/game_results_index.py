@@ -0,0 +1,157 @@
+import os
+import json
+import logging
+from sal_config import connect_db, release_db, get_mongo_client
+
+# MongoDB Configuration
+DATABASE_NAME = "nfl-msf"
+SEASON_COLLECTION = "seasons"
+
+# On-disk cache, one file per source
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "cache")
+
+SOURCES = ("mongo", "postgres")
+
+# Indexes already loaded in this process, keyed by source
+_loaded = {}
+
+
+def winner(home_score, away_score):
+    """ 'home', 'away' or 'draw'; None when the game has no final score. """
+    if home_score is None or away_score is None:
+        return None
+    if home_score > away_score:
+        return "home"
+    if home_score < away_score:
+        return "away"
+    return "draw"
+
+
+def _result(home, away, home_score, away_score, status):
+    return {
+        "home": home,
+        "away": away,
+        "home_score": home_score,
+        "away_score": away_score,
+        "status": status,
+        "winner": winner(home_score, away_score),
+    }
+
+
+def mongo_fingerprint(seasons_collection):
+    """ Season documents change only when re-fetched, which updates response.lastUpdatedOn. """
+    docs = seasons_collection.find({}, {"season": 1, "season_type": 1, "response.lastUpdatedOn": 1})
+    return sorted(
+        f"{doc['_id']}|{doc.get('season')}|{doc.get('season_type')}|{doc.get('response', {}).get('lastUpdatedOn')}"
+        for doc in docs
+    )
+
+
+def build_from_mongo(seasons_collection):
+    """ Project only the schedule/score fields of every game server-side and index them by game id. """
+    pipeline = [
+        {"$project": {
+            "_id": 0,
+            "games": {"$map": {
+                "input": {"$ifNull": ["$response.games", []]},
+                "as": "g",
+                "in": {
+                    "id": "$$g.schedule.id",
+                    "home": "$$g.schedule.homeTeam.abbreviation",
+                    "away": "$$g.schedule.awayTeam.abbreviation",
+                    "status": "$$g.schedule.playedStatus",
+                    "home_score": "$$g.score.homeScoreTotal",
+                    "away_score": "$$g.score.awayScoreTotal",
+                },
+            }},
+        }},
+    ]
+    index = {}
+    for doc in seasons_collection.aggregate(pipeline, allowDiskUse=True):
+        for game in doc["games"]:
+            index[game["id"]] = _result(game.get("home"), game.get("away"), game.get("home_score"),
+                                        game.get("away_score"), game.get("status"))
+    return index
+
+
+def postgres_fingerprint(cursor):
+    cursor.execute("""
+        SELECT count(*),
+               md5(string_agg(id::text || ':' || coalesce(played_status, '') || ':' ||
+                              coalesce(home_score_total, -1)::text || ':' || coalesce(away_score_total, -1)::text,
+                              ',' ORDER BY id))
+        FROM "msf-nfl".games;
+    """)
+    return list(cursor.fetchone())
+
+
+def build_from_postgres(cursor):
+    cursor.execute("""
+        SELECT g.id, ht.abbreviation, at.abbreviation, g.home_score_total, g.away_score_total, g.played_status
+        FROM "msf-nfl".games g
+        LEFT JOIN "msf-nfl".teams ht ON ht.id = g.home_team_id
+        LEFT JOIN "msf-nfl".teams at ON at.id = g.away_team_id;
+    """)
+    return {row[0]: _result(row[1], row[2], row[3], row[4], row[5]) for row in cursor.fetchall()}
+
+
+def _cache_path(source):
+    return os.path.join(CACHE_DIR, f"game_results_{source}.json")
+
+
+def _read_cache(source):
+    path = _cache_path(source)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_cache(source, fingerprint, index):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(source)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "games": {str(k): v for k, v in index.items()}}, f)
+    os.replace(path + ".tmp", path)
+
+
+def load_game_results(source="mongo", refresh=False):
+    """
+    Return the game_id -> result mapping for a source ('mongo' seasons documents or
+    the "msf-nfl".games table). The on-disk copy is reused while the source fingerprint matches.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Unknown game results source: {source}")
+    if source in _loaded and not refresh:
+        return _loaded[source]
+
+    if source == "mongo":
+        client = get_mongo_client()
+        seasons_collection = client[DATABASE_NAME][SEASON_COLLECTION]
+        fingerprint = mongo_fingerprint(seasons_collection)
+    else:
+        conn = connect_db()
+        cursor = conn.cursor()
+        fingerprint = postgres_fingerprint(cursor)
+
+    try:
+        cached = None if refresh else _read_cache(source)
+        if cached and cached["fingerprint"] == fingerprint:
+            index = {int(k): v for k, v in cached["games"].items()}
+            logging.info(f"Loaded {len(index)} game results from cache ({source})")
+        else:
+            index = build_from_mongo(seasons_collection) if source == "mongo" else build_from_postgres(cursor)
+            _write_cache(source, fingerprint, index)
+            logging.info(f"Rebuilt game results index with {len(index)} games ({source})")
+    finally:
+        if source == "postgres":
+            cursor.close()
+            release_db(conn)
+
+    _loaded[source] = index
+    return index
+
+
+def get_game_result(game_id, source="mongo"):
+    """ O(1) lookup of one game's result; None when the game is unknown. """
+    return load_game_results(source).get(game_id)
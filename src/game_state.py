@@ -0,0 +1,275 @@
+import os
+import sys
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pymongo
+import metrics
+from export_data import export_data
+from pbp_model import PlayType, QUARTER_SECONDS, parse_game, load_game_file
+from sal_config import get_mongo_client, setup_logging
+
+
+# MongoDB Configuration
+DATABASE_NAME = "nfl-msf"
+PBP_COLLECTION = "pbp"
+
+# Plays that never open a drive: kickoffs hand the ball over, tries belong to the drive that scored
+NON_DRIVE_PLAYS = (PlayType.KICKOFF,)
+TRY_PLAYS = (PlayType.EXTRA_POINT, PlayType.CONVERSION)
+
+# Regression sample for --check: (drive_id, team) of every drive that ended in a turnover.
+# GB's encroachment on PHI's 4th down (play 42) must not split PHI's touchdown drive.
+SAMPLE_GAME = os.path.join(os.path.dirname(__file__), "..", "data", "playbyplay_20240906-GB-PHI.json")
+SAMPLE_TURNOVERS = [(2, "PHI"), (4, "PHI"), (16, "GB"), (19, "PHI")]
+
+
+class PlayState:
+    """ Game state at the snap of one play, before its result is applied. """
+    __slots__ = ("game_id", "index", "quarter", "seconds_remaining", "game_seconds_remaining",
+                 "home_score", "away_score", "possession", "score_differential", "drive_id",
+                 "drive_play", "down", "yards_to_go", "yards_to_goal", "play_type")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def as_dict(self):
+        row = {name: getattr(self, name) for name in self.__slots__}
+        row["play_type"] = self.play_type.name
+        return row
+
+
+def game_seconds_remaining(quarter, seconds_remaining):
+    """ Regulation time left; overtime only counts the current period. """
+    if quarter is None or seconds_remaining is None:
+        return None
+    if quarter > 4:
+        return seconds_remaining
+    return (4 - quarter) * QUARTER_SECONDS + seconds_remaining
+
+
+def new_game_state(header):
+    return {
+        "header": header,
+        "home_score": 0,
+        "away_score": 0,
+        "drive": None,      # open drive summary dict
+        "drives": [],
+        "half": 1,
+    }
+
+
+def _open_drive(state, play):
+    drive = {
+        "game_id": state["header"].game_id,
+        "drive_id": len(state["drives"]) + 1,
+        "team": play.possession,
+        "start_quarter": play.quarter,
+        "start_game_seconds_remaining": game_seconds_remaining(play.quarter, play.seconds_remaining),
+        "start_yards_to_goal": play.yards_to_goal,
+        "end_quarter": play.quarter,
+        "end_game_seconds_remaining": None,
+        "plays": 0,
+        "yards": 0,
+        "points": 0,
+        "result": None,
+    }
+    state["drives"].append(drive)
+    state["drive"] = drive
+    return drive
+
+
+def _close_drive(state, result=None):
+    drive = state["drive"]
+    if drive is not None and drive["result"] is None:
+        drive["result"] = result or "END_OF_HALF"
+    state["drive"] = None
+
+
+def drive_result(play, drive_team):
+    """ How a scrimmage play ends the drive, or None if the drive continues. """
+    if play.is_no_play:
+        return None
+    if play.points_scored and play.scoring_team == drive_team:
+        return "TOUCHDOWN" if play.points_scored >= 6 else "FIELD_GOAL"
+    if play.points_scored:
+        return "SAFETY" if play.points_scored == 2 else "TURNOVER_TD"
+    if play.interceptor is not None:
+        return "TURNOVER"
+    if play.play_type == PlayType.PUNT:
+        return "PUNT"
+    if play.play_type == PlayType.FIELD_GOAL:
+        return "MISSED_FG"
+    return None
+
+
+def process_play(state, play):
+    """
+    Feed one play (in game order) into the state machine.
+    Returns the PlayState at the snap; scores and drives are updated afterwards.
+    """
+    header = state["header"]
+
+    # A new half always starts a new drive
+    half = 1 if (play.quarter or 1) <= 2 else 2 if play.quarter <= 4 else 3
+    if half != state["half"]:
+        _close_drive(state)
+        state["half"] = half
+
+    drive = state["drive"]
+    # MSF puts the penalized team in possession of a penalty or no-play snap, even on defense,
+    # so these snaps never open or close a drive and keep the open drive's team
+    is_penalty_snap = play.play_type == PlayType.PENALTY or play.is_no_play
+    # Tries, including penalties snapped on a try, stay with the drive that scored
+    is_try = play.play_type in TRY_PLAYS or (
+        drive is not None and drive["result"] == "TOUCHDOWN" and (play.possession == drive["team"] or is_penalty_snap))
+
+    if play.play_type in NON_DRIVE_PLAYS:
+        _close_drive(state, drive["result"] if drive else None)
+        drive = None
+    elif is_penalty_snap and not is_try:
+        if drive is not None and drive["result"] is not None:
+            drive = None
+    elif not is_try and play.possession is not None:
+        if drive is None or drive["result"] is not None or drive["team"] != play.possession:
+            if drive is not None and drive["result"] is None:
+                # Possession changed without a recorded cause: fumble lost or turnover on downs
+                _close_drive(state, "DOWNS" if (drive.get("last_down") == 4) else "TURNOVER")
+            drive = _open_drive(state, play)
+
+    possession = drive["team"] if is_penalty_snap and drive is not None else play.possession
+    home = possession == header.home_team
+    differential = state["home_score"] - state["away_score"]
+    snapshot = PlayState(
+        game_id=header.game_id,
+        index=play.index,
+        quarter=play.quarter,
+        seconds_remaining=play.seconds_remaining,
+        game_seconds_remaining=game_seconds_remaining(play.quarter, play.seconds_remaining),
+        home_score=state["home_score"],
+        away_score=state["away_score"],
+        possession=possession,
+        score_differential=differential if home else -differential,
+        drive_id=drive["drive_id"] if drive else None,
+        drive_play=drive["plays"] + 1 if drive and not is_try else None,
+        down=play.down,
+        yards_to_go=play.yards_to_go,
+        yards_to_goal=play.yards_to_goal if possession == play.possession or play.yards_to_goal is None
+        else 100 - play.yards_to_goal,
+        play_type=play.play_type,
+    )
+
+    # Apply the result of the play
+    if play.points_scored:
+        if play.scoring_team == header.home_team:
+            state["home_score"] += play.points_scored
+        elif play.scoring_team == header.away_team:
+            state["away_score"] += play.points_scored
+
+    if drive is not None:
+        if is_try:
+            if play.scoring_team == drive["team"]:
+                drive["points"] += play.points_scored
+        else:
+            drive["plays"] += 1
+            if not play.is_no_play and play.play_type in (PlayType.RUSH, PlayType.PASS, PlayType.SACK):
+                drive["yards"] += play.yards or 0
+            drive["last_down"] = play.down
+            drive["end_quarter"] = play.quarter
+            drive["end_game_seconds_remaining"] = snapshot.game_seconds_remaining
+            result = drive_result(play, drive["team"])
+            if result:
+                drive["result"] = result
+                if play.scoring_team == drive["team"]:
+                    drive["points"] += play.points_scored
+
+    return snapshot
+
+
+def finish_game(state):
+    _close_drive(state)
+    for drive in state["drives"]:
+        drive.pop("last_down", None)
+    return state["drives"]
+
+
+def replay_game(header, plays):
+    """ Replay one parsed game. Returns (per-play states, per-drive summaries). """
+    state = new_game_state(header)
+    states = [process_play(state, play) for play in plays]
+    return states, finish_game(state)
+
+
+def replay_document(doc):
+    """ Worker: parse and replay one raw pbp document (or file path). """
+    header, plays = load_game_file(doc) if isinstance(doc, str) else parse_game(doc)
+    states, drives = replay_game(header, plays)
+    return header.game_id, [s.as_dict() for s in states], drives
+
+
+def season_query(season):
+    """ MSF pbp documents whose game started inside the given NFL season. """
+    return {"response.game.startTime": {"$gte": f"{season}-03-01", "$lt": f"{season + 1}-03-01"}}
+
+
+def reconstruct(sources, workers=None):
+    """ Replay many games in a process pool. sources are pbp documents or JSON file paths. """
+    states, drives = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for game_id, game_states, game_drives in pool.map(replay_document, sources, chunksize=4):
+            states.extend(game_states)
+            drives.extend(game_drives)
+            logging.info(f"Replayed game {game_id}: {len(game_states)} plays, {len(game_drives)} drives")
+    return states, drives
+
+
+def check_sample_game():
+    """ Replay SAMPLE_GAME and compare its turnover drives with the real game; returns the mismatch, if any. """
+    header, plays = load_game_file(SAMPLE_GAME)
+    _, drives = replay_game(header, plays)
+    turnovers = [(d["drive_id"], d["team"]) for d in drives if d["result"] in ("TURNOVER", "DOWNS")]
+    if turnovers != SAMPLE_TURNOVERS:
+        return f"expected turnover drives {SAMPLE_TURNOVERS}, got {turnovers}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruct per-play game state and drives from play-by-play.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--season", type=int, help="Replay every MSF pbp document for this NFL season")
+    source.add_argument("--files", nargs="+", help="MSF or Sportradar play-by-play JSON files")
+    source.add_argument("--check", action="store_true", help="Replay the bundled sample game and verify its drives")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.check:
+        mismatch = check_sample_game()
+        print(mismatch or f"{os.path.basename(SAMPLE_GAME)}: drives match the real game.")
+        sys.exit(1 if mismatch else 0)
+
+    setup_logging("game_state")
+
+    try:
+        # Documents stream from Mongo into the pool while it replays, so compute includes reading them
+        with metrics.timer("analysis_phase_seconds", analysis="game_state", phase="compute"):
+            if args.files:
+                states, drives = reconstruct(args.files, args.workers)
+                label = "files"
+            else:
+                client = get_mongo_client()
+                cursor = client[DATABASE_NAME][PBP_COLLECTION].find(season_query(args.season), {"_id": 0})
+                states, drives = reconstruct(cursor, args.workers)
+                label = str(args.season)
+    except pymongo.errors.PyMongoError:
+        logging.critical("Critical error reading play-by-play", exc_info=True)
+        sys.exit(1)
+
+    with metrics.timer("analysis_phase_seconds", analysis="game_state", phase="export"):
+        export_data(states, f"game_states_{label}")
+        export_data(drives, f"drives_{label}")
+    print(f"Reconstructed {len(states)} play states and {len(drives)} drives.")
+
+
+if __name__ == "__main__":
+    main()
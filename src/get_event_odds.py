@@ -1,28 +1,8 @@
-import os
 import sys
 import requests
 import logging
-from datetime import datetime
-from dotenv import load_dotenv, find_dotenv
-
-# Load environment variables
-load_dotenv(find_dotenv())
-
-# Setup logging: log file will be placed in the logs folder
-LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-log_filename = os.path.join(LOG_DIR, f"get_event_odds_{timestamp}.log")
-
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
-API_KEY = os.getenv("ODDS_API_KEY")
-BASE_URL = "https://api.the-odds-api.com/v4"
+import odds_event_index
+from sal_config import setting, setup_logging
 
 def get_historical_events(sport, date_str):
     """
@@ -31,9 +11,9 @@ def get_historical_events(sport, date_str):
     :param date_str: ISO8601 date string (e.g., '2024-09-26T12:00:00Z')
     :return: JSON response with events data.
     """
-    url = f"{BASE_URL}/historical/sports/{sport}/events"
+    url = f"{setting('ODDS_API_BASE_URL')}/historical/sports/{sport}/events"
     params = {
-        "apiKey": API_KEY,
+        "apiKey": setting("ODDS_API_KEY"),
         "date": date_str,  # Return closest snapshot equal to or earlier than this timestamp.
         "dateFormat": "iso"
     }
@@ -56,9 +36,9 @@ def get_event_odds(sport, event_id, snapshot_date, markets="h2h,spreads,totals",
     :param oddsFormat: Odds format ('american' or 'decimal')
     :return: JSON response with odds data.
     """
-    url = f"{BASE_URL}/historical/sports/{sport}/events/{event_id}/odds"
+    url = f"{setting('ODDS_API_BASE_URL')}/historical/sports/{sport}/events/{event_id}/odds"
     params = {
-        "apiKey": API_KEY,
+        "apiKey": setting("ODDS_API_KEY"),
         "regions": regions,
         "markets": markets,
         "oddsFormat": oddsFormat,
@@ -77,6 +57,7 @@ def main():
     Usage: python get_event_odds.py <snapshot_timestamp>
     Example: python get_event_odds.py 2024-09-26T12:00:00Z
     """
+    setup_logging("get_event_odds")
     if len(sys.argv) < 2:
         logging.error("Usage: python get_event_odds.py <snapshot_timestamp>")
         sys.exit(1)
@@ -84,28 +65,13 @@ def main():
     snapshot_timestamp = sys.argv[1]
     sport = "americanfootball_nfl"  # We're interested in NFL events.
 
-    # Fetch historical events for NFL on the given snapshot time.
-    events_data = get_historical_events(sport, snapshot_timestamp)
-    if events_data is None:
-        logging.error("No events data returned.")
-        sys.exit(1)
-
-    # Look for the event between Dallas Cowboys and New York Giants.
+    # Look for the next event between Dallas Cowboys and New York Giants.
     target_home = "dallas cowboys"
     target_away = "new york giants"
-    target_event = None
-
-    # The response contains a structure like:
-    # { "timestamp": "...", "previous_timestamp": "...", "next_timestamp": "...", "data": [ { event }, ... ] }
-    events_list = events_data.get("data", [])
-    logging.info(f"Found {len(events_list)} historical events in snapshot.")
 
-    for event in events_list:
-        home_team = event.get("home_team", "").lower().strip()
-        away_team = event.get("away_team", "").lower().strip()
-        if (target_home in home_team or target_home in away_team) and (target_away in home_team or target_away in away_team):
-            target_event = event
-            break
+    # Served from the local event index; the events endpoint is only called for unseen snapshots
+    target_event = odds_event_index.next_event(sport, target_home, target_away, snapshot_timestamp,
+                                               fetch=get_historical_events)
 
     if not target_event:
         logging.error(f"No event found for {target_home} vs {target_away}.")
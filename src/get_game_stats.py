@@ -4,32 +4,7 @@ import sys
 import requests
 import logging
 from datetime import datetime
-from dotenv import load_dotenv, find_dotenv
-
-# Load environment variables
-load_dotenv(find_dotenv())
-
-# Setup logging: log file will be placed in the logs folder
-LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-log_filename = os.path.join(LOG_DIR, f"get_game_stats_{timestamp}.log")
-
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
-# Read the Sportradar API key from .env
-SPORTRADAR_API_KEY = os.getenv("SPORTRADAR_API_KEY")
-if not SPORTRADAR_API_KEY:
-    logging.error("SPORTRADAR_API_KEY is not set in the .env file.")
-    sys.exit(1)
-
-# Base URL for the Sportradar NFL API
-BASE_URL = "https://api.sportradar.com/nfl/official/trial/v7/en"
+from sal_config import setting, setup_logging
 
 def get_game_stats(game_id):
     """
@@ -41,9 +16,9 @@ def get_game_stats(game_id):
     :param game_id: The ID of the game.
     :return: Parsed JSON data containing game statistics.
     """
-    url = f"{BASE_URL}/games/{game_id}/statistics.json"
+    url = f"{setting('SPORTRADAR_BASE_URL')}/games/{game_id}/statistics.json"
     params = {
-        "api_key": SPORTRADAR_API_KEY
+        "api_key": setting("SPORTRADAR_API_KEY")
     }
     logging.info(f"Fetching game statistics for game_id: {game_id}")
     response = requests.get(url, params=params)
@@ -61,9 +36,9 @@ def get_play_by_play(game_id):
     :param game_id: The unique ID of the game.
     :return: Parsed JSON with play-by-play data.
     """
-    url = f"{BASE_URL}/games/{game_id}/pbp.json"
+    url = f"{setting('SPORTRADAR_BASE_URL')}/games/{game_id}/pbp.json"
     params = {
-        "api_key": SPORTRADAR_API_KEY
+        "api_key": setting("SPORTRADAR_API_KEY")
     }
     logging.info(f"Fetching play-by-play data for game_id: {game_id}")
     response = requests.get(url, params=params)
@@ -91,6 +66,12 @@ def main():
     Scheduled Date (for reference): 2025-01-12T01:00:00+00:00
     Usage: python get_game_stats.py
     """
+    setup_logging("get_game_stats")
+    # Read the Sportradar API key from .env
+    if not setting("SPORTRADAR_API_KEY"):
+        logging.error("SPORTRADAR_API_KEY is not set in the .env file.")
+        sys.exit(1)
+
     # Hard-coded values for testing
     game_id = "2adf422c-e1e2-4cc9-8fd6-7ae89e73080e"
     scheduled_date = "2025-01-12T01:00:00+00:00"  # For logging reference only
@@ -104,7 +85,7 @@ def main():
         # Write the JSON data to the 'data' folder (ensure folder exists)
         data_dir = os.path.join(os.path.dirname(__file__), "..", "data")
         os.makedirs(data_dir, exist_ok=True)
-        output_filename = os.path.join(data_dir, f"pbp_{game_id}_{timestamp}.json")
+        output_filename = os.path.join(data_dir, f"pbp_{game_id}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
         write_pretty_json(pbp_data, output_filename)
     else:
         logging.error("No play-by-play data returned.")
@@ -1,52 +1,19 @@
 import requests
 import time
 import logging
-from pymongo import MongoClient
 from requests.auth import HTTPBasicAuth
-import os
 import base64
-from datetime import datetime
-import pytz  # Required for timezone conversion
-
-
-def get_nfl_game_date(utc_start_time):
-    """Convert UTC game start time to Eastern Time and extract the correct date."""
-    game_datetime = datetime.strptime(utc_start_time, "%Y-%m-%dT%H:%M:%S.%fZ")
-
-    # Convert UTC time to Eastern Time (ET)
-    utc_zone = pytz.utc
-    est_zone = pytz.timezone("America/New_York")
-    game_datetime = utc_zone.localize(game_datetime).astimezone(est_zone)
-
-    return game_datetime.strftime("%Y%m%d")  # Return formatted game date in YYYYMMDD format
-
-
-# Create 'logs' directory if it doesn't exist
-LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# Generate timestamped log file
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-LOG_FILE = os.path.join(LOG_DIR, f"msf_data_collection_{timestamp}.log")
-
-# Configure logging
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+import argparse
+import metrics
+from game_identity import msf_game_slug
+from sal_config import get_mongo_db, msf_auth, setting, setup_logging
 
 
 # MongoDB Configuration
-MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "nfl-msf"
 SEASON_COLLECTION = "seasons"
 PBP_COLLECTION = "pbp"
 
-# MySportsFeeds API Configuration
-API_KEY = "b6619248-cfe0-48d1-8c84-b2798b"
-PASSWORD = "MYSPORTSFEEDS"
-BASE_URL = "https://api.mysportsfeeds.com/v2.1/pull/nfl/"
 
 # Define allowed seasons and types
 #SEASONS = [2020, 2021, 2022, 2023]  # List of allowed seasons
@@ -55,14 +22,9 @@ BASE_URL = "https://api.mysportsfeeds.com/v2.1/pull/nfl/"
 SEASONS = [2025]  # List of allowed seasons
 SEASON_TYPES = ["Playoff"]
 
-# Connect to MongoDB
-client = MongoClient(MONGO_URI)
-db = client[DATABASE_NAME]
-seasons_collection = db[SEASON_COLLECTION]
-pbp_collection = db[PBP_COLLECTION]
-
 def fetch_and_store_season_responses():
     """Fetch and store season-level responses from the API."""
+    seasons_collection = get_mongo_db(DATABASE_NAME)[SEASON_COLLECTION]
     existing_records = {
         (record["season"], record["season_type"]) for record in seasons_collection.find(
             {"season": {"$in": SEASONS}, "season_type": {"$in": SEASON_TYPES}},
@@ -76,9 +38,9 @@ def fetch_and_store_season_responses():
                 logging.info(f"Skipping {season} {season_type} (already exists in MongoDB)")
                 continue
 
-            url = f"{BASE_URL}{season}-{season_type}/games.json"
+            url = f"{setting('MSF_BASE_URL')}{season}-{season_type}/games.json"
             try:
-                response = requests.get(url, auth=HTTPBasicAuth(API_KEY, PASSWORD))
+                response = requests.get(url, auth=HTTPBasicAuth(*msf_auth()))
                 response.raise_for_status()
 
                 data = response.json()
@@ -92,8 +54,10 @@ def fetch_and_store_season_responses():
 
             time.sleep(2)  # Increased sleep to avoid rate limits
 
-def fetch_and_store_pbp_responses():
-    """Fetch and store play-by-play (pbp) data for games in the selected seasons."""
+def get_games_to_fetch():
+    """Games in the selected seasons without a stored play-by-play document."""
+    pbp_collection = get_mongo_db(DATABASE_NAME)[PBP_COLLECTION]
+    seasons_collection = get_mongo_db(DATABASE_NAME)[SEASON_COLLECTION]
     existing_pbp_games = {
         record["game_id"] for record in pbp_collection.find({}, {"game_id": 1, "_id": 0})
     }
@@ -107,10 +71,9 @@ def fetch_and_store_pbp_responses():
         games = season_data.get("games", [])
 
         for game in games:
-            game_date = get_nfl_game_date(game["schedule"]["startTime"])
-            away_team = game["schedule"]["awayTeam"]["abbreviation"]
-            home_team = game["schedule"]["homeTeam"]["abbreviation"]
-            game_id = f"{game_date}-{away_team}-{home_team}"
+            game_id = msf_game_slug(game["schedule"]["startTime"],
+                                    game["schedule"]["awayTeam"]["abbreviation"],
+                                    game["schedule"]["homeTeam"]["abbreviation"])
 
             if game_id in existing_pbp_games:
                 logging.info(f"Skipping play-by-play for game {game_id} (already exists in MongoDB)")
@@ -118,15 +81,29 @@ def fetch_and_store_pbp_responses():
 
             games_to_fetch.append((game_id, season_year, season_type))
 
+    return games_to_fetch
+
+def get_games_from_manifest(manifest_path):
+    """The pbp gaps of a data_completeness manifest as (game_id, season, season_type) tuples."""
+    from data_completeness import load_gaps
+
+    return [(gap["game_id"], gap["season"], gap["season_type"]) for gap in load_gaps(manifest_path, "pbp")]
+
+def fetch_and_store_pbp_responses(games_to_fetch=None):
+    """Fetch and store play-by-play (pbp) data for games in the selected seasons (or only the given games)."""
+    pbp_collection = get_mongo_db(DATABASE_NAME)[PBP_COLLECTION]
+    if games_to_fetch is None:
+        games_to_fetch = get_games_to_fetch()
+
     for game_id, season_year, season_type in games_to_fetch:
         formatted_season_type = "playoff" if season_type.lower() == "playoffs" else season_type.lower()
-        url = f"{BASE_URL}{season_year}-{formatted_season_type}/games/{game_id}/playbyplay.json"
+        url = f"{setting('MSF_BASE_URL')}{season_year}-{formatted_season_type}/games/{game_id}/playbyplay.json"
 
         logging.info(f"[DEBUG] Fetching PBP for Game ID: {game_id}")
         logging.info(f"[DEBUG] Season Year: {season_year}, Season Type: {formatted_season_type}")
         logging.info(f"[DEBUG] Constructed URL: {url}")
 
-        auth_header = base64.b64encode(f"{API_KEY}:{PASSWORD}".encode()).decode()
+        auth_header = base64.b64encode(":".join(msf_auth()).encode()).decode()
         headers = {"Authorization": f"Basic {auth_header}"}
 
         try:
@@ -142,10 +119,12 @@ def fetch_and_store_pbp_responses():
 
             pbp_data = response.json()  # ✅ Catch JSON decoding error
             pbp_collection.insert_one({"game_id": game_id, "response": pbp_data})
+            metrics.inc("fetch_documents_total", collection=PBP_COLLECTION)
 
             logging.info(f"Stored play-by-play response for game {game_id}")
 
         except requests.exceptions.HTTPError as e:
+            metrics.inc("fetch_failures_total", collection=PBP_COLLECTION)
             if response.status_code == 403:
                 logging.warning(f"[WARNING] Forbidden access for {game_id}: {e}")
             else:
@@ -157,6 +136,18 @@ def fetch_and_store_pbp_responses():
 
         time.sleep(2)  # Increased sleep to 2 seconds to avoid rate limits
 
-# Run the data retrieval process
-fetch_and_store_season_responses()
-fetch_and_store_pbp_responses()
+def main():
+    setup_logging("msf_data_collection")
+    parser = argparse.ArgumentParser(description="Fetch MSF season schedules and play-by-play.")
+    parser.add_argument("--manifest", help="Gap manifest from data_completeness.py; only its missing pbp games are fetched")
+    args = parser.parse_args()
+
+    if args.manifest:
+        fetch_and_store_pbp_responses(get_games_from_manifest(args.manifest))
+    else:
+        # Run the data retrieval process
+        fetch_and_store_season_responses()
+        fetch_and_store_pbp_responses()
+
+if __name__ == "__main__":
+    main()
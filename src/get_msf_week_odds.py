@@ -1,49 +1,26 @@
 import requests
 import time
 import logging
-from pymongo import MongoClient
 from requests.auth import HTTPBasicAuth
-import os
-import base64
 import random
-from datetime import datetime
-
-# ✅ Setup Logging
-LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-LOG_FILE = os.path.join(LOG_DIR, f"weekly_odds_collection_{timestamp}.log")
-
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+import argparse
+import metrics
+from sal_config import get_mongo_db, msf_auth, setting, setup_logging
 
 # ✅ MongoDB Configuration
-MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "nfl-msf"
 ODDS_COLLECTION = "odds"
 SEASON_COLLECTION = "seasons"
 
-# ✅ MySportsFeeds API Configuration
-API_KEY = "b6619248-cfe0-48d1-8c84-b2798b"
-PASSWORD = "MYSPORTSFEEDS"
-BASE_URL = "https://api.mysportsfeeds.com/v2.1/pull/nfl/"
 
 # ✅ Seasons to Fetch
 SEASONS = [2020, 2021, 2022, 2023]
 SEASON_TYPES = ["preseason", "regular", "playoff"]
 
-# ✅ Connect to MongoDB
-client = MongoClient(MONGO_URI)
-db = client[DATABASE_NAME]
-odds_collection = db[ODDS_COLLECTION]
-seasons_collection = db[SEASON_COLLECTION]
-
 
 def get_unique_weeks(season_year, season_type):
     """Retrieve unique week numbers from the season data while preserving order."""
+    seasons_collection = get_mongo_db(DATABASE_NAME)[SEASON_COLLECTION]
     season_doc = seasons_collection.find_one(
         {"season": str(season_year), "season_type": {"$regex": f"^{season_type}$", "$options": "i"}}
     )
@@ -83,6 +60,7 @@ def get_weeks_by_season():
 
 def fetch_and_store_season_responses():
     """Fetch and store season-level responses from the API."""
+    seasons_collection = get_mongo_db(DATABASE_NAME)[SEASON_COLLECTION]
     existing_seasons = set(
         (doc["season"], doc["season_type"].lower())
         for doc in seasons_collection.find({}, {"season": 1, "season_type": 1, "_id": 0})
@@ -94,10 +72,10 @@ def fetch_and_store_season_responses():
                 logging.info(f"Skipping {season} {season_type} (already exists)")
                 continue  # ✅ Skip if already stored
 
-            url = f"{BASE_URL}{season}-{season_type}/games.json"
+            url = f"{setting('MSF_BASE_URL')}{season}-{season_type}/games.json"
 
             try:
-                response = requests.get(url, auth=HTTPBasicAuth(API_KEY, PASSWORD))
+                response = requests.get(url, auth=HTTPBasicAuth(*msf_auth()))
                 response.raise_for_status()
 
                 data = response.json()
@@ -111,9 +89,21 @@ def fetch_and_store_season_responses():
             time.sleep(1)  # ✅ Respect API rate limits
 
 
-def fetch_and_store_weekly_odds():
-    """Fetches weekly odds for all season types and stores them in MongoDB."""
-    weeks = get_weeks_by_season()  # ✅ Retrieve weeks for each season type
+def get_weeks_from_manifest(manifest_path):
+    """Builds the same {season: {season_type: [weeks]}} shape from the odds_weeks gaps of a manifest."""
+    from data_completeness import load_gaps
+
+    weeks = {}
+    for gap in load_gaps(manifest_path, "odds_weeks"):
+        weeks.setdefault(gap["season"], {}).setdefault(gap["season_type"], []).append(gap["week"])
+    return weeks
+
+
+def fetch_and_store_weekly_odds(weeks=None):
+    """Fetches weekly odds for all season types (or only the given weeks) and stores them in MongoDB."""
+    odds_collection = get_mongo_db(DATABASE_NAME)[ODDS_COLLECTION]
+    if weeks is None:
+        weeks = get_weeks_by_season()  # ✅ Retrieve weeks for each season type
     logging.info(f"[INFO] Full weeks dataset retrieved: {weeks}")
 
     for season_year, season_data in weeks.items():
@@ -124,7 +114,7 @@ def fetch_and_store_weekly_odds():
 
             for week in week_list:
                 season_formatted = f"{season_year}-{season_type}"
-                url = f"{BASE_URL}{season_formatted}/week/{week}/odds_gamelines.json"
+                url = f"{setting('MSF_BASE_URL')}{season_formatted}/week/{week}/odds_gamelines.json"
 
                 logging.info(f"[INFO] Fetching: {url}")
 
@@ -139,7 +129,7 @@ def fetch_and_store_weekly_odds():
 
                 for attempt in range(MAX_RETRIES):
                     try:
-                        response = requests.get(url, auth=HTTPBasicAuth(API_KEY, PASSWORD))
+                        response = requests.get(url, auth=HTTPBasicAuth(*msf_auth()))
                         response.raise_for_status()
 
                         # ✅ If request is successful, break the retry loop
@@ -151,11 +141,13 @@ def fetch_and_store_weekly_odds():
                                 "week": week,
                                 "response": odds_data
                             })
+                            metrics.inc("fetch_documents_total", collection=ODDS_COLLECTION)
                             logging.info(f"[INFO] Stored odds for {season_year} {season_type} Week {week}")
                             break  # ✅ Stop retrying if success
 
                     except requests.exceptions.RequestException as e:
                         logging.error(f"[ERROR] Attempt {attempt+1} failed for {season_year} {season_type} Week {week}: {e}")
+                        metrics.inc("fetch_failures_total", collection=ODDS_COLLECTION)
 
                         # ✅ If max retries reached, log failure
                         if attempt == MAX_RETRIES - 1:
@@ -169,10 +161,24 @@ def fetch_and_store_weekly_odds():
                 time.sleep(10)  # ✅ Respect API rate limits
 
 
-# ✅ Run the Season Retrieval Process
-fetch_and_store_season_responses()
+def main():
+    LOG_FILE = setup_logging("weekly_odds_collection")
+    parser = argparse.ArgumentParser(description="Fetch MSF season schedules and weekly odds.")
+    parser.add_argument("--manifest", help="Gap manifest from data_completeness.py; only its missing odds weeks are fetched")
+    args = parser.parse_args()
+
+    if args.manifest:
+        # ✅ Refetch only the weeks the completeness check reported missing
+        fetch_and_store_weekly_odds(get_weeks_from_manifest(args.manifest))
+    else:
+        # ✅ Run the Season Retrieval Process
+        fetch_and_store_season_responses()
+
+        # ✅ Run the Weekly Odds Retrieval
+        fetch_and_store_weekly_odds()
+
+    logging.info(f"[INFO] Weekly odds retrieval completed. Log file saved: {LOG_FILE}")
 
-# ✅ Run the Weekly Odds Retrieval
-fetch_and_store_weekly_odds()
 
-logging.info(f"[INFO] Weekly odds retrieval completed. Log file saved: {LOG_FILE}")
+if __name__ == "__main__":
+    main()
@@ -2,36 +2,17 @@ import requests
 import time
 import logging
 import argparse
-from pymongo import MongoClient
-from datetime import datetime
-import os
-
-# Ensure logs directory exists
-log_dir = "logs"
-os.makedirs(log_dir, exist_ok=True)
-
-# Logging configuration to write only to a file
-log_filename = os.path.join(log_dir, f"get_pbp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
-
-# MongoDB connection setup
-client = MongoClient("mongodb://localhost:27017/")
-db = client["nfl-data"]
-schedules_collection = db["schedules"]
-pbp_collection = db["pbp"]
-
-# API key and base URL
-API_KEY = "your_api_key_here"
-BASE_URL = "https://api.sportradar.com/nfl/official/trial/v7/en/games/{game_id}/pbp.json?api_key=" + API_KEY
+from sal_config import get_mongo_db, setting, setup_logging
+
+# MongoDB configuration
+DATABASE_NAME = "nfl-data"
+
 
 def should_fetch_pbp(game_info):
     """
     Checks if a given game's PBP record already exists in the MongoDB 'pbp' collection.
     """
+    pbp_collection = get_mongo_db(DATABASE_NAME)["pbp"]
     existing_pbp = pbp_collection.find_one({
         "summary.season.year": game_info["year"],
         "summary.season.type": game_info["type"],
@@ -54,6 +35,7 @@ def get_schedule_games(season):
     """
     Fetches all game details from the schedules collection for a given season.
     """
+    schedules_collection = get_mongo_db(DATABASE_NAME)["schedules"]
     game_data = []
     schedules = schedules_collection.find({"year": season}, {"weeks": 1, "year": 1, "type": 1})
 
@@ -82,15 +64,16 @@ def fetch_and_store_pbp(game):
     """
     Fetches PBP data from Sportradar for a given game and stores it in MongoDB if it's not already present.
     """
+    pbp_collection = get_mongo_db(DATABASE_NAME)["pbp"]
     game_id = game["game_id"]
 
     if not should_fetch_pbp(game):
         logging.info(f"Skipping existing PBP for game {game_id}")
         return
 
-    url = BASE_URL.format(game_id=game_id)
+    url = f"{setting('SPORTRADAR_BASE_URL')}/games/{game_id}/pbp.json"
     try:
-        response = requests.get(url)
+        response = requests.get(url, params={"api_key": setting("SPORTRADAR_API_KEY")})
         if response.status_code == 200:
             pbp_data = response.json()
             pbp_collection.insert_one(pbp_data)
@@ -109,6 +92,7 @@ if __name__ == "__main__":
     parser.add_argument("season", type=int, help="Season year (e.g., 2024)")
     args = parser.parse_args()
 
+    setup_logging("get_pbp", logging.DEBUG)
     season = args.season
 
     logging.info(f"Starting PBP retrieval process for season {season}...")
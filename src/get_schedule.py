@@ -1,50 +1,21 @@
-import os
 import sys
 import requests
 import json
 import logging
-from datetime import datetime
-from dotenv import load_dotenv, find_dotenv
-from pymongo import MongoClient
+import argparse
 import time
+from sal_config import get_mongo_db, setting, setup_logging
 
-# Load environment variables
-load_dotenv(find_dotenv())
-
-# Setup MongoDB Connection
-MONGO_URI = "mongodb://localhost:27017/"
+# MongoDB database
 DB_NAME = "nfl-data"
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]  # Connect to the database
-
-# Setup Logging
-LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-log_filename = os.path.join(LOG_DIR, f"get_schedule_{timestamp}.log")
-
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
-# Read API key
-SPORTRADAR_API_KEY = os.getenv("SPORTRADAR_API_KEY")
-if not SPORTRADAR_API_KEY:
-    logging.error("SPORTRADAR_API_KEY is not set in the .env file.")
-    sys.exit(1)
-
-# Base URL for the Sportradar API
-BASE_URL = "https://api.sportradar.com/nfl/official/trial/v7/en"
+
 
 def fetch_season_schedule(season_year, season_type):
     """
     Fetch the full season schedule from the Sportradar API.
     """
-    url = f"{BASE_URL}/games/{season_year}/{season_type}/schedule.json"
-    params = {"api_key": SPORTRADAR_API_KEY}
+    url = f"{setting('SPORTRADAR_BASE_URL')}/games/{season_year}/{season_type}/schedule.json"
+    params = {"api_key": setting("SPORTRADAR_API_KEY")}
 
     logging.info(f"Fetching NFL schedule for {season_year} {season_type} season...")
     response = requests.get(url, params=params)
@@ -61,6 +32,7 @@ def store_schedule_in_mongo(schedule_data, season_year, season_type):
     Store the full season schedule in MongoDB under 'schedules' collection.
     Prevents duplicate schedules.
     """
+    db = get_mongo_db(DB_NAME)
     if not schedule_data:
         logging.error("No valid schedule data to store.")
         return
@@ -77,6 +49,7 @@ def fetch_and_store_rosters(game_ids):
     Fetch and store the rosters for all game IDs in the season.
     Implements rate limiting to avoid 'Too Many Requests' error.
     """
+    db = get_mongo_db(DB_NAME)
     saved_game_ids = {doc["id"] for doc in db.rosters.find({}, {"id": 1})}
 
     for i, game_id in enumerate(game_ids):
@@ -84,8 +57,8 @@ def fetch_and_store_rosters(game_ids):
             logging.info(f"Skipping already saved roster for game_id: {game_id}")
             continue
 
-        url = f"{BASE_URL}/games/{game_id}/roster.json"
-        params = {"api_key": SPORTRADAR_API_KEY}
+        url = f"{setting('SPORTRADAR_BASE_URL')}/games/{game_id}/roster.json"
+        params = {"api_key": setting("SPORTRADAR_API_KEY")}
 
         logging.info(f"Fetching roster for game_id: {game_id}")
         response = requests.get(url, params=params)
@@ -110,22 +83,35 @@ def fetch_and_store_rosters(game_ids):
 def main():
     """
     Main function: Fetch schedule, store in MongoDB, extract game IDs, and optionally fetch rosters.
+    With --manifest, only the rosters a data_completeness gap manifest reports missing are fetched.
     """
-    # Parse command-line arguments
-    if len(sys.argv) != 4:
-        print("Usage: python get_schedule.py <mode> <season_year> <season_type>")
-        print("mode: 1 (schedule + rosters) | 2 (schedule only)")
-        print("season_type: PRE (Preseason) | REG (Regular) | PST (Postseason)")
+    parser = argparse.ArgumentParser(description="Fetch a Sportradar season schedule and its game rosters.")
+    parser.add_argument("mode", nargs="?", choices=["1", "2"], help="1 (schedule + rosters) | 2 (schedule only)")
+    parser.add_argument("season_year", nargs="?")
+    parser.add_argument("season_type", nargs="?", type=str.upper, choices=["PRE", "REG", "PST"],
+                        help="PRE (Preseason) | REG (Regular) | PST (Postseason)")
+    parser.add_argument("--manifest", help="Gap manifest from data_completeness.py; refetch its missing rosters only")
+    args = parser.parse_args()
+
+    setup_logging("get_schedule")
+
+    # Read API key
+    if not setting("SPORTRADAR_API_KEY"):
+        logging.error("SPORTRADAR_API_KEY is not set in the .env file.")
         sys.exit(1)
 
-    mode = sys.argv[1]  # "1" or "2"
-    season_year = sys.argv[2]
-    season_type = sys.argv[3].upper()
+    if args.manifest:
+        from data_completeness import load_gaps
 
-    if season_type not in ["PRE", "REG", "PST"]:
-        logging.error("Invalid season type! Use 'PRE', 'REG', or 'PST'.")
-        sys.exit(1)
+        game_ids = [gap["game_id"] for gap in load_gaps(args.manifest, "rosters")]
+        logging.info(f"Refetching {len(game_ids)} missing rosters from {args.manifest}.")
+        fetch_and_store_rosters(game_ids)
+        return
+
+    if not (args.mode and args.season_year and args.season_type):
+        parser.error("mode, season_year and season_type are required without --manifest")
 
+    mode, season_year, season_type = args.mode, args.season_year, args.season_type
     logging.info(f"Starting process for {season_year} {season_type} season...")
 
     schedule_data = fetch_season_schedule(season_year, season_type)
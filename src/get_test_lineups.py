@@ -3,40 +3,14 @@ import base64
 import json
 import logging
 import os
-import pymongo
-from datetime import datetime
-import pytz  # Required for timezone conversion
+from game_identity import msf_game_slug
+from sal_config import get_mongo_db, msf_auth, setting, setup_logging
 
-# MySportsFeeds API Credentials
-API_KEY = "b6619248-cfe0-48d1-8c84-b2798b"
-PASSWORD = "MYSPORTSFEEDS"
-BASE_URL = "https://api.mysportsfeeds.com/v2.1/pull/nfl/"
 
 # MongoDB Configuration
-MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "nfl-msf"
 LINEUP_COLLECTION = "lineups"
 
-# Connect to MongoDB
-client = pymongo.MongoClient(MONGO_URI)
-db = client[DATABASE_NAME]
-lineup_collection = db[LINEUP_COLLECTION]
-
-# Ensure necessary directories exist
-os.makedirs("logs", exist_ok=True)
-os.makedirs("data", exist_ok=True)
-
-# Create timestamped log file
-log_filename = os.path.join("logs", f"fetch_game_lineup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-
-# Configure logging
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
 # ✅ FIXED: Correct Season Format
 SEASON = "2024-regular"
 
@@ -48,32 +22,19 @@ GAME_INFO = {
     "homeTeam": "KC"
 }
 
-# ✅ Function to Convert UTC Time to Eastern Date
-def get_nfl_game_date(utc_start_time):
-    """Convert UTC game start time to Eastern Time and extract the correct date."""
-    game_datetime = datetime.strptime(utc_start_time, "%Y-%m-%dT%H:%M:%S.%fZ")
-
-    # Convert UTC time to Eastern Time (ET)
-    utc_zone = pytz.utc
-    est_zone = pytz.timezone("America/New_York")
-    game_datetime = utc_zone.localize(game_datetime).astimezone(est_zone)
-
-    return game_datetime.strftime("%Y%m%d")  # Return formatted game date in YYYYMMDD format
-
-# ✅ Apply Time Zone Fix
-GAME_DATE = get_nfl_game_date(GAME_INFO["startTime"])
-GAME_ID = f"{GAME_DATE}-{GAME_INFO['awayTeam']}-{GAME_INFO['homeTeam']}"
-
-# ✅ Using Base64 Authentication (like MySportsFeeds Example)
-auth_header = base64.b64encode(f"{API_KEY}:{PASSWORD}".encode()).decode()
-headers = {"Authorization": f"Basic {auth_header}"}
+# ✅ Game slug in Eastern Time, shared with the other MSF fetchers
+GAME_ID = msf_game_slug(GAME_INFO["startTime"], GAME_INFO["awayTeam"], GAME_INFO["homeTeam"])
 
 # ✅ Adding "force=true" to force fetching fresh data
 params = {"force": "true"}
 
 # Function to Fetch and Store Game Lineup
 def fetch_and_store_game_lineup():
-    url = f"{BASE_URL}{SEASON}/games/{GAME_ID}/lineup.json"
+    lineup_collection = get_mongo_db(DATABASE_NAME)[LINEUP_COLLECTION]
+    url = f"{setting('MSF_BASE_URL')}{SEASON}/games/{GAME_ID}/lineup.json"
+    # ✅ Using Base64 Authentication (like MySportsFeeds Example)
+    auth_header = base64.b64encode(":".join(msf_auth()).encode()).decode()
+    headers = {"Authorization": f"Basic {auth_header}"}
 
     logging.info(f"Fetching game lineup for Game ID: {GAME_ID} | URL: {url}")
 
@@ -88,6 +49,7 @@ def fetch_and_store_game_lineup():
         logging.info(f"✅ Successfully inserted game lineup for {GAME_ID} into MongoDB.")
 
         # Save to JSON file
+        os.makedirs("data", exist_ok=True)
         file_path = os.path.join("data", f"game_lineup_{GAME_ID}.json")
         with open(file_path, "w") as file:
             json.dump(data, file, indent=4)
@@ -106,6 +68,8 @@ def fetch_and_store_game_lineup():
         print(f"Unexpected Error: {e}")
 
 # Run the script
-fetch_and_store_game_lineup()
+if __name__ == "__main__":
+    setup_logging("fetch_game_lineup")
+    fetch_and_store_game_lineup()
 
-logging.info("🎉 Game lineup fetch completed.")
+    logging.info("🎉 Game lineup fetch completed.")
@@ -1,50 +1,14 @@
-import os
 import sys
 import requests
 import logging
-from datetime import datetime
-from dotenv import load_dotenv, find_dotenv
-import psycopg2
-
-# Load environment variables
-load_dotenv(find_dotenv())
-
-# Setup logging
-LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-log_filename = os.path.join(LOG_DIR, f"load_team_player_{timestamp}.log")
-
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
-# Read API key
-SPORTRADAR_API_KEY = os.getenv("SPORTRADAR_API_KEY")
-if not SPORTRADAR_API_KEY:
-    logging.error("SPORTRADAR_API_KEY is not set in the .env file.")
-    sys.exit(1)
-
-# Base URL for the Sportradar API
-BASE_URL = "https://api.sportradar.com/nfl/official/trial/v7/en"
+from sal_config import connect_db, release_db, setting, setup_logging
 
-# Connect to PostgreSQL
-def connect_db():
-    return psycopg2.connect(
-        host="localhost",
-        port=5432,
-        database="SAL-db",
-        user="postgres",
-        password=os.getenv("POSTGRES_PASSWORD")
-    )
 
+# Connect to PostgreSQL
 # Fetch all player profiles
 def fetch_player_profiles():
-    url = f"{BASE_URL}/league/players.json"
-    params = {"api_key": SPORTRADAR_API_KEY}
+    url = f"{setting('SPORTRADAR_BASE_URL')}/league/players.json"
+    params = {"api_key": setting("SPORTRADAR_API_KEY")}
     logging.info("Fetching all player profiles from Sportradar API...")
     
     response = requests.get(url, params=params)
@@ -128,7 +92,7 @@ def load_teams_and_players():
     player_profiles = fetch_player_profiles()
     if not player_profiles or "players" not in player_profiles:
         logging.error("No valid player data found. Exiting process.")
-        conn.close()
+        release_db(conn)
         return
 
     # Process each player
@@ -140,9 +104,19 @@ def load_teams_and_players():
 
     conn.commit()
     cursor.close()
-    conn.close()
+    release_db(conn)
     logging.info("Finished loading teams and players into PostgreSQL.")
 
 # Main execution
-if __name__ == "__main__":
+def main():
+    setup_logging("load_team_player")
+
+    # Read API key
+    if not setting("SPORTRADAR_API_KEY"):
+        logging.error("SPORTRADAR_API_KEY is not set in the .env file.")
+        sys.exit(1)
+
     load_teams_and_players()
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,16 @@ import sys
 import requests
 import json
 from datetime import datetime, timedelta
-from dotenv import load_dotenv, find_dotenv
 from process_json import process_saved_json, process_saved_json_debug  # Import the new module
-
-print("Current working directory:", os.getcwd())
-env_file = find_dotenv()
-load_dotenv(env_file)
+from sal_config import setting, setup_logging
 
 def fetch_historical_odds(sport_key, snapshot_time):
     """
     Fetch the historical odds snapshot for a given sport_key at or before snapshot_time (ISO8601).
     For example, snapshot_time = '2024-10-04T12:00:00Z'.
     """
-    api_key = os.getenv("ODDS_API_KEY")
-    base_url = f"https://api.the-odds-api.com/v4/historical/sports/{sport_key}/odds"
+    api_key = setting("ODDS_API_KEY")
+    base_url = f"{setting('ODDS_API_BASE_URL')}/historical/sports/{sport_key}/odds"
 
     params = {
         "apiKey": api_key,
@@ -82,6 +78,9 @@ def main():
         print("  2 <date>       Read saved JSON and insert data into PostgreSQL")
         sys.exit(1)
 
+    setup_logging("process_json")
+    print("Current working directory:", os.getcwd())
+
     option = sys.argv[1]
     print(f"sys.argv: {sys.argv}")
 
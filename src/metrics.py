@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import ContextDecorator
+from datetime import datetime, timezone
+
+# Exported names are prefixed so they sit together in a shared node_exporter textfile directory
+PREFIX = "sal_"
+
+# Seconds: request/query latencies up to whole pipeline stages
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+_lock = threading.Lock()
+_counters = {}      # (name, labels) -> value
+_histograms = {}    # (name, labels) -> {"count", "sum", "min", "max", "buckets"}
+_started_at = datetime.now(timezone.utc)
+_enabled = False
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """ Add to a counter, e.g. inc("etl_rows_total", len(rows), table="plays"). """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """ Record one sample (seconds for every *_seconds metric) in a histogram. """
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"count": 0, "sum": 0.0, "min": value, "max": value,
+                                            "buckets": [0] * len(BUCKETS)}
+        histogram["count"] += 1
+        histogram["sum"] += value
+        histogram["min"] = min(histogram["min"], value)
+        histogram["max"] = max(histogram["max"], value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+                break
+
+
+class timer(ContextDecorator):
+    """ Time a block or function into a histogram: `with timer("stage_seconds", stage="odds_etl"):`. """
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self._started, **self.labels)
+        return False
+
+
+def reset():
+    global _started_at
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _started_at = datetime.now(timezone.utc)
+
+
+# ------------------------------------------------------- Instrumentation
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    """
+    Time the layers below the scripts: HTTP round trips and JSON decoding (requests), Mongo
+    commands (pymongo command monitoring), Postgres statements (see pg_cursor_factory) and
+    log handlers. Call before the first client or pool is created; the hooks stay for the process.
+    """
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    _instrument_logging()
+    try:
+        _instrument_requests()
+    except ImportError:
+        pass
+    try:
+        _instrument_pymongo()
+    except ImportError:
+        pass
+
+
+def _instrument_requests():
+    from urllib.parse import urlsplit
+    from requests.adapters import HTTPAdapter
+    from requests.models import Response
+
+    send, decode = HTTPAdapter.send, Response.json
+
+    def timed_send(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        host = urlsplit(request.url).netloc
+        try:
+            response = send(self, request, *args, **kwargs)
+        except Exception:
+            observe("http_request_seconds", time.perf_counter() - started, host=host, status="error")
+            raise
+        observe("http_request_seconds", time.perf_counter() - started, host=host, status=response.status_code)
+        inc("http_response_bytes_total", int(response.headers.get("Content-Length") or 0), host=host)
+        return response
+
+    def timed_json(self, *args, **kwargs):
+        with timer("json_decode_seconds", source="http"):
+            return decode(self, *args, **kwargs)
+
+    HTTPAdapter.send, Response.json = timed_send, timed_json
+
+
+def _instrument_pymongo():
+    from pymongo import monitoring
+
+    class CommandTimer(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            observe("mongo_command_seconds", event.duration_micros / 1e6, command=event.command_name,
+                    database=event.database_name)
+
+        def failed(self, event):
+            observe("mongo_command_seconds", event.duration_micros / 1e6, command=event.command_name,
+                    database=event.database_name)
+            inc("mongo_command_errors_total", command=event.command_name)
+
+    monitoring.register(CommandTimer())
+
+
+def _instrument_logging():
+    handle = logging.Handler.handle
+
+    def timed_handle(self, record):
+        started = time.perf_counter()
+        try:
+            return handle(self, record)
+        finally:
+            observe("log_emit_seconds", time.perf_counter() - started, handler=type(self).__name__)
+
+    logging.Handler.handle = timed_handle
+
+
+def _statement(query):
+    """ Leading SQL keyword, the label Postgres timings are grouped by. """
+    if isinstance(query, bytes):
+        query = query[:64].decode("utf-8", "replace")
+    words = str(query).split(None, 1)
+    return words[0].upper() if words else "EMPTY"
+
+
+def pg_cursor_factory():
+    """ Cursor class for the shared pool: timing psycopg2 cursors when enabled, else None (the default). """
+    if not _enabled:
+        return None
+    from psycopg2.extensions import cursor
+
+    class TimingCursor(cursor):
+        def execute(self, query, vars=None):
+            with timer("postgres_statement_seconds", statement=_statement(query)):
+                return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            with timer("postgres_statement_seconds", statement=_statement(query)):
+                return super().executemany(query, vars_list)
+
+        def copy_expert(self, sql, file, size=8192):
+            with timer("postgres_statement_seconds", statement="COPY"):
+                return super().copy_expert(sql, file, size)
+
+    return TimingCursor
+
+
+# --------------------------------------------------------------- Output
+
+def collect():
+    """ Snapshot of every metric as plain dicts. """
+    with _lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(_counters.items())]
+        histograms = [{"name": name, "labels": dict(labels), **{k: v for k, v in h.items() if k != "buckets"},
+                       "buckets": dict(zip((str(b) for b in BUCKETS), h["buckets"]))}
+                      for (name, labels), h in sorted(_histograms.items())]
+    return {"started_at": _started_at.isoformat(), "collected_at": datetime.now(timezone.utc).isoformat(),
+            "counters": counters, "histograms": histograms}
+
+
+def _label_text(labels, extra=None):
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def prometheus_text(snapshot=None):
+    """ Prometheus text exposition format, as node_exporter's textfile collector reads it. """
+    snapshot = snapshot or collect()
+    lines, declared = [], set()
+    for counter in snapshot["counters"]:
+        name = PREFIX + counter["name"]
+        if name not in declared:
+            lines.append(f"# TYPE {name} counter")
+            declared.add(name)
+        lines.append(f"{name}{_label_text(counter['labels'])} {counter['value']}")
+    for histogram in snapshot["histograms"]:
+        name = PREFIX + histogram["name"]
+        if name not in declared:
+            lines.append(f"# TYPE {name} histogram")
+            declared.add(name)
+        cumulative = 0
+        for bound, count in histogram["buckets"].items():
+            cumulative += count
+            lines.append(f"{name}_bucket{_label_text(histogram['labels'], {'le': bound})} {cumulative}")
+        lines.append(f"{name}_bucket{_label_text(histogram['labels'], {'le': '+Inf'})} {histogram['count']}")
+        lines.append(f"{name}_sum{_label_text(histogram['labels'])} {histogram['sum']:.6f}")
+        lines.append(f"{name}_count{_label_text(histogram['labels'])} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path):
+    """ JSON for a .json path, Prometheus textfile otherwise; written atomically for the textfile collector. """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    snapshot = collect()
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            json.dump(snapshot, f, indent=4)
+        else:
+            f.write(prometheus_text(snapshot))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def format_summary(snapshot=None):
+    """ Per-run table: time spent per histogram series (largest first), then the counters. """
+    snapshot = snapshot or collect()
+    lines = [f"{'metric':<60} {'count':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+    for h in sorted(snapshot["histograms"], key=lambda h: h["sum"], reverse=True):
+        series = h["name"] + _label_text(h["labels"])
+        lines.append(f"{series[:60]:<60} {h['count']:>8} {h['sum']:>10.3f} "
+                     f"{1000 * h['sum'] / h['count']:>10.2f} {1000 * h['max']:>10.2f}")
+    for c in snapshot["counters"]:
+        lines.append(f"{(c['name'] + _label_text(c['labels']))[:60]:<60} {c['value']:>8}")
+    return "\n".join(lines)
@@ -0,0 +1,156 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+from game_identity import EASTERN, normalize_team, parse_utc, game_date
+
+INDEX_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "odds_events")
+
+# Loaded indexes, one per sport, kept for the life of the process
+_indexes = {}
+
+
+def team_key(name):
+    """ Canonical team key for NFL names; other sports fall back to the lower-cased name. """
+    return normalize_team(name) or (name or "").strip().lower()
+
+
+def pair_key(team_a, team_b):
+    """ Order-independent key for a matchup, so home/away does not have to be known up front. """
+    return "|".join(sorted([team_key(team_a), team_key(team_b)]))
+
+
+def date_key(value):
+    """ Eastern game date (YYYYMMDD) from a date string, ISO timestamp or datetime. """
+    if isinstance(value, str) and len(value.replace("-", "")) == 8:
+        return value.replace("-", "")
+    return game_date(value)
+
+
+def snapshot_time(game_day):
+    """ Snapshot requested for a game date: midnight Eastern, which lists every game played that day. """
+    midnight = EASTERN.localize(datetime.strptime(game_day, "%Y%m%d"))
+    return parse_utc(midnight).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def index_path(sport):
+    return os.path.join(INDEX_DIR, f"{sport}.json")
+
+
+def _add_event(index, event):
+    """ Store one event and register it under its (pair, date) and team lookups. """
+    event_id = event["id"]
+    home, away = team_key(event.get("home_team")), team_key(event.get("away_team"))
+    entry = {
+        "id": event_id,
+        "home_team": event.get("home_team"),
+        "away_team": event.get("away_team"),
+        "home": home,
+        "away": away,
+        "commence_time": event["commence_time"],
+        "game_date": game_date(event["commence_time"]),
+    }
+    previous = index["events"].get(event_id)
+    if previous is not None and previous["game_date"] != entry["game_date"]:
+        # Rescheduled: drop the stale (pair, date) entry before re-registering
+        index["by_pair"].pop((pair_key(home, away), previous["game_date"]), None)
+    index["events"][event_id] = entry
+    index["by_pair"][(pair_key(home, away), entry["game_date"])] = event_id
+    for team in (home, away):
+        if event_id not in index["by_team"].setdefault(team, []):
+            index["by_team"][team].append(event_id)
+
+
+def load_index(sport):
+    """ Load a sport's stored events once and build the in-memory lookups. """
+    if sport in _indexes:
+        return _indexes[sport]
+    index = {"sport": sport, "snapshots": {}, "events": {}, "by_pair": {}, "by_team": {}}
+    path = index_path(sport)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        index["snapshots"] = stored.get("snapshots", {})
+        for event in stored.get("events", []):
+            _add_event(index, event)
+    _indexes[sport] = index
+    return index
+
+
+def save_index(index):
+    """ Write the index atomically so an interrupted run never leaves a half-written file. """
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    path = index_path(index["sport"])
+    tmp_path = path + ".tmp"
+    events = sorted(index["events"].values(), key=lambda e: (e["commence_time"], e["id"]))
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"sport": index["sport"], "snapshots": index["snapshots"], "events": events}, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def add_snapshot(index, requested, events_data):
+    """ Merge one historical events response, remembering which snapshot time it answered. """
+    events = events_data.get("data", [])
+    for event in events:
+        _add_event(index, event)
+    index["snapshots"][requested] = events_data.get("timestamp", requested)
+    save_index(index)
+    logging.info(f"Indexed {len(events)} {index['sport']} events from snapshot {requested}")
+
+
+def ensure_snapshot(index, requested, fetch=None):
+    """ Fetch and index the snapshot for a requested time unless it is already stored. """
+    if requested in index["snapshots"]:
+        return True
+    if fetch is None:
+        from get_event_odds import get_historical_events as fetch
+    events_data = fetch(index["sport"], requested)
+    if events_data is None:
+        return False
+    add_snapshot(index, requested, events_data)
+    return True
+
+
+def find_event(sport, team_a, team_b, date, fetch=None):
+    """
+    Event for a matchup on an Eastern game date, in either home/away order.
+    The API is only called when the date is missing from the index and its snapshot was never fetched.
+    """
+    index = load_index(sport)
+    day = date_key(date)
+    key = (pair_key(team_a, team_b), day)
+    if key not in index["by_pair"]:
+        ensure_snapshot(index, snapshot_time(day), fetch)
+    event_id = index["by_pair"].get(key)
+    return index["events"][event_id] if event_id else None
+
+
+def events_for_team(sport, team, start=None, end=None):
+    """ Indexed events for one team, ordered by kickoff and optionally limited to [start, end). """
+    index = load_index(sport)
+    events = [index["events"][event_id] for event_id in index["by_team"].get(team_key(team), [])]
+    if start is not None:
+        events = [e for e in events if parse_utc(e["commence_time"]) >= parse_utc(start)]
+    if end is not None:
+        events = [e for e in events if parse_utc(e["commence_time"]) < parse_utc(end)]
+    return sorted(events, key=lambda e: e["commence_time"])
+
+
+def next_event(sport, team_a, team_b, after, fetch=None, horizon_days=14):
+    """
+    First matchup between two teams kicking off at or after a timestamp. Falls back to the
+    snapshot taken at that timestamp when nothing within the horizon is indexed yet.
+    """
+    end = parse_utc(after) + timedelta(days=horizon_days)
+    pair = pair_key(team_a, team_b)
+
+    def lookup():
+        for event in events_for_team(sport, team_a, after, end):
+            if pair_key(event["home"], event["away"]) == pair:
+                return event
+        return None
+
+    event = lookup()
+    if event is None and ensure_snapshot(load_index(sport), after, fetch):
+        event = lookup()
+    return event
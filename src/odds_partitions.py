@@ -0,0 +1,312 @@
+import sys
+import logging
+import argparse
+from datetime import datetime, timezone
+import psycopg2
+from sal_config import connect_db, release_db, setup_logging
+
+
+SCHEMA = "msf-nfl"
+ARCHIVE_SCHEMA = "msf-nfl-archive"
+
+# An NFL season's quotes run from the spring opening lines through the Super Bowl
+SEASON_FIRST_MONTH = 3    # March of the season year
+SEASON_LAST_MONTH = 2     # February of the following year
+
+
+def month_start(value):
+    """ First instant (UTC) of the month containing value (a datetime or an ISO string). """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(start):
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month):
+    return f"game_odds_{month.year}_{month.month:02d}"
+
+
+def months_between(first, last):
+    month, last = month_start(first), month_start(last)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+
+def season_months(season):
+    return list(months_between(datetime(season, SEASON_FIRST_MONTH, 1, tzinfo=timezone.utc),
+                               datetime(season + 1, SEASON_LAST_MONTH, 1, tzinfo=timezone.utc)))
+
+
+def is_partitioned(cursor):
+    cursor.execute("""
+        SELECT c.relkind = 'p' FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s AND c.relname = 'game_odds';
+    """, (SCHEMA,))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def existing_partitions(cursor):
+    cursor.execute("""
+        SELECT child.relname FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        JOIN pg_namespace n ON n.oid = parent.relnamespace
+        WHERE n.nspname = %s AND parent.relname = 'game_odds';
+    """, (SCHEMA,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+# ------------------------------------------------------------ Partitions
+
+def create_partition(cursor, month):
+    """
+    Create the month's partition. Rows that landed in the default partition for that month
+    are moved into it, since Postgres refuses a new partition the default already covers.
+    """
+    name, start, end = partition_name(month), month, next_month(month)
+    cursor.execute(f'CREATE TEMP TABLE game_odds_moving (LIKE "{SCHEMA}".game_odds_default) ON COMMIT DROP;')
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM "{SCHEMA}".game_odds_default WHERE as_of_time >= %s AND as_of_time < %s RETURNING *
+        )
+        INSERT INTO game_odds_moving SELECT * FROM moved;
+    """, (start, end))
+    # Bounds as plain literals; older servers reject cast expressions there
+    cursor.execute(f"""
+        CREATE TABLE "{SCHEMA}".{name} PARTITION OF "{SCHEMA}".game_odds FOR VALUES FROM (%s) TO (%s);
+    """, (start.isoformat(), end.isoformat()))
+    cursor.execute(f'INSERT INTO "{SCHEMA}".{name} SELECT * FROM game_odds_moving;')
+    cursor.execute("DROP TABLE game_odds_moving;")
+    logging.info(f"Created partition {name} [{start:%Y-%m-%d}, {end:%Y-%m-%d}).")
+    return name
+
+
+class PartitionRouter:
+    """
+    Maps an as_of_time to its monthly partition, creating partitions on first use, so the
+    ETL inserts straight into the partition instead of through the parent's tuple routing.
+    On a database that has not been migrated every row goes to the plain game_odds table.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.partitioned = is_partitioned(cursor)
+        self.partitions = existing_partitions(cursor) if self.partitioned else set()
+
+    def table_for(self, as_of_time):
+        if not self.partitioned:
+            return f'"{SCHEMA}".game_odds'
+        month = month_start(as_of_time)
+        name = partition_name(month)
+        if name not in self.partitions:
+            create_partition(self.cursor, month)
+            self.partitions.add(name)
+        return f'"{SCHEMA}".{name}'
+
+
+# ------------------------------------------------------------- Migration
+
+def migrate(conn, keep_heap=False):
+    """
+    Convert "msf-nfl".game_odds from a single heap into a table range-partitioned by
+    as_of_time month, in one transaction. Existing ids are kept and the id sequence continues
+    past them. The primary key becomes (id, as_of_time) because a partitioned table's unique
+    keys must contain the partition key. For the same reason a foreign key from odds to
+    game_odds(id) cannot be kept and is dropped; the ETL writes both tables together.
+    Column defaults, NOT NULL and CHECK constraints and the foreign keys game_odds itself
+    declares are carried over. Not carried over: other unique constraints, indexes beyond
+    create_indexes, triggers, grants, comments and storage settings.
+    """
+    with conn.cursor() as cursor:
+        if is_partitioned(cursor):
+            logging.info("game_odds is already partitioned.")
+            return False
+        cursor.execute(f'LOCK TABLE "{SCHEMA}".game_odds IN ACCESS EXCLUSIVE MODE;')
+
+        cursor.execute("""
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE contype = 'f' AND conrelid = %s::regclass ORDER BY conname;
+        """, (f'"{SCHEMA}".game_odds',))
+        outbound_fks = cursor.fetchall()
+
+        # Free the names the partitioned table will use
+        cursor.execute(f'ALTER TABLE "{SCHEMA}".game_odds RENAME TO game_odds_heap;')
+        cursor.execute(f'ALTER INDEX IF EXISTS "{SCHEMA}".game_odds_pkey RENAME TO game_odds_heap_pkey;')
+        cursor.execute(f"""
+            DO $$
+            DECLARE fk record;
+            BEGIN
+                FOR fk IN SELECT conname, conrelid::regclass AS child FROM pg_constraint
+                          WHERE contype = 'f' AND confrelid = '"{SCHEMA}".game_odds_heap'::regclass LOOP
+                    EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.child, fk.conname);
+                END LOOP;
+            END $$;
+        """)
+
+        cursor.execute(f"""
+            CREATE TABLE "{SCHEMA}".game_odds
+            (LIKE "{SCHEMA}".game_odds_heap INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (as_of_time);
+        """)
+        cursor.execute(f'CREATE SEQUENCE "{SCHEMA}".game_odds_part_id_seq OWNED BY "{SCHEMA}".game_odds.id;')
+        cursor.execute(f"""
+            ALTER TABLE "{SCHEMA}".game_odds
+            ALTER COLUMN id SET DEFAULT nextval('"{SCHEMA}".game_odds_part_id_seq'),
+            ALTER COLUMN id SET NOT NULL;
+        """)
+        cursor.execute(f'CREATE TABLE "{SCHEMA}".game_odds_default PARTITION OF "{SCHEMA}".game_odds DEFAULT;')
+
+        cursor.execute(f'SELECT min(as_of_time), max(as_of_time), max(id) FROM "{SCHEMA}".game_odds_heap;')
+        first, last, max_id = cursor.fetchone()
+        if first is not None:
+            for month in months_between(first, last):
+                create_partition(cursor, month)
+
+        # Copy before indexing; one index build per partition beats index maintenance per row
+        cursor.execute(f'INSERT INTO "{SCHEMA}".game_odds SELECT * FROM "{SCHEMA}".game_odds_heap;')
+        logging.info(f"Copied {cursor.rowcount} game_odds rows into the partitioned table.")
+        cursor.execute(f'ALTER TABLE "{SCHEMA}".game_odds ADD PRIMARY KEY (id, as_of_time);')
+        for name, definition in outbound_fks:
+            cursor.execute(f'ALTER TABLE "{SCHEMA}".game_odds ADD CONSTRAINT "{name}" {definition};')
+        create_indexes(cursor)
+        cursor.execute(f"""SELECT setval('"{SCHEMA}".game_odds_part_id_seq', %s, %s);""",
+                       (max_id or 1, max_id is not None))
+
+        if keep_heap:
+            logging.info("Kept the original table as game_odds_heap.")
+        else:
+            cursor.execute(f'DROP TABLE "{SCHEMA}".game_odds_heap;')
+    conn.commit()
+    return True
+
+
+def create_indexes(cursor):
+    """
+    Indexes declared on the parent cascade to every partition, present and future.
+    BRIN: as_of_time is close to insertion order, so a few pages cover the time-range scans.
+    Btree: the opening/closing lookups find the first/last quote per (game, book, market);
+    INCLUDE makes them index-only scans that never touch the heap.
+    """
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS game_odds_as_of_time_brin
+        ON "{SCHEMA}".game_odds USING brin (as_of_time);
+    """)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS game_odds_open_close_idx
+        ON "{SCHEMA}".game_odds (game_id, book_id, odds_type, as_of_time) INCLUDE (id, game_segment);
+    """)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS odds_game_odds_id_idx
+        ON "{SCHEMA}".odds (game_odds_id) INCLUDE (outcome_type, odds_american);
+    """)
+
+
+# ------------------------------------------------------ Detach / archive
+
+def detach_season(conn, season, mode="detach"):
+    """
+    Take a season's monthly partitions out of game_odds so analyses no longer scan them.
+      detach  - leave them as standalone tables in msf-nfl
+      archive - move them, and their odds rows, into the msf-nfl-archive schema
+      drop    - delete them and their odds rows
+    An archived partition can be put back with ALTER TABLE ... ATTACH PARTITION.
+    Returns the partition names handled.
+    """
+    with conn.cursor() as cursor:
+        if not is_partitioned(cursor):
+            raise RuntimeError("game_odds is not partitioned; run the migration first.")
+        attached = existing_partitions(cursor)
+        names = [partition_name(month) for month in season_months(season) if partition_name(month) in attached]
+        if mode == "archive":
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{ARCHIVE_SCHEMA}";')
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS "{ARCHIVE_SCHEMA}".odds_{season} (LIKE "{SCHEMA}".odds);
+            """)
+
+        for name in names:
+            cursor.execute(f'ALTER TABLE "{SCHEMA}".game_odds DETACH PARTITION "{SCHEMA}".{name};')
+            if mode == "archive":
+                cursor.execute(f"""
+                    WITH moved AS (
+                        DELETE FROM "{SCHEMA}".odds o USING "{SCHEMA}".{name} g
+                        WHERE o.game_odds_id = g.id RETURNING o.*
+                    )
+                    INSERT INTO "{ARCHIVE_SCHEMA}".odds_{season} SELECT * FROM moved;
+                """)
+                cursor.execute(f'ALTER TABLE "{SCHEMA}".{name} SET SCHEMA "{ARCHIVE_SCHEMA}";')
+            elif mode == "drop":
+                cursor.execute(f"""
+                    DELETE FROM "{SCHEMA}".odds o USING "{SCHEMA}".{name} g WHERE o.game_odds_id = g.id;
+                """)
+                cursor.execute(f'DROP TABLE "{SCHEMA}".{name};')
+            logging.info(f"{mode}: {name} ({season} season)")
+    conn.commit()
+    return names
+
+
+def list_partitions(cursor):
+    """ (partition, bounds, rows) for every attached partition, oldest first. """
+    cursor.execute("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples::bigint
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        JOIN pg_namespace n ON n.oid = parent.relnamespace
+        WHERE n.nspname = %s AND parent.relname = 'game_odds'
+        ORDER BY child.relname;
+    """, (SCHEMA,))
+    return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition msf-nfl.game_odds by month and detach or archive old seasons.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="Convert game_odds into a partitioned table")
+    migrate_parser.add_argument("--keep-heap", action="store_true", help="Keep the original table as game_odds_heap")
+    ensure_parser = commands.add_parser("ensure", help="Create the monthly partitions for a season ahead of loading")
+    ensure_parser.add_argument("season", type=int)
+    detach_parser = commands.add_parser("detach", help="Detach, archive or drop a season's partitions")
+    detach_parser.add_argument("season", type=int)
+    detach_parser.add_argument("--mode", choices=["detach", "archive", "drop"], default="detach")
+    commands.add_parser("list", help="Attached partitions with estimated row counts")
+    args = parser.parse_args()
+
+    setup_logging("odds_partitions")
+    conn = connect_db()
+    try:
+        if args.command == "migrate":
+            print("Migrated game_odds." if migrate(conn, args.keep_heap) else "game_odds is already partitioned.")
+        elif args.command == "ensure":
+            with conn.cursor() as cursor:
+                router = PartitionRouter(cursor)
+                if not router.partitioned:
+                    parser.error("game_odds is not partitioned; run the migration first.")
+                for month in season_months(args.season):
+                    router.table_for(month)
+            conn.commit()
+            print(f"Partitions ready for the {args.season} season.")
+        elif args.command == "detach":
+            names = detach_season(conn, args.season, args.mode)
+            print(f"{args.mode}: {', '.join(names) or 'no partitions for that season'}")
+        else:
+            with conn.cursor() as cursor:
+                for name, bounds, rows in list_partitions(cursor):
+                    print(f"{name:<24} {rows:>12}  {bounds}")
+    except (psycopg2.Error, RuntimeError) as e:
+        logging.critical("Partition maintenance failed", exc_info=True)
+        print(f"Failed: {e}")
+        sys.exit(1)
+    finally:
+        release_db(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import logging
+import argparse
+from pymongo import ASCENDING
+import metrics
+from sal_config import get_mongo_client, setup_logging
+
+
+# MongoDB Configuration
+DATABASE_NAME = "nfl-msf"
+ODDS_COLLECTION = "odds"
+OPENING_LINES_COLLECTION = "opening_lines"
+OPENING_LINES_STATE_COLLECTION = "opening_lines_state"
+
+# gameLines.lines wager arrays -> the object holding each quote
+WAGER_TYPES = {
+    "moneyLines": "moneyLine",
+    "pointSpreads": "pointSpread",
+    "overUnders": "overUnder",
+}
+
+# Fields the opening-line lookups filter on
+LOOKUP_INDEXES = [
+    [("wager_type", ASCENDING), ("game_segment", ASCENDING), ("line.homeLine.american", ASCENDING)],
+    [("wager_type", ASCENDING), ("game_segment", ASCENDING), ("line.awayLine.american", ASCENDING)],
+    [("wager_type", ASCENDING), ("game_segment", ASCENDING), ("line.homeSpread", ASCENDING)],
+    [("wager_type", ASCENDING), ("game_segment", ASCENDING), ("line.overUnder", ASCENDING)],
+    [("season", ASCENDING), ("season_type", ASCENDING), ("week", ASCENDING)],
+    [("game_id", ASCENDING)],
+]
+
+
+def opening_line_pipeline(odds_doc_ids, wager_key):
+    """
+    Opening quote per (game, sportsbook, wager type, game segment) for the given odds documents.
+    Filters first, projects away everything but the fields kept, then sorts and merges
+    the result into the derived collection.
+    """
+    item_key = WAGER_TYPES[wager_key]
+    wager_path = f"$gameLines.lines.{wager_key}"
+    return [
+        {"$match": {"_id": {"$in": odds_doc_ids}}},
+        {"$project": {"season": 1, "season_type": 1, "week": 1, "gameLines": "$response.gameLines"}},
+        {"$unwind": "$gameLines"},
+        {"$unwind": "$gameLines.lines"},
+        {"$unwind": wager_path},
+        {"$project": {
+            "season": 1, "season_type": 1, "week": 1,
+            "game": "$gameLines.game",
+            "sportsbook": "$gameLines.lines.source.name",
+            "as_of_time": f"{wager_path}.asOfTime",
+            "line": f"{wager_path}.{item_key}",
+        }},
+        {"$sort": {"game.id": 1, "sportsbook": 1, "line.gameSegment": 1, "as_of_time": 1}},
+        {"$group": {
+            "_id": {
+                "game_id": "$game.id",
+                "sportsbook": "$sportsbook",
+                "wager_type": item_key,
+                "game_segment": "$line.gameSegment",
+            },
+            "as_of_time": {"$first": "$as_of_time"},
+            "line": {"$first": "$line"},
+            "gameTime": {"$first": "$game.startTime"},
+            "awayTeam": {"$first": "$game.awayTeamAbbreviation"},
+            "homeTeam": {"$first": "$game.homeTeamAbbreviation"},
+            "season": {"$first": "$season"},
+            "season_type": {"$first": "$season_type"},
+            "week": {"$first": "$week"},
+        }},
+        {"$set": {
+            "game_id": "$_id.game_id",
+            "sportsbook": "$_id.sportsbook",
+            "wager_type": "$_id.wager_type",
+            "game_segment": "$_id.game_segment",
+        }},
+        {"$merge": {"into": OPENING_LINES_COLLECTION, "on": "_id",
+                    "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+def ensure_indexes(db):
+    opening_lines = db[OPENING_LINES_COLLECTION]
+    for keys in LOOKUP_INDEXES:
+        opening_lines.create_index(keys)
+
+
+def changed_odds_documents(db, force=False):
+    """ Odds week documents whose response.lastUpdatedOn differs from the last refresh. """
+    state = {doc["_id"]: doc.get("fingerprint")
+             for doc in db[OPENING_LINES_STATE_COLLECTION].find({}, {"fingerprint": 1})}
+    changed = []
+    for doc in db[ODDS_COLLECTION].find({}, {"season": 1, "season_type": 1, "week": 1,
+                                              "response.lastUpdatedOn": 1}):
+        fingerprint = doc.get("response", {}).get("lastUpdatedOn")
+        if force or doc["_id"] not in state or state[doc["_id"]] != fingerprint:
+            changed.append({"_id": doc["_id"], "season": doc.get("season"), "season_type": doc.get("season_type"),
+                            "week": doc.get("week"), "fingerprint": fingerprint})
+    return changed
+
+
+def refresh_opening_lines(db, force=False):
+    """
+    Recompute opening lines only for odds weeks that changed since the last refresh.
+    Returns the number of week documents re-aggregated.
+    """
+    ensure_indexes(db)
+    with metrics.timer("analysis_phase_seconds", analysis="opening_lines", phase="load"):
+        changed = changed_odds_documents(db, force)
+    if not changed:
+        logging.info("Opening lines are up to date.")
+        return 0
+
+    # The pipelines aggregate and $merge on the server, so compute includes writing opening_lines
+    with metrics.timer("analysis_phase_seconds", analysis="opening_lines", phase="compute"):
+        opening_lines = db[OPENING_LINES_COLLECTION]
+        for doc in changed:
+            opening_lines.delete_many({"season": doc["season"], "season_type": doc["season_type"], "week": doc["week"]})
+
+        odds_doc_ids = [doc["_id"] for doc in changed]
+        for wager_key in WAGER_TYPES:
+            db[ODDS_COLLECTION].aggregate(opening_line_pipeline(odds_doc_ids, wager_key), allowDiskUse=True)
+
+    with metrics.timer("analysis_phase_seconds", analysis="opening_lines", phase="export"):
+        state = db[OPENING_LINES_STATE_COLLECTION]
+        for doc in changed:
+            state.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+
+    logging.info(f"Refreshed opening lines for {len(changed)} odds week documents.")
+    return len(changed)
+
+
+def find_opening_lines(db, wager_type, query=None, game_segment="FULL"):
+    """ Filtered lookup against the derived collection, e.g. query={"line.overUnder": 47.5}. """
+    criteria = {"wager_type": wager_type, "game_segment": game_segment}
+    criteria.update(query or {})
+    return list(db[OPENING_LINES_COLLECTION].find(criteria, {"_id": 0}))
+
+
+def find_opening_moneylines(db, american, game_segment="FULL"):
+    """ Opening moneylines where either side opened at the given American price. """
+    return find_opening_lines(db, "moneyLine", {"$or": [
+        {"line.homeLine.american": american},
+        {"line.awayLine.american": american},
+    ]}, game_segment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the derived opening_lines collection.")
+    parser.add_argument("--force", action="store_true", help="Re-aggregate every odds week document")
+    args = parser.parse_args()
+
+    setup_logging("opening_lines")
+
+    client = get_mongo_client()
+    refreshed = refresh_opening_lines(client[DATABASE_NAME], args.force)
+    print(f"Refreshed {refreshed} odds week documents.")
+
+
+if __name__ == "__main__":
+    main()
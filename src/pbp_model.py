@@ -0,0 +1,387 @@
+"""
+Compact, provider-neutral play-by-play model.
+
+MSF playbyplay responses and Sportradar game pbp documents are parsed one game at a time into
+GameHeader / Play objects that use __slots__, interned team and player ids and an IntEnum play
+type, instead of holding the nested provider dicts (which repeat full player and team objects on
+every play). Team keys are the provider abbreviation / alias.
+"""
+
+import re
+import sys
+import json
+from enum import IntEnum
+
+QUARTER_SECONDS = 900
+TIMEOUTS_PER_HALF = 3
+TIMEOUTS_PER_OVERTIME = 2
+
+# Sportradar files team timeouts under "timeout" and sometimes "tv_timeout" events
+SR_TIMEOUT = re.compile(r"Timeout #\d+ by (\w+)")
+
+# Play sub-objects carried by MSF plays, in the order they are checked
+MSF_PLAY_KEYS = ["sack", "pass", "rush", "kick", "punt", "fieldGoalAttempt", "extraPointAttempt", "penalty"]
+
+
+class PlayType(IntEnum):
+    OTHER = 0
+    RUSH = 1
+    PASS = 2
+    SACK = 3
+    KICKOFF = 4
+    PUNT = 5
+    FIELD_GOAL = 6
+    EXTRA_POINT = 7
+    CONVERSION = 8
+    PENALTY = 9
+
+
+MSF_PLAY_TYPES = {
+    "rush": PlayType.RUSH,
+    "pass": PlayType.PASS,
+    "sack": PlayType.SACK,
+    "kick": PlayType.KICKOFF,
+    "punt": PlayType.PUNT,
+    "fieldGoalAttempt": PlayType.FIELD_GOAL,
+    "extraPointAttempt": PlayType.EXTRA_POINT,
+    "penalty": PlayType.PENALTY,
+}
+
+SPORTRADAR_PLAY_TYPES = {
+    "rush": PlayType.RUSH,
+    "pass": PlayType.PASS,
+    "kickoff": PlayType.KICKOFF,
+    "punt": PlayType.PUNT,
+    "field_goal": PlayType.FIELD_GOAL,
+    "extra_point": PlayType.EXTRA_POINT,
+    "conversion": PlayType.CONVERSION,
+    "penalty": PlayType.PENALTY,
+}
+
+
+def intern_id(value):
+    """ Share one object per distinct id: strings are interned, ints are already compact. """
+    if value is None or isinstance(value, int):
+        return value
+    return sys.intern(str(value))
+
+
+def season_of(start_time):
+    """ NFL season year for an ISO start time or a date; January/February games belong to the prior season. """
+    if not start_time:
+        return None
+    if isinstance(start_time, str):
+        year, month = int(start_time[:4]), int(start_time[5:7])
+    else:
+        year, month = start_time.year, start_time.month
+    return year - 1 if month < 3 else year
+
+
+def clock_seconds(clock):
+    """ "13:35" -> 815 """
+    if not clock:
+        return None
+    minutes, _, seconds = clock.partition(":")
+    return int(minutes or 0) * 60 + int(seconds or 0)
+
+
+class GameHeader:
+    __slots__ = ("provider", "game_id", "game_key", "start_time", "season", "home_team", "away_team",
+                 "home_score", "away_score")
+
+    def __init__(self, provider, game_id, game_key, start_time, season, home_team, away_team,
+                 home_score=None, away_score=None):
+        self.provider = provider
+        self.game_id = intern_id(game_id)
+        self.game_key = game_key
+        self.start_time = start_time
+        self.season = season
+        self.home_team = intern_id(home_team)
+        self.away_team = intern_id(away_team)
+        self.home_score = home_score
+        self.away_score = away_score
+
+    def __repr__(self):
+        return f"GameHeader({self.provider} {self.game_id} {self.away_team}@{self.home_team} {self.start_time})"
+
+
+class Play:
+    __slots__ = ("index", "quarter", "seconds_remaining", "down", "yards_to_go", "yards_to_goal",
+                 "possession", "play_type", "yards", "passer", "receiver", "rusher", "kicker", "returner",
+                 "interceptor", "tacklers", "is_complete", "is_touchdown", "is_no_play",
+                 "points_scored", "scoring_team", "home_timeouts", "away_timeouts", "description")
+
+    def __init__(self, index, quarter, seconds_remaining, down, yards_to_go, yards_to_goal, possession,
+                 play_type, yards=None, passer=None, receiver=None, rusher=None, kicker=None, returner=None,
+                 interceptor=None, tacklers=(), is_complete=False, is_touchdown=False, is_no_play=False,
+                 points_scored=0, scoring_team=None, home_timeouts=None, away_timeouts=None, description=None):
+        self.index = index
+        self.quarter = quarter
+        self.seconds_remaining = seconds_remaining   # left in the quarter
+        self.down = down
+        self.yards_to_go = yards_to_go
+        self.yards_to_goal = yards_to_goal           # distance from the line of scrimmage to the opponent's goal line
+        self.possession = intern_id(possession)
+        self.play_type = play_type
+        self.yards = yards
+        self.passer = intern_id(passer)
+        self.receiver = intern_id(receiver)
+        self.rusher = intern_id(rusher)
+        self.kicker = intern_id(kicker)
+        self.returner = intern_id(returner)
+        self.interceptor = intern_id(interceptor)
+        self.tacklers = tuple(intern_id(t) for t in tacklers)
+        self.is_complete = is_complete
+        self.is_touchdown = is_touchdown
+        self.is_no_play = is_no_play
+        self.points_scored = points_scored
+        self.scoring_team = intern_id(scoring_team)
+        self.home_timeouts = home_timeouts           # left in the half; None when the provider does not report timeouts
+        self.away_timeouts = away_timeouts
+        self.description = description
+
+    def __repr__(self):
+        return (f"Play({self.index} Q{self.quarter} {self.seconds_remaining}s {self.possession} "
+                f"{self.play_type.name} {self.yards})")
+
+
+def yards_to_goal(possession, side, yardline):
+    """ Distance to the opponent's goal line for a line of scrimmage reported as (side, yardline). """
+    if yardline is None:
+        return None
+    if side is None or yardline == 50:
+        return 50 if yardline == 50 else None
+    return 100 - yardline if side == possession else yardline
+
+
+# ---------------------------------------------------------------- MSF
+
+def _msf_id(player):
+    return player.get("id") if player else None
+
+
+def _msf_scoring(play_type, detail, offense, defense):
+    """ (points, scoring team) for one MSF play. MSF does not carry a running score. """
+    if detail.get("isNoPlay"):
+        return 0, None
+    if play_type in (PlayType.FIELD_GOAL, PlayType.EXTRA_POINT):
+        return (3 if play_type == PlayType.FIELD_GOAL else 1, offense) if detail.get("isGood") else (0, None)
+    if play_type in (PlayType.KICKOFF, PlayType.PUNT):
+        if detail.get("isTouchdown"):
+            return 6, (detail.get("retrievingTeam") or {}).get("abbreviation") or defense
+        if detail.get("isSafety"):
+            return 2, defense
+        return 0, None
+    if detail.get("isEndedWithTouchdown"):
+        if detail.get("isTwoPointConversion"):
+            return 2, offense
+        return 6, defense if detail.get("interceptingPlayer") else offense
+    return 0, None
+
+
+def parse_msf_play(index, play, home_team, away_team):
+    status = play.get("playStatus") or {}
+    possession = (status.get("teamInPossession") or {}).get("abbreviation")
+    scrimmage = status.get("lineOfScrimmage") or {}
+    elapsed = status.get("secondsElapsed")
+
+    key = next((k for k in MSF_PLAY_KEYS if play.get(k)), None)
+    detail = play.get(key) or {}
+    play_type = MSF_PLAY_TYPES.get(key, PlayType.OTHER)
+
+    offense = (detail.get("team") or detail.get("kickingTeam") or {}).get("abbreviation") or possession
+    defense = home_team if offense == away_team else away_team if offense == home_team else None
+
+    if play_type == PlayType.RUSH:
+        yards = detail.get("yardsRushed")
+    elif play_type == PlayType.PASS:
+        yards = detail.get("totalYardsGained")
+    elif play_type == PlayType.SACK:
+        yards = -(detail.get("yardsLost") or 0)
+    else:
+        yards = detail.get("yardsKicked")
+
+    points, scoring_team = _msf_scoring(play_type, detail, offense, defense)
+    return Play(
+        index=index,
+        quarter=status.get("quarter"),
+        seconds_remaining=QUARTER_SECONDS - elapsed if elapsed is not None else None,
+        down=status.get("currentDown"),
+        yards_to_go=status.get("yardsRemaining"),
+        yards_to_goal=yards_to_goal(possession, (scrimmage.get("team") or {}).get("abbreviation"),
+                                    scrimmage.get("yardLine")),
+        possession=possession,
+        play_type=play_type,
+        yards=yards,
+        passer=_msf_id(detail.get("passingPlayer")),
+        receiver=_msf_id(detail.get("receivingPlayer")),
+        rusher=_msf_id(detail.get("rushingPlayer")),
+        kicker=_msf_id(detail.get("kickingPlayer")),
+        returner=_msf_id(detail.get("retrievingPlayer")),
+        interceptor=_msf_id(detail.get("interceptingPlayer")),
+        tacklers=[_msf_id(detail.get(k)) for k in ("soloTacklingPlayer", "assistedTacklingPlayer1",
+                                                   "assistedTacklingPlayer2") if detail.get(k)],
+        is_complete=bool(detail.get("isCompleted")),
+        is_touchdown=bool(detail.get("isEndedWithTouchdown") or detail.get("isTouchdown")),
+        is_no_play=bool(detail.get("isNoPlay")),
+        points_scored=points,
+        scoring_team=scoring_team,
+        description=play.get("description"),
+    )
+
+
+def parse_msf_game(response, game_key=None):
+    """ Parse one MSF playbyplay response into (GameHeader, [Play]). """
+    game = response.get("game", {})
+    home_team = (game.get("homeTeam") or {}).get("abbreviation")
+    away_team = (game.get("awayTeam") or {}).get("abbreviation")
+    header = GameHeader("msf", game.get("id"), game_key, game.get("startTime"), season_of(game.get("startTime")),
+                        home_team, away_team)
+
+    plays = [parse_msf_play(index, play, home_team, away_team) for index, play in enumerate(response.get("plays", []))]
+    header.home_score = sum(p.points_scored for p in plays if p.scoring_team == home_team)
+    header.away_score = sum(p.points_scored for p in plays if p.scoring_team == away_team)
+    return header, plays
+
+
+# ---------------------------------------------------------- Sportradar
+
+def _sr_events(doc):
+    """ Plays and timeout events in game order: top-level events and the events nested in each drive. """
+    for period in doc.get("periods", []):
+        for item in period.get("pbp", []):
+            events = item.get("events", []) if item.get("type") == "drive" else [item]
+            for event in events:
+                if event.get("type") == "play" or "timeout" in (event.get("event_type") or ""):
+                    yield period.get("number"), event
+
+
+def parse_sportradar_play(index, quarter, event, previous_score, home_team, away_team):
+    situation = event.get("start_situation") or {}
+    possession = (situation.get("possession") or {}).get("alias")
+    location = situation.get("location") or {}
+
+    stats = {}
+    tacklers = []
+    interceptor = None
+    nullified = False
+    touchdown = False
+    for stat in event.get("statistics", []):
+        stat_type = stat.get("stat_type")
+        player = (stat.get("player") or {}).get("id")
+        nullified = nullified or bool(stat.get("nullified"))
+        touchdown = touchdown or bool(stat.get("touchdown"))
+        if stat_type == "defense":
+            if stat.get("tackle") or stat.get("ast_tackle"):
+                tacklers.append(player)
+            if stat.get("interception"):
+                interceptor = player
+        elif stat_type not in stats:
+            stats[stat_type] = stat
+
+    play_type = SPORTRADAR_PLAY_TYPES.get(event.get("play_type"), PlayType.OTHER)
+    if play_type == PlayType.PASS and stats.get("pass", {}).get("sack"):
+        play_type = PlayType.SACK
+
+    if play_type == PlayType.SACK:
+        yards = -(stats["pass"].get("sack_yards") or 0)
+    elif play_type in (PlayType.RUSH, PlayType.PASS):
+        yards = stats.get("rush" if play_type == PlayType.RUSH else "pass", {}).get("yards")
+    else:
+        kick = stats.get("kick") or stats.get("punt") or stats.get("field_goal") or {}
+        yards = kick.get("yards")
+
+    kicker_stat = stats.get("kick") or stats.get("punt") or stats.get("field_goal") or stats.get("extra_point") or {}
+
+    home_points = event.get("home_points", previous_score[0])
+    away_points = event.get("away_points", previous_score[1])
+    if home_points > previous_score[0]:
+        points, scoring_team = home_points - previous_score[0], home_team
+    elif away_points > previous_score[1]:
+        points, scoring_team = away_points - previous_score[1], away_team
+    else:
+        points, scoring_team = 0, None
+
+    play = Play(
+        index=index,
+        quarter=quarter,
+        seconds_remaining=clock_seconds(situation.get("clock") or event.get("clock")),
+        down=situation.get("down"),
+        yards_to_go=situation.get("yfd"),
+        yards_to_goal=yards_to_goal(possession, location.get("alias"), location.get("yardline")),
+        possession=possession,
+        play_type=play_type,
+        yards=yards,
+        passer=(stats.get("pass", {}).get("player") or {}).get("id"),
+        receiver=(stats.get("receive", {}).get("player") or {}).get("id"),
+        rusher=(stats.get("rush", {}).get("player") or {}).get("id"),
+        kicker=(kicker_stat.get("player") or {}).get("id"),
+        returner=(stats.get("return", {}).get("player") or {}).get("id"),
+        interceptor=interceptor,
+        tacklers=tacklers,
+        is_complete=bool(stats.get("pass", {}).get("complete")),
+        is_touchdown=touchdown,
+        is_no_play=nullified,
+        points_scored=points,
+        scoring_team=scoring_team,
+        description=event.get("description"),
+    )
+    return play, (home_points, away_points)
+
+
+def parse_sportradar_game(doc):
+    """ Parse one Sportradar game pbp document into (GameHeader, [Play]). """
+    summary = doc.get("summary", {})
+    home, away = summary.get("home", {}), summary.get("away", {})
+    header = GameHeader("sportradar", doc.get("id"), None, doc.get("scheduled"),
+                        summary.get("season", {}).get("year"), home.get("alias"), away.get("alias"),
+                        home.get("points"), away.get("points"))
+
+    plays = []
+    score = (0, 0)
+    timeouts = {header.home_team: TIMEOUTS_PER_HALF, header.away_team: TIMEOUTS_PER_HALF}
+    current_quarter = 1
+    for quarter, event in _sr_events(doc):
+        if quarter != current_quarter:
+            if quarter == 3 or quarter > 4:
+                remaining = TIMEOUTS_PER_HALF if quarter == 3 else TIMEOUTS_PER_OVERTIME
+                timeouts = {team: remaining for team in timeouts}
+            current_quarter = quarter
+
+        if event.get("type") != "play":
+            match = SR_TIMEOUT.search(event.get("description") or "")
+            if match and match.group(1) in timeouts:
+                timeouts[match.group(1)] = max(timeouts[match.group(1)] - 1, 0)
+            continue
+
+        play, score = parse_sportradar_play(len(plays), quarter, event, score, header.home_team, header.away_team)
+        play.home_timeouts = timeouts[header.home_team]
+        play.away_timeouts = timeouts[header.away_team]
+        plays.append(play)
+    return header, plays
+
+
+# -------------------------------------------------------------- Loaders
+
+def parse_game(doc, game_key=None):
+    """ Detect the provider from the document shape and parse it. """
+    if "periods" in doc:
+        return parse_sportradar_game(doc)
+    return parse_msf_game(doc.get("response", doc), game_key or doc.get("game_id"))
+
+
+def load_game_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_game(json.load(f))
+
+
+def iter_game_files(paths):
+    """ Parse files one game at a time; only the current game's raw JSON is held in memory. """
+    for path in paths:
+        yield load_game_file(path)
+
+
+def iter_mongo_games(collection, query=None):
+    """ Lazily parse MSF (nfl-msf.pbp) or Sportradar (nfl-data.pbp) documents from a Mongo collection. """
+    for doc in collection.find(query or {}):
+        yield parse_game(doc)
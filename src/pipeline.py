@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import importlib
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import metrics
+from sal_config import connect_db, release_db, get_mongo_db, setup_logging
+
+# Last successful fingerprint of every stage
+STATE_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "pipeline_state.json")
+
+DEFAULT_WORKERS = 4
+
+# Declared DAG: what each stage runs ("module:function"), the stages it waits for, and the
+# stores it reads. A stage with no inputs (an API fetch) always runs; the fetchers skip
+# documents they already hold. Modules are imported only when their stage runs.
+STAGES = {
+    "seasons": {
+        "run": "get_msf_week_odds:fetch_and_store_season_responses",
+        "after": [],
+        "inputs": [],
+    },
+    "weekly_odds": {
+        "run": "get_msf_week_odds:fetch_and_store_weekly_odds",
+        "after": ["seasons"],
+        "inputs": [],
+    },
+    "season_etl": {
+        "run": "ETL_season_2_postgres:load_seasons",
+        "after": ["seasons"],
+        "inputs": [("mongo", "nfl-msf", "seasons")],
+    },
+    "odds_etl": {
+        "run": "pipeline:load_odds_changes",
+        "after": ["weekly_odds", "season_etl"],
+        "inputs": [("mongo", "nfl-msf", "odds")],
+    },
+    "opening_lines": {
+        "run": "pipeline:refresh_opening_lines",
+        "after": ["weekly_odds"],
+        "inputs": [("mongo", "nfl-msf", "odds")],
+    },
+    "game_results": {
+        "run": "pipeline:refresh_game_results",
+        "after": ["season_etl"],
+        "inputs": [("postgres", "games")],
+    },
+    "pbp": {
+        "run": "get_msf_season_pbp:fetch_and_store_pbp_responses",
+        "after": ["seasons"],
+        "inputs": [],
+    },
+    "pbp_etl": {
+        "run": "ETL_pbp_2_postgres:load_plays",
+        "after": ["pbp", "season_etl"],
+        "inputs": [("mongo", "nfl-msf", "pbp")],
+    },
+}
+
+_state_lock = threading.Lock()
+
+
+def refresh_opening_lines():
+    from opening_lines import DATABASE_NAME, refresh_opening_lines as refresh
+    return refresh(get_mongo_db(DATABASE_NAME))
+
+
+def load_odds_changes():
+    # The stage re-runs whenever the odds collection grows; change-only loading skips every
+    # quote at or before a stored last_seen_time, so re-runs do not duplicate game_odds
+    from ETL_odds_2_postgres import load_odds
+    return load_odds(changes_only=True)
+
+
+def refresh_game_results():
+    from game_results_index import load_game_results
+    return len(load_game_results("postgres"))
+
+
+# ----------------------------------------------------------- Fingerprints
+
+def mongo_input_fingerprint(db_name, collection_name):
+    """ Document count and newest _id; every fetcher appends documents rather than editing them. """
+    collection = get_mongo_db(db_name)[collection_name]
+    newest = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return [collection.count_documents({}), str(newest["_id"]) if newest else None]
+
+
+def postgres_input_fingerprint(cursor, table):
+    cursor.execute(f'SELECT count(*), max(id)::text FROM "msf-nfl".{table};')
+    return list(cursor.fetchone())
+
+
+def stage_fingerprint(name):
+    """ The stage definition plus the current state of each store it reads; None if it has no inputs. """
+    stage = STAGES[name]
+    if not stage["inputs"]:
+        return None
+    fingerprint = {"run": stage["run"]}
+    conn = None
+    try:
+        for source in stage["inputs"]:
+            if source[0] == "mongo":
+                fingerprint["/".join(source)] = mongo_input_fingerprint(source[1], source[2])
+            else:
+                conn = conn or connect_db()
+                with conn.cursor() as cursor:
+                    fingerprint["/".join(source)] = postgres_input_fingerprint(cursor, source[1])
+    finally:
+        if conn is not None:
+            release_db(conn)
+    return fingerprint
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+# --------------------------------------------------------------- Runner
+
+def resolve(run):
+    module_name, function_name = run.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def select_stages(targets=None):
+    """ The requested stages plus everything upstream of them, in declaration order. """
+    if not targets:
+        return list(STAGES)
+    unknown = [name for name in targets if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown pipeline stage(s): {', '.join(unknown)}")
+    selected, pending = set(), list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(STAGES[name]["after"])
+    return [name for name in STAGES if name in selected]
+
+
+def run_stage(name, state, force=False):
+    """
+    Run one stage unless its inputs match the last successful run. Returns 'ran' or 'skipped'.
+    A stage fails by raising; its fingerprint is then not saved, so the next run retries it.
+    """
+    fingerprint = stage_fingerprint(name)
+    previous = state.get(name, {}).get("fingerprint")
+    if not force and fingerprint is not None and fingerprint == previous:
+        logging.info(f"[{name}] inputs unchanged since {state[name]['completed_at']}, skipping")
+        metrics.inc("stage_runs_total", stage=name, status="skipped")
+        return "skipped"
+
+    logging.info(f"[{name}] running {STAGES[name]['run']}")
+    started = datetime.now(timezone.utc)
+    with metrics.timer("stage_seconds", stage=name):
+        resolve(STAGES[name]["run"])()
+    metrics.inc("stage_runs_total", stage=name, status="ran")
+    logging.info(f"[{name}] finished in {(datetime.now(timezone.utc) - started).total_seconds():.1f}s")
+
+    with _state_lock:
+        state[name] = {"fingerprint": fingerprint, "completed_at": datetime.now(timezone.utc).isoformat()}
+        save_state(state)
+    return "ran"
+
+
+def run_pipeline(targets=None, force=False, workers=DEFAULT_WORKERS, dry_run=False):
+    """
+    Execute the selected stages in dependency order, running every stage whose upstream
+    stages are done in parallel. A failed stage blocks its dependents but not its siblings.
+    Returns {stage: 'ran' | 'skipped' | 'failed' | 'blocked' | 'planned'}.
+    """
+    stages = select_stages(targets)
+    if dry_run:
+        return {name: "planned" for name in stages}
+
+    state = load_state()
+    results = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while len(results) < len(stages):
+            for name in stages:
+                if name in results or name in running.values():
+                    continue
+                upstream = [results.get(dep) for dep in STAGES[name]["after"] if dep in stages]
+                if any(status in ("failed", "blocked") for status in upstream):
+                    results[name] = "blocked"
+                    logging.warning(f"[{name}] blocked by a failed upstream stage")
+                elif all(status in ("ran", "skipped") for status in upstream):
+                    running[executor.submit(run_stage, name, state, force)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except BaseException:
+                    # SystemExit included: the wrapped scripts exit(1) on critical errors
+                    logging.error(f"[{name}] failed", exc_info=True)
+                    results[name] = "failed"
+    return {name: results[name] for name in stages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the SAL data pipeline as a DAG of stages.")
+    parser.add_argument("stages", nargs="*", help="Target stages (their upstream stages are included); default all")
+    parser.add_argument("--force", action="store_true", help="Run every selected stage even if its inputs are unchanged")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Stages run in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the stages that would run")
+    parser.add_argument("--list", action="store_true", help="Print the declared stages and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, stage in STAGES.items():
+            print(f"{name:>14}: {stage['run']}" + (f"  (after {', '.join(stage['after'])})" if stage["after"] else ""))
+        return
+
+    setup_logging("pipeline")
+    try:
+        results = run_pipeline(args.stages, args.force, args.workers, args.dry_run)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for name, status in results.items():
+        print(f"{name:>14}: {status}")
+    if "failed" in results.values():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
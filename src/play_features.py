@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+import numpy as np
+from numpy.lib.format import open_memmap
+import pymongo
+import psycopg2
+import metrics
+from pbp_model import parse_game, load_game_file
+from game_state import replay_game, season_query
+from sal_config import connect_db, release_db, get_mongo_client, setup_logging
+
+FEATURES_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "features")
+
+# MongoDB Configuration
+DATABASE_NAME = "nfl-msf"
+PBP_COLLECTION = "pbp"
+
+# Bump whenever FEATURE_COLUMNS or their meaning changes; each version lives in its own directory
+FEATURE_VERSION = 2
+FEATURE_COLUMNS = [
+    "quarter", "seconds_remaining", "game_seconds_remaining",
+    "down", "yards_to_go", "yards_to_goal",
+    "score_differential", "possession_is_home",
+    "possession_timeouts", "defense_timeouts",
+    "home_spread", "possession_spread",
+    "play_type",
+]
+FEATURE_DTYPE = np.float32   # NaN marks a value the provider did not report
+PARSE_BATCH_GAMES = 64       # Changed games parsed (and spreads fetched) per batch
+
+
+def version_dir(version=FEATURE_VERSION):
+    return os.path.join(FEATURES_DIR, f"v{version}")
+
+
+def fetch_pregame_spreads(game_ids):
+    """
+    Consensus pre-game home spread per MSF game: each book's last FULL point spread quoted
+    before kickoff, averaged across books.
+    """
+    ids = [g for g in game_ids if isinstance(g, int)]
+    if not ids:
+        return {}
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        WITH LastQuotes AS (
+            SELECT DISTINCT ON (go.game_id, go.book_id) go.game_id, o.spread
+            FROM "msf-nfl".game_odds go
+            JOIN "msf-nfl".odds o ON o.game_odds_id = go.id AND o.outcome_type = 'home'
+            JOIN "msf-nfl".games g ON g.id = go.game_id
+            WHERE go.game_id = ANY(%s)
+              AND go.odds_type = 'point_spread' AND go.game_segment = 'FULL'
+              AND go.as_of_time <= g.start_time
+              AND o.spread IS NOT NULL
+            ORDER BY go.game_id, go.book_id, go.as_of_time DESC
+        )
+        SELECT game_id, AVG(spread)::float8 FROM LastQuotes GROUP BY game_id;
+    """, (ids,))
+    spreads = dict(cursor.fetchall())
+    cursor.close()
+    release_db(conn)
+    return spreads
+
+
+def game_features(header, plays, home_spread=None):
+    """ Feature rows (plays x FEATURE_COLUMNS) for one parsed game. """
+    states, _ = replay_game(header, plays)
+    features = np.full((len(plays), len(FEATURE_COLUMNS)), np.nan, dtype=FEATURE_DTYPE)
+    spread = np.nan if home_spread is None else home_spread
+
+    for row, (play, state) in enumerate(zip(plays, states)):
+        # state.possession carries the drive's team through penalty snaps MSF credits to the defense
+        is_home = None if state.possession is None else state.possession == header.home_team
+        own, other = (play.home_timeouts, play.away_timeouts) if is_home else (play.away_timeouts, play.home_timeouts)
+        values = (
+            play.quarter, play.seconds_remaining, state.game_seconds_remaining,
+            play.down, play.yards_to_go, state.yards_to_goal,
+            state.score_differential, is_home,
+            own if is_home is not None else None, other if is_home is not None else None,
+            spread, spread if is_home else -spread if is_home is not None else None,
+            int(play.play_type),
+        )
+        features[row] = [np.nan if v is None else float(v) for v in values]
+    return features
+
+
+def load_manifest(version=FEATURE_VERSION):
+    path = os.path.join(version_dir(version), "manifest.json")
+    if not os.path.exists(path):
+        return {"version": version, "columns": FEATURE_COLUMNS, "rows": 0, "games": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def game_chunk_path(game_key, version=FEATURE_VERSION):
+    return os.path.join(version_dir(version), "games", f"{game_key}.npy")
+
+
+def update_features(sources, version=FEATURE_VERSION):
+    """
+    sources yields (game_key, fingerprint, loader) where loader() returns (GameHeader, [Play]).
+    Only games whose fingerprint changed are re-parsed; the combined matrix is then re-assembled
+    from the per-game chunks into plays.npy with a manifest of row offsets.
+    """
+    manifest = load_manifest(version)
+    os.makedirs(os.path.join(version_dir(version), "games"), exist_ok=True)
+
+    # Games from earlier runs stay in the matrix even when this run does not list them
+    keep = dict(manifest["games"])
+    with metrics.timer("analysis_phase_seconds", analysis="play_features", phase="load"):
+        changed = [(game_key, fingerprint, loader) for game_key, fingerprint, loader in sources
+                   if not (keep.get(game_key) and keep[game_key]["fingerprint"] == fingerprint
+                           and os.path.exists(game_chunk_path(game_key, version)))]
+
+    # Parse changed games a batch at a time so only one batch of plays is held in memory
+    for start in range(0, len(changed), PARSE_BATCH_GAMES):
+        with metrics.timer("analysis_phase_seconds", analysis="play_features", phase="load"):
+            parsed = [(game_key, fingerprint, loader()) for game_key, fingerprint, loader in
+                      changed[start:start + PARSE_BATCH_GAMES]]
+            spreads = fetch_pregame_spreads([header.game_id for _, _, (header, _) in parsed])
+        for game_key, fingerprint, (header, plays) in parsed:
+            with metrics.timer("analysis_phase_seconds", analysis="play_features", phase="compute"):
+                features = game_features(header, plays, spreads.get(header.game_id))
+            with metrics.timer("analysis_phase_seconds", analysis="play_features", phase="export"):
+                np.save(game_chunk_path(game_key, version), features)
+            keep[game_key] = {"fingerprint": fingerprint, "game_id": header.game_id, "season": header.season,
+                              "rows": len(features)}
+            logging.info(f"Built {len(features)} feature rows for {game_key}")
+
+    if not changed and os.path.exists(os.path.join(version_dir(version), "plays.npy")):
+        logging.info("Play features are up to date.")
+        return manifest
+
+    # Re-assemble in a stable order into a fresh memmap, then swap it in
+    with metrics.timer("analysis_phase_seconds", analysis="play_features", phase="export"):
+        total = sum(game["rows"] for game in keep.values())
+        matrix_path = os.path.join(version_dir(version), "plays.npy")
+        tmp_path = matrix_path + ".tmp"
+        matrix = open_memmap(tmp_path, mode="w+", dtype=FEATURE_DTYPE, shape=(total, len(FEATURE_COLUMNS)))
+        offset = 0
+        for game_key in sorted(keep):
+            game = keep[game_key]
+            if game["rows"]:
+                matrix[offset:offset + game["rows"]] = np.load(game_chunk_path(game_key, version), mmap_mode="r")
+            game["row_start"] = offset
+            offset += game["rows"]
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, matrix_path)
+
+        manifest = {"version": version, "columns": FEATURE_COLUMNS, "rows": total,
+                    "built_at": datetime.now().isoformat(), "games": keep}
+        with open(os.path.join(version_dir(version), "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4)
+    logging.info(f"Rebuilt {len(changed)} games; feature matrix has {total} rows.")
+    return manifest
+
+
+def load_features(version=FEATURE_VERSION):
+    """ Zero-copy view of the feature matrix plus its manifest (columns and per-game row ranges). """
+    matrix = np.load(os.path.join(version_dir(version), "plays.npy"), mmap_mode="r")
+    return matrix, load_manifest(version)
+
+
+def mongo_sources(collection, season):
+    """ MSF pbp documents for a season, fingerprinted by lastUpdatedOn before the full document is read. """
+    for doc in collection.find(season_query(season), {"game_id": 1, "response.lastUpdatedOn": 1}):
+        game_key = doc["game_id"]
+        yield game_key, doc.get("response", {}).get("lastUpdatedOn"), \
+            (lambda key=game_key: parse_game(collection.find_one({"game_id": key}, {"_id": 0})))
+
+
+def file_sources(paths):
+    for path in paths:
+        with open(path, "rb") as f:
+            fingerprint = hashlib.md5(f.read()).hexdigest()
+        yield os.path.splitext(os.path.basename(path))[0], fingerprint, (lambda p=path: load_game_file(p))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped per-play feature matrix.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--season", type=int, action="append", help="NFL season of MSF pbp to include (repeatable)")
+    source.add_argument("--files", nargs="+", help="MSF or Sportradar play-by-play JSON files")
+    args = parser.parse_args()
+
+    setup_logging("play_features")
+
+    try:
+        if args.files:
+            manifest = update_features(file_sources(args.files))
+        else:
+            client = get_mongo_client()
+            collection = client[DATABASE_NAME][PBP_COLLECTION]
+            manifest = update_features(src for season in args.season for src in mongo_sources(collection, season))
+    except (pymongo.errors.PyMongoError, psycopg2.Error):
+        logging.critical("Critical error building play features", exc_info=True)
+        sys.exit(1)
+    print(f"Feature matrix v{manifest['version']}: {manifest['rows']} rows, {len(manifest['games'])} games.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import sys
+import logging
+import argparse
+from array import array
+import numpy as np
+import pymongo
+import metrics
+from export_data import export_data
+from pbp_model import PlayType, parse_game, iter_game_files
+from game_state import season_query
+from sal_config import get_mongo_client, setup_logging
+
+
+# MongoDB Configuration
+DATABASE_NAME = "nfl-msf"
+PBP_COLLECTION = "pbp"
+
+NO_PLAYER = -1
+
+# Per-play role columns; each holds a dense player index or NO_PLAYER
+ROLES = ["passer", "receiver", "rusher", "kicker", "interceptor"]
+
+STAT_COLUMNS = [
+    "pass_attempts", "completions", "pass_yards", "pass_tds", "interceptions_thrown", "sacks_taken",
+    "rush_attempts", "rush_yards", "rush_tds",
+    "targets", "receptions", "receiving_yards", "receiving_tds",
+    "tackles", "interceptions",
+    "fg_attempts", "fg_made", "xp_attempts", "xp_made",
+]
+
+
+def new_columns():
+    """ Growable int32 columns for one pass over the plays, plus the id -> index lookups. """
+    columns = {name: array("i") for name in ["game", "play_type", "yards", "is_complete", "is_touchdown",
+                                             "points_scored"] + ROLES}
+    columns["tackle_player"] = array("i")
+    columns["tackle_game"] = array("i")
+    return {"columns": columns, "players": {}, "games": {}, "game_info": []}
+
+
+def _index(lookup, key):
+    if key is None:
+        return NO_PLAYER
+    index = lookup.get(key)
+    if index is None:
+        index = lookup[key] = len(lookup)
+    return index
+
+
+def add_game(store, header, plays):
+    """ Append one parsed game's (non-nullified) plays to the columnar store. """
+    columns, players = store["columns"], store["players"]
+    # game_info is indexed like the games lookup; a game seen twice (e.g. from two files) keeps one entry
+    if header.game_id not in store["games"]:
+        store["game_info"].append({"game_id": header.game_id, "season": header.season, "start_time": header.start_time,
+                                   "home_team": header.home_team, "away_team": header.away_team})
+    game = _index(store["games"], header.game_id)
+    for play in plays:
+        if play.is_no_play:
+            continue
+        columns["game"].append(game)
+        columns["play_type"].append(int(play.play_type))
+        columns["yards"].append(play.yards or 0)
+        columns["is_complete"].append(int(play.is_complete))
+        columns["is_touchdown"].append(int(play.is_touchdown))
+        columns["points_scored"].append(play.points_scored or 0)
+        for role in ROLES:
+            columns[role].append(_index(players, getattr(play, role)))
+        for tackler in play.tacklers:
+            columns["tackle_player"].append(_index(players, tackler))
+            columns["tackle_game"].append(game)
+
+
+def to_numpy(store):
+    return {name: np.frombuffer(column, dtype=np.int32) for name, column in store["columns"].items()}
+
+
+def aggregate(store):
+    """
+    Grouped reductions over the (player, game) keys that actually occur. Returns
+    (keys, stats): the sorted occupied keys (player * n_games + game) and, per STAT_COLUMNS
+    entry, an int64 vector aligned with them, so memory follows the plays rather than
+    n_players x n_games.
+    """
+    cols = to_numpy(store)
+    n_games = max(len(store["games"]), 1)
+    play_type, yards, game = cols["play_type"], cols["yards"], cols["game"]
+    complete, touchdown, points = cols["is_complete"] == 1, cols["is_touchdown"] == 1, cols["points_scored"]
+
+    # Every role's keys plus the tackles share one np.unique, so all stats line up on the same keys
+    present = {role: cols[role] != NO_PLAYER for role in ROLES}
+    parts = [cols[role][present[role]].astype(np.int64) * n_games + game[present[role]] for role in ROLES]
+    parts.append(cols["tackle_player"].astype(np.int64) * n_games + cols["tackle_game"])
+    keys, inverse = np.unique(np.concatenate(parts), return_inverse=True)
+    slots = dict(zip(ROLES + ["tackle"], np.split(inverse, np.cumsum([len(part) for part in parts])[:-1])))
+
+    def total(role, mask, weights=None):
+        """ Sum weights (or count rows) per occupied key of the player in role over the masked plays. """
+        mask = mask[present[role]]
+        w = None if weights is None else weights[present[role]][mask]
+        return np.bincount(slots[role][mask], weights=w, minlength=len(keys)).astype(np.int64)
+
+    is_pass = play_type == PlayType.PASS
+    is_rush = play_type == PlayType.RUSH
+    is_sack = play_type == PlayType.SACK
+    is_fg = play_type == PlayType.FIELD_GOAL
+    is_xp = play_type == PlayType.EXTRA_POINT
+    has_interceptor = cols["interceptor"] != NO_PLAYER
+
+    stats = {
+        "pass_attempts": total("passer", is_pass),
+        "completions": total("passer", is_pass & complete),
+        "pass_yards": total("passer", is_pass & complete, yards),
+        "pass_tds": total("passer", is_pass & complete & touchdown),
+        "interceptions_thrown": total("passer", is_pass & has_interceptor),
+        "sacks_taken": total("passer", is_sack),
+        "rush_attempts": total("rusher", is_rush),
+        "rush_yards": total("rusher", is_rush, yards),
+        "rush_tds": total("rusher", is_rush & touchdown),
+        "targets": total("receiver", is_pass),
+        "receptions": total("receiver", is_pass & complete),
+        "receiving_yards": total("receiver", is_pass & complete, yards),
+        "receiving_tds": total("receiver", is_pass & complete & touchdown),
+        "interceptions": total("interceptor", is_pass),
+        "fg_attempts": total("kicker", is_fg),
+        "fg_made": total("kicker", is_fg & (points == 3)),
+        "xp_attempts": total("kicker", is_xp),
+        "xp_made": total("kicker", is_xp & (points == 1)),
+    }
+    stats["tackles"] = np.bincount(slots["tackle"], minlength=len(keys)).astype(np.int64)
+    return keys, stats
+
+
+def stat_matrix(stats):
+    """ occupied keys x STAT_COLUMNS """
+    return np.column_stack([stats[name] for name in STAT_COLUMNS])
+
+
+def player_game_rows(store, keys, stats):
+    """ One row per player per game with at least one non-zero stat. """
+    player_ids = list(store["players"])
+    n_games = max(len(store["games"]), 1)
+    matrix = stat_matrix(stats)
+    played = matrix.any(axis=1)
+    rows = []
+    for key, values in zip(keys[played].tolist(), matrix[played].tolist()):
+        p, g = divmod(key, n_games)
+        info = store["game_info"][g]
+        row = {"player_id": player_ids[p], "game_id": info["game_id"], "season": info["season"]}
+        row.update(zip(STAT_COLUMNS, values))
+        rows.append(row)
+    return rows
+
+
+def player_season_rows(store, keys, stats):
+    """ Season totals: bincount each player's games grouped by (season, player). """
+    player_ids = list(store["players"])
+    n_players, n_games = max(len(store["players"]), 1), max(len(store["games"]), 1)
+    seasons, season_of_game = np.unique([info["season"] or 0 for info in store["game_info"]], return_inverse=True)
+    matrix = stat_matrix(stats)
+    played = matrix.any(axis=1)
+    player, game = np.divmod(keys[played], n_games)
+    groups, inverse = np.unique(season_of_game[game].astype(np.int64) * n_players + player, return_inverse=True)
+    games_played = np.bincount(inverse, minlength=len(groups))
+    totals = np.column_stack([np.bincount(inverse, weights=column, minlength=len(groups))
+                              for column in matrix[played].T]).astype(np.int64)
+    rows = []
+    for group, games, values in zip(groups.tolist(), games_played.tolist(), totals.tolist()):
+        s, p = divmod(group, n_players)
+        row = {"player_id": player_ids[p], "season": seasons[s].item(), "games": games}
+        row.update(zip(STAT_COLUMNS, values))
+        rows.append(row)
+    return rows
+
+
+def compute_player_stats(games):
+    """ games: iterable of (GameHeader, [Play]). Returns (per-game rows, per-season rows). """
+    store = new_columns()
+    # Reading and parsing the games happens as they are pulled here
+    with metrics.timer("analysis_phase_seconds", analysis="player_stats", phase="load"):
+        for header, plays in games:
+            add_game(store, header, plays)
+    logging.info(f"Collected {len(store['columns']['game'])} plays for {len(store['players'])} players "
+                 f"across {len(store['games'])} games")
+    with metrics.timer("analysis_phase_seconds", analysis="player_stats", phase="compute"):
+        keys, stats = aggregate(store)
+        return player_game_rows(store, keys, stats), player_season_rows(store, keys, stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Box-score player stats aggregated from stored play-by-play.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--season", type=int, help="Aggregate every MSF pbp document for this NFL season")
+    source.add_argument("--files", nargs="+", help="MSF or Sportradar play-by-play JSON files")
+    args = parser.parse_args()
+
+    setup_logging("player_stats")
+
+    try:
+        if args.files:
+            game_rows, season_rows = compute_player_stats(iter_game_files(args.files))
+            label = "files"
+        else:
+            client = get_mongo_client()
+            cursor = client[DATABASE_NAME][PBP_COLLECTION].find(season_query(args.season), {"_id": 0})
+            game_rows, season_rows = compute_player_stats(parse_game(doc) for doc in cursor)
+            label = str(args.season)
+    except pymongo.errors.PyMongoError:
+        logging.critical("Critical error reading play-by-play", exc_info=True)
+        sys.exit(1)
+
+    with metrics.timer("analysis_phase_seconds", analysis="player_stats", phase="export"):
+        export_data(game_rows, f"player_game_stats_{label}")
+        export_data(season_rows, f"player_season_stats_{label}")
+    print(f"Aggregated {len(game_rows)} player-game rows and {len(season_rows)} player-season rows.")
+
+
+if __name__ == "__main__":
+    main()
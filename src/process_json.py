@@ -2,36 +2,9 @@ import os
 import json
 import psycopg2
 import logging
-from datetime import datetime
-from dotenv import load_dotenv, find_dotenv
-
-# Load environment variables
-load_dotenv(find_dotenv())
-
-# Create logs directory if it doesn't exist
-LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# Setup logging
-timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-log_filename = os.path.join(LOG_DIR, f"process_json_{timestamp}.log")
-
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
-def connect_db():
-    """ Establish a connection to the PostgreSQL database. """
-    return psycopg2.connect(
-        host="localhost",
-        port=5432,
-        database="SAL-db",
-        user="postgres",
-        password=os.getenv("POSTGRES_PASSWORD")
-    )
+import metrics
+from etl_batches import SavepointBatch
+from sal_config import connect_db, release_db
 
 def preload_data(cursor):
     """ Preload supporting tables into memory to reduce database queries. """
@@ -63,14 +36,22 @@ def read_json_file(json_file):
 
 def process_saved_json(json_file):
     """ Read JSON, check for existing data, and insert only new records into PostgreSQL. """
-    print(f"Loaded POSTGRES_PASSWORD: {os.getenv('POSTGRES_PASSWORD')}")
     conn = connect_db()
     cursor = conn.cursor()
 
     logging.info(f"Processing JSON file: {json_file}")
     cache = preload_data(cursor)
 
-    data = read_json_file(json_file)
+    def reload_cache():
+        # A rolled-back batch can take ids the cache already handed out with it
+        cache.clear()
+        cache.update(preload_data(cursor))
+
+    batch = SavepointBatch(cursor, "process_json", lambda cursor, item: load_event(cursor, cache, item),
+                           on_rollback=reload_cache)
+
+    with metrics.timer("json_decode_seconds", source="file"):
+        data = read_json_file(json_file)
     if data is None:
         logging.error("No valid JSON data found. Exiting process.")
         return
@@ -87,76 +68,93 @@ def process_saved_json(json_file):
             events = sport_content.get("data", [])
             logging.info(f"Found {len(events)} events under sport '{sport_key_short}'")
             
-            # Iterate over each event in the 'data' array
+            # Iterate over each event in the 'data' array, one savepoint batch per BATCH_SIZE events
             for event in events:
-                # Use the event-level sport_key for lookups (this should be the full key)
-                event_sport_key = event.get("sport_key", sport_key_short)
-                event_name = f"{event['home_team']} vs {event['away_team']}"
-                commence_time = event["commence_time"]
-                home_team = event["home_team"]
-                away_team = event["away_team"]
-
-                logging.info(f"Processing event: {event_name} (ID: {event.get('id', 'N/A')}, Commence: {commence_time}, Sport: {event_sport_key})")
-
-                # 1️⃣ Fetch Sport ID & Event Type ID from the Sports Table using the event-level sport_key
-                cursor.execute("SELECT sport_id, event_type_id FROM \"SAL-schema\".sports WHERE sport_key = %s;", (event_sport_key,))
-                sport_row = cursor.fetchone()
-                if sport_row:
-                    sport_id, event_type_id = sport_row
-                else:
-                    logging.error(f"Skipping event {event_name} - Missing sport_id for sport_key '{event_sport_key}'")
-                    continue  # Skip this event if sport is missing
-
-                # 2️⃣ Ensure Participants Exist Before Creating the Event
-                home_id = insert_participant(cursor, cache, home_team, "TEAM", event_sport_key)
-                away_id = insert_participant(cursor, cache, away_team, "TEAM", event_sport_key)
-                if home_id is None or away_id is None:
-                    logging.error(f"Skipping event {event_name} due to participant insertion failure.")
-                    continue
-
-                # 3️⃣ Insert Event (enforcing uniqueness on participants & commence_time)
-                event_id = insert_event(cursor, event_name, commence_time, sport_id, event_type_id, home_id, away_id)
-                if not event_id:
-                    logging.error(f"Skipping event {event_name} - Failed to insert event.")
-                    continue  # Skip odds if event wasn't inserted
-
-                # 4️⃣ Process Bookmakers for this event
-                for bookmaker in event.get("bookmakers", []):
-                    book_name = bookmaker.get("title", "Unknown Book")
-                    logging.info(f"Processing bookmaker: {book_name}")
-                    books_id = insert_book(cursor, cache, book_name)
-                    if books_id is None:
-                        logging.error(f"Skipping bookmaker {book_name} for event {event_name}.")
-                        continue
-
-                    # 5️⃣ Process Markets (Wager Types) for this bookmaker
-                    for market in bookmaker.get("markets", []):
-                        market_key = market.get("key", "Unknown Market")
-                        last_update = market.get("last_update", "No Update Time")
-                        logging.info(f"Processing market: {market_key}")
-                        wager_type_id = insert_wager_type(cursor, cache, market_key)
-                        if wager_type_id is None:
-                            logging.error(f"Skipping market {market_key} for event {event_name}.")
-                            continue
-
-                        # 6️⃣ Process Outcomes (Odds) for this market
-                        for outcome in market.get("outcomes", []):
-                            outcome_name = outcome.get("name", "Unknown Outcome")
-                            price = outcome.get("price", None)
-                            point = outcome.get("point", None)
-                            logging.info(f"Processing outcome: {outcome_name} (Price: {price}, Point: {point})")
-                            insert_odds(cursor, event_id, books_id, wager_type_id, last_update, outcome_name, price, point)
+                source_ref = {"file": json_file, "snapshot": ts, "sport": sport_key_short, "event_id": event.get("id")}
+                batch.add({"event": event, "sport_key": sport_key_short}, source_ref,
+                          on_loaded=lambda rows: metrics.inc("etl_rows_total", rows or 0, table="SAL-schema.odds"))
+
+    batch.flush()
+    if batch.dead:
+        logging.warning(f"{batch.dead} events went to the dead-letter table; replay with: python etl_batches.py replay process_json")
 
     logging.info("Committing transaction to database...")
     conn.commit()
     logging.info("Transaction committed successfully.")
     cursor.close()
-    conn.close()
+    release_db(conn)
     logging.info(f"Finished processing {json_file} into PostgreSQL.")
 
+def load_event(cursor, cache, item):
+    """ Insert one event with its participants, bookmakers, markets and outcomes; returns the odds rows inserted. """
+    event = item["event"]
+    # Use the event-level sport_key for lookups (this should be the full key)
+    event_sport_key = event.get("sport_key", item["sport_key"])
+    event_name = f"{event['home_team']} vs {event['away_team']}"
+    commence_time = event["commence_time"]
+    home_team = event["home_team"]
+    away_team = event["away_team"]
+
+    logging.info(f"Processing event: {event_name} (ID: {event.get('id', 'N/A')}, Commence: {commence_time}, Sport: {event_sport_key})")
+
+    # 1️⃣ Fetch Sport ID & Event Type ID from the Sports Table using the event-level sport_key
+    cursor.execute("SELECT sport_id, event_type_id FROM \"SAL-schema\".sports WHERE sport_key = %s;", (event_sport_key,))
+    sport_row = cursor.fetchone()
+    if sport_row:
+        sport_id, event_type_id = sport_row
+    else:
+        logging.error(f"Skipping event {event_name} - Missing sport_id for sport_key '{event_sport_key}'")
+        return  # Skip this event if sport is missing
+
+    # 2️⃣ Ensure Participants Exist Before Creating the Event
+    home_id = insert_participant(cursor, cache, home_team, "TEAM", event_sport_key)
+    away_id = insert_participant(cursor, cache, away_team, "TEAM", event_sport_key)
+    if home_id is None or away_id is None:
+        logging.error(f"Skipping event {event_name} due to participant insertion failure.")
+        return
+
+    # 3️⃣ Insert Event (enforcing uniqueness on participants & commence_time)
+    event_id = insert_event(cursor, event_name, commence_time, sport_id, event_type_id, home_id, away_id)
+    if not event_id:
+        logging.error(f"Skipping event {event_name} - Failed to insert event.")
+        return  # Skip odds if event wasn't inserted
+
+    # 4️⃣ Process Bookmakers for this event
+    odds_rows = 0
+    for bookmaker in event.get("bookmakers", []):
+        book_name = bookmaker.get("title", "Unknown Book")
+        logging.info(f"Processing bookmaker: {book_name}")
+        books_id = insert_book(cursor, cache, book_name)
+        if books_id is None:
+            logging.error(f"Skipping bookmaker {book_name} for event {event_name}.")
+            continue
+
+        # 5️⃣ Process Markets (Wager Types) for this bookmaker
+        for market in bookmaker.get("markets", []):
+            market_key = market.get("key", "Unknown Market")
+            last_update = market.get("last_update", "No Update Time")
+            logging.info(f"Processing market: {market_key}")
+            wager_type_id = insert_wager_type(cursor, cache, market_key)
+            if wager_type_id is None:
+                logging.error(f"Skipping market {market_key} for event {event_name}.")
+                continue
+
+            # 6️⃣ Process Outcomes (Odds) for this market
+            for outcome in market.get("outcomes", []):
+                outcome_name = outcome.get("name", "Unknown Outcome")
+                price = outcome.get("price", None)
+                point = outcome.get("point", None)
+                logging.info(f"Processing outcome: {outcome_name} (Price: {price}, Point: {point})")
+                insert_odds(cursor, event_id, books_id, wager_type_id, last_update, outcome_name, price, point)
+                odds_rows += 1
+    return odds_rows
+
+def replay_event(cursor, item):
+    """ Load a dead-lettered event again (see etl_batches.replay_dead_letters). """
+    load_event(cursor, preload_data(cursor), item)
+
 def process_saved_json_debug(json_file):
     """ Debug version: Reads the JSON file and logs the structure without inserting into PostgreSQL. """
-    print(f"Loaded POSTGRES_PASSWORD: {os.getenv('POSTGRES_PASSWORD')}")
     conn = connect_db()
     cursor = conn.cursor()
 
@@ -209,7 +207,7 @@ def process_saved_json_debug(json_file):
                             logging.info(f"          Outcome: {outcome_name} (Price: {price}, Point: {point})")
 
     cursor.close()
-    conn.close()
+    release_db(conn)
     logging.info(f"Finished processing JSON file in DEBUG MODE: {json_file}")
 
 def insert_participant(cursor, cache, name, participant_type, sport_key):
@@ -242,7 +240,7 @@ def insert_participant(cursor, cache, name, participant_type, sport_key):
             logging.info(f"Inserted participant: {name} (ID: {participant_id})")
         except psycopg2.Error as e:
             logging.error(f"Failed to insert participant {name}: {e}")
-            return None
+            raise
 
     return cache["participants"].get(name)
 
@@ -258,7 +256,7 @@ def insert_book(cursor, cache, book_name):
             logging.info(f"Inserted bookmaker: {book_name} (ID: {books_id})")
         except psycopg2.Error as e:
             logging.error(f"Failed to insert bookmaker {book_name}: {e}")
-            return None
+            raise
     return cache["books"].get(book_name)
 
 def insert_sport(cursor, cache, sport_key, sport_title):
@@ -274,7 +272,7 @@ def insert_sport(cursor, cache, sport_key, sport_title):
             logging.info(f"Inserted sport: {sport_key} (ID: {sport_id})")
         except psycopg2.Error as e:
             logging.error(f"Failed to insert sport {sport_key}: {e}")
-            return None
+            raise
     return cache["sports"].get(sport_key)
 
 def insert_wager_type(cursor, cache, market_key):
@@ -289,7 +287,7 @@ def insert_wager_type(cursor, cache, market_key):
             logging.info(f"Inserted wager type: {market_key} (ID: {wager_type_id})")
         except psycopg2.Error as e:
             logging.error(f"Failed to insert wager type {market_key}: {e}")
-            return None
+            raise
     return cache["wager_types"].get(market_key)
 
 def insert_odds(cursor, event_id, books_id, wager_type_id, last_update, outcome_name, price, point):
@@ -305,6 +303,7 @@ def insert_odds(cursor, event_id, books_id, wager_type_id, last_update, outcome_
         logging.info(f"Inserted odds: {outcome_name} (Event ID: {event_id})")
     except psycopg2.Error as e:
         logging.error(f"Failed to insert odds for {outcome_name}: {e}")
+        raise
 
 def insert_event(cursor, event_name, commence_time, sport_id, event_type_id, home_id, away_id):
     """ Insert an event if it does not already exist, enforcing uniqueness on participants & commence_time. """
@@ -335,4 +334,4 @@ def insert_event(cursor, event_name, commence_time, sport_id, event_type_id, hom
             return event_id
         except psycopg2.Error as e:
             logging.error(f"Failed to insert event {event_name}: {e}")
-            return None
\ No newline at end of file
+            raise
\ No newline at end of file
@@ -0,0 +1,528 @@
+import os
+import re
+import json
+import time
+import uuid
+import random
+import logging
+import argparse
+import threading
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qs
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from game_identity import msf_game_slug, game_date
+from pbp_model import season_of
+from sal_config import setup_logging
+from synthetic_data import (FIXTURE_DIR, BOOKS, build_teams, generate_schedule, generate_week_odds,
+                            msf_book_line, odds_api_event, generate_playbyplay, load_templates, iso)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Path prefixes standing in for each provider's base URL
+MSF_PREFIX = "/msf/v2.1/pull/nfl/"
+SPORTRADAR_PREFIX = "/sportradar/nfl/official/trial/v7/en"
+ODDS_API_PREFIX = "/oddsapi/v4"
+
+# Stable namespace so a synthetic MSF game always maps to the same Sportradar/Odds API id
+STUB_NAMESPACE = uuid.UUID("5a15e0b2-7f3c-4f4e-9a53-1c0f3b7e2d46")
+
+SNAPSHOT_INTERVAL = timedelta(minutes=5)   # Odds API historical snapshots
+
+
+def stub_settings(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """ The sal_config base URLs that point the fetchers at a stub server (.env or override_settings). """
+    root = f"http://{host}:{port}"
+    return {
+        "MSF_BASE_URL": f"{root}{MSF_PREFIX}",
+        "SPORTRADAR_BASE_URL": f"{root}{SPORTRADAR_PREFIX}",
+        "ODDS_API_BASE_URL": f"{root}{ODDS_API_PREFIX}",
+    }
+
+
+# -------------------------------------------------------------- Payloads
+
+class StubWorld:
+    """
+    Deterministic provider data: recorded fixtures in data/ where one exists for the
+    requested resource, otherwise synthetic_data generated from the seed. Every resource is
+    drawn from its own seeded stream, so repeated requests return identical payloads.
+    """
+
+    def __init__(self, seed=2024, books=len(BOOKS), quotes_per_book=24, fixture_dir=FIXTURE_DIR):
+        self.seed = seed
+        self.books = BOOKS[:books]
+        self.quotes_per_book = quotes_per_book
+        self.fixture_dir = fixture_dir
+        self.teams = build_teams(random.Random(seed))
+        self._templates = None
+        self._lock = threading.Lock()
+
+    def rng(self, *key):
+        # str seeds hash with sha512, so the stream is stable across processes
+        return random.Random("-".join(str(k) for k in (self.seed,) + key))
+
+    def fixture(self, name):
+        path = os.path.join(self.fixture_dir, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def templates(self):
+        with self._lock:
+            if self._templates is None:
+                self._templates = load_templates()
+        return self._templates
+
+    @lru_cache(maxsize=16)
+    def games(self, season):
+        return generate_schedule(season, self.teams, self.rng("schedule", season))
+
+    @lru_cache(maxsize=16)
+    def games_by_slug(self, season):
+        return {msf_game_slug(g["schedule"]["startTime"], g["schedule"]["awayTeam"]["abbreviation"],
+                              g["schedule"]["homeTeam"]["abbreviation"]): g for g in self.games(season)}
+
+    @lru_cache(maxsize=16)
+    def games_by_uuid(self, season):
+        return {self.game_uuid(g): g for g in self.games(season)}
+
+    @staticmethod
+    def game_uuid(game):
+        return str(uuid.uuid5(STUB_NAMESPACE, str(game["schedule"]["id"])))
+
+    def find_game_by_uuid(self, game_id):
+        for season in range(2018, datetime.now(timezone.utc).year + 1):
+            game = self.games_by_uuid(season).get(game_id)
+            if game:
+                return game
+        return None
+
+    # --- MySportsFeeds
+
+    def msf_season_games(self, season, season_type):
+        games = self.games(season) if season_type == "regular" else []
+        return {"lastUpdatedOn": iso(datetime.now(timezone.utc)),
+                "games": [{k: v for k, v in g.items() if k != "_market"} for g in games], "references": {}}
+
+    def msf_week_odds(self, season, season_type, week):
+        games = self.games(season) if season_type == "regular" else []
+        return generate_week_odds(self.rng("week", season, week), games, week, self.books, self.quotes_per_book)
+
+    def msf_date_odds(self, date_str):
+        recorded = self.fixture(f"odds_{date_str}.json")
+        if recorded is not None:
+            return recorded
+        day = datetime.strptime(date_str, "%Y%m%d")
+        games = [g for g in self.games(season_of(day)) if game_date(g["schedule"]["startTime"]) == date_str]
+        rng = self.rng("date", date_str)
+        return {"lastUpdatedOn": iso(datetime.now(timezone.utc)), "references": {}, "gameLines": [
+            {"game": {"id": g["schedule"]["id"], "week": g["schedule"]["week"], "startTime": g["schedule"]["startTime"],
+                      "awayTeamAbbreviation": g["schedule"]["awayTeam"]["abbreviation"],
+                      "homeTeamAbbreviation": g["schedule"]["homeTeam"]["abbreviation"]},
+             "lines": [msf_book_line(rng, g, book, self.quotes_per_book) for book in self.books]}
+            for g in games]}
+
+    def msf_playbyplay(self, slug):
+        recorded = self.fixture(f"playbyplay_{slug}.json")
+        if recorded is not None:
+            return recorded
+        day = datetime.strptime(slug[:8], "%Y%m%d")
+        game = self.games_by_slug(season_of(day)).get(slug)
+        if game is None:
+            return None
+        return generate_playbyplay(self.rng("pbp", slug), game, self.templates())
+
+    def msf_lineup(self, slug):
+        return self.fixture(f"game_lineup_{slug}.json")
+
+    def msf_players(self):
+        players = []
+        for team in self.teams.values():
+            for number in range(1, 54):
+                players.append({"player": {"id": team["id"] * 100 + number, "firstName": "Player",
+                                           "lastName": f"{team['abbreviation']}{number}", "jerseyNumber": number,
+                                           "currentTeam": {"id": team["id"], "abbreviation": team["abbreviation"]},
+                                           "currentRosterStatus": "ROSTER"},
+                                "teamAsOfDate": {"id": team["id"], "abbreviation": team["abbreviation"]}})
+        return {"lastUpdatedOn": iso(datetime.now(timezone.utc)), "players": players, "references": {}}
+
+    # --- Sportradar
+
+    def sportradar_team(self, abbreviation):
+        team = self.teams[abbreviation]
+        return {"id": str(uuid.uuid5(STUB_NAMESPACE, abbreviation)), "name": team["name"], "alias": abbreviation}
+
+    def sportradar_schedule(self, year, season_type):
+        weeks = {}
+        if season_type == "REG":
+            for game in self.games(year):
+                schedule = game["schedule"]
+                weeks.setdefault(schedule["week"], []).append({
+                    "id": self.game_uuid(game), "status": "closed",
+                    "scheduled": schedule["startTime"].replace(".000Z", "+00:00"),
+                    "home": self.sportradar_team(schedule["homeTeam"]["abbreviation"]),
+                    "away": self.sportradar_team(schedule["awayTeam"]["abbreviation"]),
+                    "scoring": {"home_points": game["score"]["homeScoreTotal"],
+                                "away_points": game["score"]["awayScoreTotal"]},
+                })
+        return {"id": str(uuid.uuid5(STUB_NAMESPACE, f"{year}-{season_type}")), "year": year, "type": season_type,
+                "name": season_type, "weeks": [{"id": str(uuid.uuid5(STUB_NAMESPACE, f"{year}-{season_type}-{w}")),
+                                                "sequence": w, "title": str(w), "games": games}
+                                               for w, games in sorted(weeks.items())]}
+
+    def sportradar_game_summary(self, game):
+        schedule = game["schedule"]
+        season = season_of(schedule["startTime"])
+        return {"id": self.game_uuid(game), "status": "closed",
+                "scheduled": schedule["startTime"].replace(".000Z", "+00:00"),
+                "summary": {"season": {"year": season, "type": "REG", "name": "REG"},
+                            "week": {"sequence": schedule["week"], "title": str(schedule["week"])},
+                            "home": {**self.sportradar_team(schedule["homeTeam"]["abbreviation"]),
+                                     "points": game["score"]["homeScoreTotal"]},
+                            "away": {**self.sportradar_team(schedule["awayTeam"]["abbreviation"]),
+                                     "points": game["score"]["awayScoreTotal"]}}}
+
+    def sportradar_roster(self, game_id):
+        game = self.find_game_by_uuid(game_id)
+        if game is None:
+            return None
+        summary = self.sportradar_game_summary(game)
+        for side in ("home", "away"):
+            team = summary["summary"][side]
+            summary[side] = {**team, "players": [
+                {"id": str(uuid.uuid5(STUB_NAMESPACE, f"{team['alias']}-{n}")), "name": f"{team['alias']} Player {n}",
+                 "jersey": str(n), "position": "NA"} for n in range(1, 54)]}
+        return summary
+
+    def sportradar_pbp(self, game_id):
+        game = self.find_game_by_uuid(game_id)
+        recorded = self.fixture("pbp-sportradar.json")
+        if recorded is None:
+            return None
+        recorded.pop("_id", None)
+        if game is None:
+            recorded["id"] = game_id
+            return recorded
+        # The recorded plays under this game's id and summary
+        summary = self.sportradar_game_summary(game)
+        recorded.update({k: summary[k] for k in ("id", "scheduled")})
+        recorded["summary"].update(summary["summary"])
+        return recorded
+
+    def sportradar_statistics(self, game_id):
+        game = self.find_game_by_uuid(game_id)
+        if game is None:
+            return None
+        return {**self.sportradar_game_summary(game), "statistics": {"home": {}, "away": {}}}
+
+    # --- Odds API
+
+    def odds_api_snapshot(self, date_param):
+        requested = datetime.fromisoformat(date_param.replace("Z", "+00:00"))
+        if requested.tzinfo is None:
+            requested = requested.replace(tzinfo=timezone.utc)
+        epoch = requested.timestamp() - requested.timestamp() % SNAPSHOT_INTERVAL.total_seconds()
+        return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+    def odds_api_events(self, sport, snapshot, with_odds):
+        """ Events kicking off within a week of the snapshot, as the historical endpoints return them. """
+        if sport != "americanfootball_nfl":
+            return []
+        games = [g for g in self.games(season_of(snapshot))
+                 if timedelta(0) <= datetime.fromisoformat(g["schedule"]["startTime"].replace("Z", "+00:00"))
+                 - snapshot < timedelta(days=7)]
+        events = []
+        for game in games:
+            event = odds_api_event(self.rng("odds-api", game["schedule"]["id"], snapshot.isoformat()),
+                                   game, self.teams, self.books, snapshot)
+            event["id"] = uuid.uuid5(STUB_NAMESPACE, f"event-{game['schedule']['id']}").hex
+            if not with_odds:
+                event.pop("bookmakers")
+            events.append(event)
+        return events
+
+    def odds_api_envelope(self, snapshot, data):
+        stamp = "%Y-%m-%dT%H:%M:%SZ"
+        return {"timestamp": snapshot.strftime(stamp),
+                "previous_timestamp": (snapshot - SNAPSHOT_INTERVAL).strftime(stamp),
+                "next_timestamp": (snapshot + SNAPSHOT_INTERVAL).strftime(stamp), "data": data}
+
+    def odds_api_odds(self, sport, date_param):
+        snapshot = self.odds_api_snapshot(date_param)
+        return self.odds_api_envelope(snapshot, self.odds_api_events(sport, snapshot, True))
+
+    def odds_api_event_list(self, sport, date_param):
+        snapshot = self.odds_api_snapshot(date_param)
+        return self.odds_api_envelope(snapshot, self.odds_api_events(sport, snapshot, False))
+
+    def odds_api_event_odds(self, sport, event_id, date_param):
+        snapshot = self.odds_api_snapshot(date_param)
+        event = next((e for e in self.odds_api_events(sport, snapshot, True) if e["id"] == event_id), None)
+        return None if event is None else self.odds_api_envelope(snapshot, event)
+
+
+# ---------------------------------------------------------------- Routes
+
+SEASON_PATTERN = r"(?P<season>\d{4})(?:-\d{4})?-(?P<type>[A-Za-z]+)"
+
+# (provider, path pattern below the provider prefix, handler(world, match, query) -> payload or None)
+ROUTES = [
+    ("msf", rf"{SEASON_PATTERN}/games\.json",
+     lambda w, m, q: w.msf_season_games(int(m["season"]), m["type"].lower())),
+    ("msf", rf"{SEASON_PATTERN}/week/(?P<week>\d+)/odds_gamelines\.json",
+     lambda w, m, q: w.msf_week_odds(int(m["season"]), m["type"].lower(), int(m["week"]))),
+    ("msf", rf"{SEASON_PATTERN}/date/(?P<date>\d{{8}})/odds_gamelines\.json",
+     lambda w, m, q: w.msf_date_odds(m["date"])),
+    ("msf", rf"{SEASON_PATTERN}/games/(?P<slug>\d{{8}}-[A-Z]+-[A-Z]+)/playbyplay\.json",
+     lambda w, m, q: w.msf_playbyplay(m["slug"])),
+    ("msf", rf"{SEASON_PATTERN}/games/(?P<slug>\d{{8}}-[A-Z]+-[A-Z]+)/lineup\.json",
+     lambda w, m, q: w.msf_lineup(m["slug"])),
+    ("msf", r"players\.json", lambda w, m, q: w.msf_players()),
+    ("sportradar", r"/games/(?P<year>\d{4})/(?P<type>PRE|REG|PST)/schedule\.json",
+     lambda w, m, q: w.sportradar_schedule(int(m["year"]), m["type"])),
+    ("sportradar", r"/games/(?P<id>[0-9a-f-]{36})/roster\.json", lambda w, m, q: w.sportradar_roster(m["id"])),
+    ("sportradar", r"/games/(?P<id>[0-9a-f-]{36})/pbp\.json", lambda w, m, q: w.sportradar_pbp(m["id"])),
+    ("sportradar", r"/games/(?P<id>[0-9a-f-]{36})/statistics\.json",
+     lambda w, m, q: w.sportradar_statistics(m["id"])),
+    ("odds_api", r"/historical/sports/(?P<sport>[a-z_]+)/odds",
+     lambda w, m, q: w.odds_api_odds(m["sport"], q["date"])),
+    ("odds_api", r"/historical/sports/(?P<sport>[a-z_]+)/events",
+     lambda w, m, q: w.odds_api_event_list(m["sport"], q["date"])),
+    ("odds_api", r"/historical/sports/(?P<sport>[a-z_]+)/events/(?P<id>[0-9a-f]{32})/odds",
+     lambda w, m, q: w.odds_api_event_odds(m["sport"], m["id"], q["date"])),
+]
+
+PREFIXES = {"msf": MSF_PREFIX, "sportradar": SPORTRADAR_PREFIX, "odds_api": ODDS_API_PREFIX}
+
+COMPILED_ROUTES = [(provider, re.compile(re.escape(PREFIXES[provider]) + pattern + "$"), handler)
+                   for provider, pattern, handler in ROUTES]
+
+
+def match_route(path):
+    for provider, pattern, handler in COMPILED_ROUTES:
+        match = pattern.match(path)
+        if match:
+            return provider, match, handler
+    return None, None, None
+
+
+def authorized(provider, headers, query):
+    """ Each provider's credential is present (its value is not checked). """
+    if provider == "msf":
+        return headers.get("Authorization", "").startswith("Basic ")
+    if provider == "sportradar":
+        return bool(query.get("api_key"))
+    return bool(query.get("apiKey"))
+
+
+# ---------------------------------------------------------------- Faults
+
+class Faults:
+    """
+    Injected per request, in order: latency, the provider rate limit (429 + Retry-After once the
+    per-second budget is spent), then random 429s, 5xx errors and empty 200 bodies.
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, rate_limit=0, p_429=0.0, retry_after=2, p_5xx=0.0,
+                 p_empty=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.p_429 = p_429
+        self.retry_after = retry_after
+        self.p_5xx = p_5xx
+        self.p_empty = p_empty
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def draw(self):
+        with self._lock:
+            return self._rng.random()
+
+    def delay(self):
+        if self.latency_ms or self.jitter_ms:
+            with self._lock:
+                jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def over_rate_limit(self):
+        """ Fixed one-second windows, like the per-second budgets the providers document. """
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            return self._window_count > self.rate_limit
+
+    def choose(self):
+        """ The fault for this request: None, 429, a 5xx status or 'empty'. """
+        if self.over_rate_limit() or (self.p_429 and self.draw() < self.p_429):
+            return 429
+        if self.p_5xx and self.draw() < self.p_5xx:
+            return self._rng.choice([500, 502, 503, 504])
+        if self.p_empty and self.draw() < self.p_empty:
+            return "empty"
+        return None
+
+
+class StubStats:
+    """ Request counters plus peak concurrency, served at /_stats for benchmark runs. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.responses = {}
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self, provider, status):
+        with self._lock:
+            self.in_flight -= 1
+            key = f"{provider or 'unknown'} {status}"
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "peak_in_flight": self.peak_in_flight,
+                    "requests": sum(self.responses.values()), "responses": dict(sorted(self.responses.items()))}
+
+    def reset(self):
+        with self._lock:
+            self.peak_in_flight = self.in_flight
+            self.responses = {}
+
+
+# ---------------------------------------------------------------- Server
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        if parts.path in ("/_stats", "/_stats/reset"):
+            if parts.path == "/_stats/reset":
+                self.server.stats.reset()
+            return self.send_json(200, self.server.stats.snapshot())
+
+        provider, match, handler = match_route(parts.path)
+        self.server.stats.enter()
+        status = 500
+        try:
+            self.server.faults.delay()
+            if provider is None:
+                status = self.send_json(404, {"message": f"No stub route for {parts.path}"})
+            elif not authorized(provider, self.headers, query):
+                status = self.send_json(401, {"message": "Missing credentials"})
+            else:
+                status = self.respond(provider, match, handler, query)
+        finally:
+            self.server.stats.leave(provider, status)
+
+    def respond(self, provider, match, handler, query):
+        fault = self.server.faults.choose()
+        if fault == 429:
+            return self.send_json(429, {"message": "Too Many Requests"},
+                                  {"Retry-After": str(self.server.faults.retry_after)})
+        if isinstance(fault, int):
+            return self.send_json(fault, {"message": "Injected server error"})
+        try:
+            payload = handler(self.server.world, match, query)
+        except (KeyError, ValueError) as e:
+            return self.send_json(422, {"message": f"Bad request: {e}"})
+        if payload is None:
+            return self.send_json(404, {"message": "Resource not found"})
+        headers = {}
+        if provider == "odds_api":
+            headers = {"x-requests-used": "0", "x-requests-remaining": "500", "x-requests-last": "1"}
+        if fault == "empty":
+            return self.send_body(200, b"", headers)
+        return self.send_json(200, payload, headers)
+
+    def send_json(self, status, payload, headers=None):
+        return self.send_body(status, json.dumps(payload).encode("utf-8"), headers)
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, world=None, faults=None):
+    """ A stub server that is not yet serving; port 0 picks a free port (see server.server_address). """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.world = world or StubWorld()
+    server.faults = faults or Faults()
+    server.stats = StubStats()
+    return server
+
+
+def start_stub_server(host=DEFAULT_HOST, port=0, world=None, faults=None):
+    """
+    Serve on a background thread, for scripts and benchmarks driving the fetchers in-process.
+    Returns (server, settings); pass settings to override_settings and call server.shutdown() when done.
+    """
+    server = make_server(host, port, world, faults)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub_settings(*server.server_address[:2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local MySportsFeeds/Sportradar/Odds API stub with fault injection.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seed", type=int, default=2024, help="Synthetic data seed")
+    parser.add_argument("--books", type=int, default=len(BOOKS), help="Sportsbooks quoted per game")
+    parser.add_argument("--quotes", type=int, default=24, help="Quotes per book per game in MSF odds")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="Recorded responses served in preference to generated ones")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per second before 429s (0 = unlimited)")
+    parser.add_argument("--p-429", type=float, default=0.0, help="Probability of a random 429")
+    parser.add_argument("--retry-after", type=int, default=2, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--p-5xx", type=float, default=0.0, help="Probability of a 500/502/503/504")
+    parser.add_argument("--p-empty", type=float, default=0.0, help="Probability of a 200 with an empty body")
+    parser.add_argument("--fault-seed", type=int, help="Seed for the fault draws (default random)")
+    args = parser.parse_args()
+
+    setup_logging("provider_stub_server")
+    world = StubWorld(args.seed, args.books, args.quotes, args.fixtures)
+    faults = Faults(args.latency_ms, args.jitter_ms, args.rate_limit, args.p_429, args.retry_after,
+                    args.p_5xx, args.p_empty, args.fault_seed)
+    server = make_server(args.host, args.port, world, faults)
+    host, port = server.server_address[:2]
+
+    print(f"Provider stub listening on http://{host}:{port} (stats at /_stats). Point the fetchers at it with:")
+    for key, value in stub_settings(host, port).items():
+        print(f"  {key}={value}")
+    logging.info(f"Provider stub on {host}:{port} with {vars(args)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,29 @@
-import pymongo
 import re
 import logging
 import os
 from collections import defaultdict
+from multiprocessing import Pool
+from pbp_model import season_of
+from sal_config import get_mongo_client
 
 # Setup Logging
 LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, "pbp_text_analysis.log")
 
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
-
 # MongoDB Configuration
-MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "nfl-msf"
 PBP_COLLECTION = "pbp"
 
-# Connect to MongoDB
-client = pymongo.MongoClient(MONGO_URI)
-db = client[DATABASE_NAME]
-pbp_collection = db[PBP_COLLECTION]
+# Parallel Processing Configuration
+BATCH_SIZE = 16     # PBP documents handed to a worker at a time
+WORKERS = None      # None = one worker per CPU
+
+# Only the fields the analysis reads are pulled from Mongo
+PBP_PROJECTION = {
+    "response.game.startTime": 1,
+    "response.plays.description": 1,
+    "response.plays.playStatus.teamInPossession": 1,
+}
 
 # Lexicon of key words and phrases to detect
 LEXICON = {
@@ -37,32 +37,146 @@ LEXICON = {
     "blocking": ["pocket collapses", "pancake block", "offensive line", "pulling guard", "chip block"]
 }
 
-# Function to analyze play descriptions and log word frequency counts
-def analyze_pbp_descriptions():
-    word_counts = defaultdict(int)  # Store word occurrence counts
-    total_plays = 0
 
-    # Retrieve all pbp documents
-    cursor = pbp_collection.find({})
-    
+def build_matcher(lexicon=LEXICON):
+    """
+    Compile the whole lexicon into one case-insensitive alternation.
+    The match sits inside a lookahead so every start position is tried, which keeps
+    overlapping phrases ("inside zone" and "zone") countable in a single scan.
+    Returns (pattern, word lookup by lowercase text, category by word).
+    """
+    words = sorted({word for group in lexicon.values() for word in group}, key=len, reverse=True)
+    pattern = re.compile(r"(?=\b(" + "|".join(re.escape(word) for word in words) + r")\b)", re.IGNORECASE)
+    canonical = {word.lower(): word for word in words}
+    categories = {word: category for category, group in lexicon.items() for word in group}
+    return pattern, canonical, categories
+
+
+_MATCHER = None
+
+
+def get_matcher():
+    """ Compile the lexicon once per process. """
+    global _MATCHER
+    if _MATCHER is None:
+        _MATCHER = build_matcher()
+    return _MATCHER
+
+
+def match_description(description, matcher=None):
+    """ Return the set of lexicon words found in one play description. """
+    pattern, canonical, _ = matcher or get_matcher()
+    return {canonical[hit.group(1).lower()] for hit in pattern.finditer(description)}
+
+
+def new_counts():
+    return {
+        "total_plays": 0,
+        "words": defaultdict(int),
+        "categories": defaultdict(int),
+        "teams": defaultdict(lambda: defaultdict(int)),     # team -> category -> plays
+        "seasons": defaultdict(lambda: defaultdict(int)),   # season -> category -> plays
+    }
+
+
+def merge_counts(total, partial):
+    total["total_plays"] += partial["total_plays"]
+    for key in ("words", "categories"):
+        for name, count in partial[key].items():
+            total[key][name] += count
+    for key in ("teams", "seasons"):
+        for group, categories in partial[key].items():
+            for category, count in categories.items():
+                total[key][group][category] += count
+
+
+def analyze_batch(docs):
+    """ Worker: count lexicon hits for a batch of PBP documents. """
+    matcher = get_matcher()
+    categories = matcher[2]
+    counts = new_counts()
+
+    for doc in docs:
+        response = doc.get("response", {})
+        season = season_of(response.get("game", {}).get("startTime")) or "UNKNOWN"
+
+        for play in response.get("plays", []):
+            counts["total_plays"] += 1
+            hits = match_description(play.get("description") or "", matcher)
+            if not hits:
+                continue
+
+            team = ((play.get("playStatus") or {}).get("teamInPossession") or {}).get("abbreviation", "UNKNOWN")
+            for word in hits:
+                counts["words"][word] += 1
+            for category in {categories[word] for word in hits}:
+                counts["categories"][category] += 1
+                counts["teams"][team][category] += 1
+                counts["seasons"][season][category] += 1
+
+    # defaultdict factories built from lambdas do not pickle back to the parent
+    return {
+        "total_plays": counts["total_plays"],
+        "words": dict(counts["words"]),
+        "categories": dict(counts["categories"]),
+        "teams": {team: dict(c) for team, c in counts["teams"].items()},
+        "seasons": {season: dict(c) for season, c in counts["seasons"].items()},
+    }
+
+
+def document_batches(cursor, batch_size=BATCH_SIZE):
+    batch = []
     for doc in cursor:
-        plays = doc.get("response", {}).get("plays", [])
-        
-        for play in plays:
-            description = play.get("description", "").lower()  # Normalize text
-            total_plays += 1
-
-            # Search for each lexicon category
-            for category, words in LEXICON.items():
-                for word in words:
-                    if re.search(rf"\b{word}\b", description):  # Match whole words
-                        word_counts[word] += 1
-
-    # Log total word counts
-    logging.info(f"✅ Total Plays Processed: {total_plays}")
-    logging.info(f"✅ Word Frequency Counts:")
-    for word, count in sorted(word_counts.items(), key=lambda x: x[1], reverse=True):
+        doc.pop("_id", None)
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Function to analyze play descriptions and log word frequency counts
+def analyze_pbp_descriptions(workers=WORKERS, batch_size=BATCH_SIZE):
+    client = get_mongo_client()
+    pbp_collection = client[DATABASE_NAME][PBP_COLLECTION]
+
+    counts = new_counts()
+    cursor = pbp_collection.find({}, PBP_PROJECTION)
+    with Pool(workers) as pool:
+        for partial in pool.imap_unordered(analyze_batch, document_batches(cursor, batch_size)):
+            merge_counts(counts, partial)
+
+    # Log totals
+    logging.info(f"✅ Total Plays Processed: {counts['total_plays']}")
+    logging.info("✅ Word Frequency Counts:")
+    for word, count in sorted(counts["words"].items(), key=lambda x: x[1], reverse=True):
         logging.info(f"   {word}: {count} occurrences")
 
-# Run the analysis
-analyze_pbp_descriptions()
+    logging.info("✅ Category Counts (plays):")
+    for category, count in sorted(counts["categories"].items(), key=lambda x: x[1], reverse=True):
+        logging.info(f"   {category}: {count} plays")
+
+    logging.info("✅ Category Counts by Team:")
+    for team in sorted(counts["teams"]):
+        summary = ", ".join(f"{c}: {n}" for c, n in sorted(counts["teams"][team].items()))
+        logging.info(f"   {team}: {summary}")
+
+    logging.info("✅ Category Counts by Season:")
+    for season in sorted(counts["seasons"], key=str):
+        summary = ", ".join(f"{c}: {n}" for c, n in sorted(counts["seasons"][season].items()))
+        logging.info(f"   {season}: {summary}")
+
+    return counts
+
+
+if __name__ == "__main__":
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=LOG_FILE,
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    # Run the analysis
+    analyze_pbp_descriptions()
@@ -1,108 +1,137 @@
-import os
 import sys
 import logging
-from pymongo import MongoClient
 from collections import defaultdict
-
-# Ensure logs directory exists
-LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# Setup logging
-log_filename = os.path.join(LOG_DIR, "roster_dedupe.log")
-logging.basicConfig(
-    filename=log_filename,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+from sal_config import get_mongo_db, setup_logging
 
 # MongoDB connection
-MONGO_URI = "mongodb://localhost:27017/"
 DB_NAME = "nfl-data"
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-rosters_collection = db["rosters"]
-schedules_collection = db["schedules"]
+SEASON_TYPES = ["PRE", "REG", "PST"]
+
 
 def get_expected_games(season_year):
     """
-    Get the expected number of games for PRE, REG, and PST from the schedules collection.
+    Scheduled game ids per season type, flattened and grouped on the server.
     """
-    expected_counts = {"PRE": 0, "REG": 0, "PST": 0}
-
-    # Query schedules collection for all season types for the given year
-    schedules = schedules_collection.find({"year": season_year}, {"_id": 0, "type": 1, "weeks": 1})
-
-    for schedule in schedules:
-        season_type = schedule.get("type", "UNKNOWN")
-        total_games = sum(len(week.get("games", [])) for week in schedule.get("weeks", []))  # Count all games in weeks
-
-        if season_type in expected_counts:
-            expected_counts[season_type] = total_games
+    pipeline = [
+        {"$match": {"year": season_year}},
+        {"$unwind": "$weeks"},
+        {"$unwind": "$weeks.games"},
+        {"$group": {"_id": {"$toUpper": "$type"}, "game_ids": {"$addToSet": "$weeks.games.id"}}},
+    ]
+    expected = {season_type: [] for season_type in SEASON_TYPES}
+    for group in get_mongo_db(DB_NAME)["schedules"].aggregate(pipeline):
+        expected[group["_id"]] = sorted(group["game_ids"])
+    return expected
+
+
+def find_missing_rosters(season_year):
+    """
+    Scheduled games with no roster document, joined against rosters by game id.
+    Only the matched roster _ids are carried through the join, never the roster bodies.
+    """
+    db = get_mongo_db(DB_NAME)
+    pipeline = [
+        {"$match": {"year": season_year}},
+        {"$unwind": "$weeks"},
+        {"$unwind": "$weeks.games"},
+        {"$project": {"_id": 0, "type": {"$toUpper": "$type"}, "game_id": "$weeks.games.id",
+                      "scheduled": "$weeks.games.scheduled"}},
+        {"$lookup": {
+            "from": "rosters",
+            "let": {"game_id": "$game_id"},
+            "pipeline": [{"$match": {"$expr": {"$eq": ["$id", "$$game_id"]}}}, {"$project": {"_id": 1}}],
+            "as": "rosters",
+        }},
+        {"$match": {"rosters": {"$size": 0}}},
+        {"$project": {"type": 1, "game_id": 1, "scheduled": 1}},
+        {"$sort": {"scheduled": 1}},
+    ]
+    return list(db["schedules"].aggregate(pipeline))
+
+
+def get_roster_summary(season_year):
+    """
+    Roster documents for the season grouped by type and event date, plus every game id
+    stored more than once.
+    """
+    rosters_collection = get_mongo_db(DB_NAME)["rosters"]
+    season_match = {"$match": {"summary.season.year": season_year}}
+    per_date = rosters_collection.aggregate([
+        season_match,
+        {"$group": {
+            "_id": {"type": {"$toUpper": {"$ifNull": ["$summary.season.type", "UNKNOWN"]}},
+                    "date": {"$substrCP": [{"$ifNull": ["$scheduled", ""]}, 0, 10]}},
+            "documents": {"$sum": 1},
+            "game_ids": {"$addToSet": "$id"},
+        }},
+        {"$project": {"_id": 0, "type": "$_id.type", "date": "$_id.date", "documents": 1,
+                      "games": {"$size": "$game_ids"}}},
+        {"$sort": {"date": 1, "type": 1}},
+    ])
+    duplicates = rosters_collection.aggregate([
+        season_match,
+        {"$group": {"_id": "$id", "documents": {"$sum": 1},
+                    "type": {"$first": {"$toUpper": "$summary.season.type"}}}},
+        {"$match": {"documents": {"$gt": 1}}},
+        {"$project": {"_id": 0, "game_id": "$_id", "type": 1, "documents": 1}},
+        {"$sort": {"game_id": 1}},
+    ])
+    return list(per_date), list(duplicates)
 
-    return expected_counts
 
 def validate_rosters(season_year):
     """
     Validate that all expected games have corresponding roster records.
+    Returns a report naming every missing and duplicated game id.
     """
     logging.info(f"Starting roster validation process for season {season_year}...")
 
-    # Fetch expected game counts from schedules
-    expected_counts = get_expected_games(season_year)
-
-    # Fetch all unique game IDs from the rosters collection
-    unique_games = {}
-    games_per_date = defaultdict(int)
-    unique_game_types = set()
-
-    for doc in rosters_collection.find({}, {"id": 1, "scheduled": 1, "summary.season.type": 1}):
-        game_id = doc.get("id")
-        scheduled_date = doc.get("scheduled")
-        game_type = doc.get("summary", {}).get("season", {}).get("type", "UNKNOWN")
+    # Serve the $lookup join and duplicate grouping, and each pipeline's season $match
+    db = get_mongo_db(DB_NAME)
+    db["rosters"].create_index("id")
+    db["rosters"].create_index("summary.season.year")
+    db["schedules"].create_index("year")
 
-        if scheduled_date:
-            scheduled_date = scheduled_date.split("T")[0]  # Extract only the date
-            games_per_date[scheduled_date] += 1
-
-        if game_id:
-            unique_games[game_id] = game_type
-            unique_game_types.add(game_type)
-
-    total_unique_games = len(unique_games)
-
-    logging.info(f"Total unique games found: {total_unique_games}")
-    logging.info(f"Total games missing scheduled date: {sum(1 for g in unique_games if g is None)}")
+    expected = get_expected_games(season_year)
+    missing = find_missing_rosters(season_year)
+    per_date, duplicates = get_roster_summary(season_year)
 
     logging.info("Games per event date:")
-    for date, count in sorted(games_per_date.items()):
-        logging.info(f"  {date}: {count} games")
+    for row in per_date:
+        logging.info(f"  {row['date'] or 'no date'} [{row['type']}]: {row['games']} games, {row['documents']} documents")
 
-    logging.info(f"Unique game types present: {', '.join(unique_game_types)}")
+    actual_counts = defaultdict(int)
+    for row in per_date:
+        actual_counts[row["type"]] += row["games"]
 
     # Compare expected vs. actual
-    logging.info("\nExpected vs. Actual Roster Counts:")
-    for season_type, expected_count in expected_counts.items():
-        logging.info(f"Unique game types present: {unique_game_types}")  # Shows detected game types
-        logging.info(f"Comparing against season type: {season_type}")   # Shows what we're checking
-
-        SEASON_TYPE_MAPPING = {"PRE": "pre", "REG": "reg", "PST": "pst"}
+    logging.info("Expected vs. Actual Roster Counts:")
+    for season_type in SEASON_TYPES:
+        logging.info(f"  {season_type}: Expected = {len(expected[season_type])}, Actual = {actual_counts[season_type]}")
 
-        actual_count = sum(
-            1 for game_id, game_type in unique_games.items() if game_type.lower() == SEASON_TYPE_MAPPING[season_type]
-        )
+    for game in missing:
+        logging.warning(f"Missing roster: {game['game_id']} ({game['type']}, scheduled {game.get('scheduled')})")
+    for game in duplicates:
+        logging.warning(f"Duplicate roster: {game['game_id']} ({game['type']}) stored {game['documents']} times")
 
-        logging.info(f"  {season_type}: Expected = {expected_count}, Actual = {actual_count}")
+    logging.info(f"Roster validation completed: {len(missing)} missing, {len(duplicates)} duplicated.")
+    return {
+        "season": season_year,
+        "expected": {season_type: len(ids) for season_type, ids in expected.items()},
+        "actual": dict(actual_counts),
+        "missing": [game["game_id"] for game in missing],
+        "duplicates": {game["game_id"]: game["documents"] for game in duplicates},
+    }
 
-    logging.info("Roster validation process completed.")
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python roster_dedupe.py <season_year>")
         sys.exit(1)
 
+    log_filename = setup_logging("roster_dedupe")
     season_year = int(sys.argv[1])
-    validate_rosters(season_year)
-    print(f"Roster validation completed. Logs saved to {log_filename}")
+    report = validate_rosters(season_year)
+    print(f"Roster validation completed: {len(report['missing'])} missing, "
+          f"{len(report['duplicates'])} duplicated. Logs saved to {log_filename}")
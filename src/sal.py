@@ -0,0 +1,130 @@
+import os
+import sys
+import runpy
+import shutil
+import argparse
+import subprocess
+import metrics
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommand -> (script in src/, help). Scripts are only loaded when their command runs,
+# so `sal.py analyze steam` never imports requests and `sal.py fetch ...` never imports scipy.
+COMMANDS = {
+    "fetch": {
+        "odds": ("get_msf_week_odds.py", "MSF season schedules and weekly odds (--manifest to refetch gaps)"),
+        "pbp": ("get_msf_season_pbp.py", "MSF season schedules and play-by-play (--manifest to refetch gaps)"),
+        "players": ("get_msf_players_data.py", "MSF players"),
+        "lineup": ("get_test_lineups.py", "MSF lineup for one game"),
+        "schedule": ("get_schedule.py", "Sportradar schedules and rosters (--manifest to refetch gaps)"),
+        "sportradar-pbp": ("get_pbp.py", "Sportradar play-by-play for a season"),
+        "game-stats": ("get_game_stats.py", "Sportradar statistics for one game"),
+        "teams": ("load_team_player.py", "Sportradar player profiles into Postgres"),
+        "event-odds": ("get_event_odds.py", "Odds API historical odds for one event"),
+        "historical-odds": ("main.py", "Odds API 4-hour snapshot window (1 <date>) or load it into Postgres (2 <date>)"),
+    },
+    "etl": {
+        "seasons": ("ETL_season_2_postgres.py", "Mongo seasons -> msf-nfl games"),
+        "odds": ("ETL_odds_2_postgres.py", "Mongo odds -> msf-nfl game_odds/odds (--changes-only to skip repeated quotes)"),
+        "pbp": ("ETL_pbp_2_postgres.py", "Mongo pbp -> msf-nfl plays"),
+        "opening-lines": ("opening_lines.py", "Refresh the opening_lines collection"),
+        "identity": ("game_identity.py", "Rebuild the cross-provider game_keys table"),
+        "partitions": ("odds_partitions.py", "Partition game_odds by month; detach or archive old seasons"),
+        "dead-letters": ("etl_batches.py", "List or replay rows the ETLs dead-lettered (list | replay <etl>)"),
+        "features": ("play_features.py", "Build the per-play feature matrix"),
+    },
+    "analyze": {
+        "lle": ("compute_LLE_HTest.py", "Opening vs closing moneyline hypothesis test"),
+        "odds-errors": ("analyze_ odds_errors.py", "Opening vs closing accuracy per book"),
+        "opening-moneyline": ("get_msf_odds_analysis.py", "Opening moneyline outcomes from Mongo"),
+        "steam": ("detect_steam_moves.py", "Steam moves across books"),
+        "lead-lag": ("book_lead_lag.py", "Which books move first"),
+        "arbitrage": ("scan_arbitrage.py", "Cross-book arbitrage opportunities"),
+        "completeness": ("data_completeness.py", "Gap manifest across Mongo and Postgres"),
+        "rosters": ("roster_dedupe.py", "Missing and duplicate Sportradar rosters"),
+        "pbp-text": ("review_msf_pbp.py", "Play description text patterns"),
+    },
+    "export": {
+        "opening-odds": ("extract_opening_odds.py", "Opening -150 moneylines"),
+        "game-states": ("game_state.py", "Per-play game state and drives"),
+        "player-stats": ("player_stats.py", "Per-game and season player stats"),
+        "sample-plays": ("extract_sample_plays.py", "Random sample of MSF plays"),
+    },
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sal", description="SAL platform command line.")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Time HTTP, JSON, Mongo, Postgres and logging; write FILE (.json, else Prometheus textfile) "
+                             "and print a summary")
+    parser.add_argument("--profile", metavar="FILE", help="Run the command under cProfile and save the stats to FILE")
+    parser.add_argument("--sample", metavar="FILE", help="Attach the py-spy sampling profiler (must be on PATH); "
+                                                         "flamegraph SVG written to FILE when the command exits")
+    groups = parser.add_subparsers(dest="group", metavar="<group>")
+    groups.required = True
+    for group, commands in COMMANDS.items():
+        group_parser = groups.add_parser(group, help=f"{group} commands")
+        subcommands = group_parser.add_subparsers(dest="command", metavar="<command>")
+        subcommands.required = True
+        for command, (script, description) in commands.items():
+            command_parser = subcommands.add_parser(command, help=description, add_help=False)
+            command_parser.add_argument("args", nargs=argparse.REMAINDER)
+            command_parser.set_defaults(script=script)
+    pipeline_parser = groups.add_parser("pipeline", help="Run the DAG of fetch/ETL/refresh stages", add_help=False)
+    pipeline_parser.add_argument("args", nargs=argparse.REMAINDER)
+    pipeline_parser.set_defaults(script="pipeline.py")
+    return parser
+
+
+def run_script(script, args):
+    """ Run a src/ script as __main__ with its own argv, so its argparse and --help work unchanged. """
+    path = os.path.join(SRC_DIR, script)
+    sys.argv = [path] + list(args)
+    runpy.run_path(path, run_name="__main__")
+
+
+def start_sampler(path):
+    """ py-spy follows this process from outside and writes its flamegraph once the process exits. """
+    executable = shutil.which("py-spy")
+    if executable is None:
+        return None
+    return subprocess.Popen([executable, "record", "--pid", str(os.getpid()), "--output", path, "--format", "flamegraph"],
+                            stdout=subprocess.DEVNULL)
+
+
+def profiled(path, script, args):
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(run_script, script, args)
+    finally:
+        profiler.dump_stats(path)
+        pstats.Stats(path, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+
+
+def main(argv=None):
+    parser = build_parser()
+    known, extra = parser.parse_known_args(argv)
+    if known.sample and start_sampler(known.sample) is None:
+        parser.error("--sample needs py-spy on PATH (pip install py-spy)")
+    if known.metrics:
+        metrics.enable()
+
+    command = " ".join(filter(None, [known.group, getattr(known, "command", None)]))
+    try:
+        with metrics.timer("command_seconds", command=command):
+            if known.profile:
+                profiled(known.profile, known.script, extra + known.args)
+            else:
+                run_script(known.script, extra + known.args)
+    finally:
+        if known.metrics:
+            metrics.write_metrics(known.metrics)
+            print(metrics.format_summary(), file=sys.stderr)
+            print(f"Metrics written to {known.metrics}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
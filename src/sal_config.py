@@ -0,0 +1,194 @@
+import os
+import socket
+import logging
+import ipaddress
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "logs")
+
+# Every setting can be overridden from .env or the process environment
+DEFAULTS = {
+    "MONGO_URI": "mongodb://localhost:27017/",
+    "MSF_MONGO_DB": "nfl-msf",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_DB": "SAL-db",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": None,
+    "PG_POOL_MIN": "1",
+    "PG_POOL_MAX": "8",
+    "MYSPORTSFEEDS_API_KEY": None,
+    "MSF_PASSWORD": "MYSPORTSFEEDS",
+    "MSF_BASE_URL": "https://api.mysportsfeeds.com/v2.1/pull/nfl/",
+    "SPORTRADAR_API_KEY": None,
+    "SPORTRADAR_BASE_URL": "https://api.sportradar.com/nfl/official/trial/v7/en",
+    "ODDS_API_KEY": None,
+    "ODDS_API_BASE_URL": "https://api.the-odds-api.com/v4",
+}
+
+_lock = threading.Lock()
+_settings = {}
+_overrides = {}
+_mongo_client = None
+_pg_pool = None
+
+
+def settings():
+    """ Settings resolved once per process: overrides, then the environment (.env loaded on first use), then DEFAULTS. """
+    if not _settings:
+        from dotenv import load_dotenv, find_dotenv
+        load_dotenv(find_dotenv())
+        resolved = {key: os.getenv(key, default) for key, default in DEFAULTS.items()}
+        resolved.update(_overrides)
+        _settings.update(resolved)
+    return _settings
+
+
+def setting(key):
+    return settings().get(key)
+
+
+def override_settings(**values):
+    """ Replace settings (e.g. a test database or a stub server's base URLs) and drop any open clients. """
+    _overrides.update(values)
+    _settings.clear()
+    close_connections()
+
+
+def msf_auth():
+    """ (api key, password) pair for MySportsFeeds basic auth. """
+    api_key = setting("MYSPORTSFEEDS_API_KEY")
+    if not api_key:
+        raise RuntimeError("MYSPORTSFEEDS_API_KEY is not set; add it to .env or the environment.")
+    return api_key, setting("MSF_PASSWORD")
+
+
+# --------------------------------------------------------------- MongoDB
+
+def get_mongo_client():
+    """ The process-wide MongoClient; pymongo pools its own sockets, so one client serves every script. """
+    global _mongo_client
+    if _mongo_client is None:
+        with _lock:
+            if _mongo_client is None:
+                from pymongo import MongoClient
+                _mongo_client = MongoClient(setting("MONGO_URI"))
+    return _mongo_client
+
+
+def get_mongo_db(name):
+    """ "nfl-msf" resolves to the MSF_MONGO_DB setting, so a benchmark can point every script at a scratch copy. """
+    if name == "nfl-msf":
+        name = setting("MSF_MONGO_DB")
+    return get_mongo_client()[name]
+
+
+def mongo_endpoints(uri):
+    """ (host, port) of every node a Mongo URI names. """
+    from pymongo.uri_parser import parse_uri
+    return parse_uri(uri)["nodelist"]
+
+
+# -------------------------------------------------------------- Instances
+
+def _addresses(host, port):
+    """ Addresses host:port resolves to; loopback and this machine's own addresses count as one "local". """
+    def resolve(name):
+        try:
+            return {info[4][0] for info in socket.getaddrinfo(name, None, proto=socket.IPPROTO_TCP)}
+        except (socket.gaierror, UnicodeError):
+            return {name}
+
+    own = resolve(socket.gethostname())
+    resolved = set()
+    for address in resolve(host):
+        try:
+            local = ipaddress.ip_address(address.split("%")[0]).is_loopback or address in own
+        except ValueError:
+            local = False
+        resolved.add(("local" if local else address, int(port)))
+    return resolved
+
+
+def same_instance(endpoints, other_endpoints):
+    """ True when any (host, port) of one list resolves to the same server as one of the other. """
+    resolved = set().union(*(_addresses(host, port) for host, port in endpoints))
+    return any(_addresses(host, port) & resolved for host, port in other_endpoints)
+
+
+# ------------------------------------------------------------ PostgreSQL
+
+def get_pg_pool():
+    """ Lazily created thread-safe psycopg2 pool shared by every stage in the process. """
+    global _pg_pool
+    if _pg_pool is None:
+        with _lock:
+            if _pg_pool is None:
+                from psycopg2.pool import ThreadedConnectionPool
+                from metrics import pg_cursor_factory
+                _pg_pool = ThreadedConnectionPool(
+                    int(setting("PG_POOL_MIN")),
+                    int(setting("PG_POOL_MAX")),
+                    host=setting("POSTGRES_HOST"),
+                    port=setting("POSTGRES_PORT"),
+                    database=setting("POSTGRES_DB"),
+                    user=setting("POSTGRES_USER"),
+                    password=setting("POSTGRES_PASSWORD"),
+                    cursor_factory=pg_cursor_factory(),
+                )
+    return _pg_pool
+
+
+def connect_db():
+    """ Borrow a Postgres connection from the pool; hand it back with release_db. """
+    return get_pg_pool().getconn()
+
+
+def release_db(conn):
+    """ Return a borrowed connection, rolling back anything left uncommitted. """
+    if conn.closed:
+        get_pg_pool().putconn(conn, close=True)
+        return
+    conn.rollback()
+    get_pg_pool().putconn(conn)
+
+
+@contextmanager
+def pg_connection():
+    """ Borrowed connection that commits on success and rolls back on error. """
+    conn = connect_db()
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        release_db(conn)
+
+
+def close_connections():
+    """ Close the shared Mongo client and every pooled Postgres connection. """
+    global _mongo_client, _pg_pool
+    with _lock:
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+        if _pg_pool is not None:
+            _pg_pool.closeall()
+            _pg_pool = None
+
+
+# --------------------------------------------------------------- Logging
+
+def setup_logging(name, level=logging.INFO):
+    """ Timestamped log file in logs/, configured by a script's main() rather than at import. """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    log_file = os.path.join(LOG_DIR, f"{name}_{timestamp}.log")
+    logging.basicConfig(
+        filename=log_file,
+        level=level,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+    return log_file
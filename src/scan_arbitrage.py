@@ -0,0 +1,341 @@
+import sys
+import json
+import heapq
+import logging
+import argparse
+from datetime import datetime, timedelta
+import metrics
+from export_data import export_data
+from sal_config import get_mongo_client, setup_logging
+
+
+# MongoDB Configuration
+DATABASE_NAME = "nfl-msf"
+ODDS_COLLECTION = "odds"
+
+# Scanner Configuration
+MAX_QUOTE_AGE_HOURS = 12    # Quotes older than this are not used to build a best price
+MIN_ARB_MARGIN = 0.0        # Report arbitrage only when 1 - sum(1/price) exceeds this
+MIN_MIDDLE_SIZE = 0.5       # Smallest middle window (points) worth reporting
+
+MSF_WAGER_TYPES = {
+    "moneyLines": ("moneyLine", "h2h"),
+    "pointSpreads": ("pointSpread", "spreads"),
+    "overUnders": ("overUnder", "totals"),
+}
+
+
+def american_to_decimal(american):
+    """ Convert an American price to a decimal price. """
+    if american is None:
+        return None
+    return 1 + (american / 100 if american > 0 else 100 / abs(american))
+
+
+def parse_time(value):
+    """ Parse the ISO timestamps used by MSF ('...000Z') and the Odds API ('...Z'). """
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+# ---------------------------------------------------------------------------
+# Quote sources. Each yields (time, event_key, market, book, outcome, decimal, point)
+# ---------------------------------------------------------------------------
+
+def msf_game_line_quotes(game_line):
+    """ Yield the quotes of one MSF gameLines entry in as-of-time order. """
+    game = game_line["game"]
+    event_key = (game["id"], game.get("awayTeamAbbreviation"), game.get("homeTeamAbbreviation"))
+    streams = []
+
+    for line in game_line.get("lines", []):
+        book = line["source"]["name"]
+        for wager_key, (item_key, market) in MSF_WAGER_TYPES.items():
+            stream = []
+            for wager in line.get(wager_key, []):
+                item = wager[item_key]
+                if item.get("gameSegment") != "FULL":
+                    continue
+                as_of = parse_time(wager["asOfTime"])
+                if market == "h2h":
+                    legs = [("home", item["homeLine"], None), ("away", item["awayLine"], None),
+                            ("draw", item.get("drawLine") or {}, None)]
+                elif market == "spreads":
+                    legs = [("home", item["homeLine"], item["homeSpread"]),
+                            ("away", item["awayLine"], item["awaySpread"])]
+                else:
+                    legs = [("over", item["overLine"], item["overUnder"]),
+                            ("under", item["underLine"], item["overUnder"])]
+                for outcome, price, point in legs:
+                    decimal = price.get("decimal") or american_to_decimal(price.get("american"))
+                    if decimal:
+                        stream.append((as_of, event_key, market, book, outcome, decimal, point))
+            stream.sort(key=lambda q: q[0])
+            streams.append(stream)
+
+    return heapq.merge(*streams, key=lambda q: q[0])
+
+
+def msf_document_quotes(odds_doc):
+    """ Time-ordered quotes for every game in one MSF odds_gamelines response. """
+    response = odds_doc.get("response", odds_doc)
+    return heapq.merge(*(msf_game_line_quotes(gl) for gl in response.get("gameLines", [])),
+                       key=lambda q: q[0])
+
+
+def odds_api_snapshot_quotes(snapshots):
+    """ Quotes from a process_json style file: {timestamp: {sport: {"data": [events]}}}. """
+    for ts in sorted(snapshots):
+        snapshot_time = parse_time(ts)
+        for sport_content in snapshots[ts].values():
+            for event in sport_content.get("data", []):
+                event_key = (event["id"], event["away_team"], event["home_team"])
+                sides = {event["home_team"]: "home", event["away_team"]: "away", "Draw": "draw"}
+                for bookmaker in event.get("bookmakers", []):
+                    book = bookmaker.get("title", "Unknown Book")
+                    for market in bookmaker.get("markets", []):
+                        key = market.get("key")
+                        if key not in ("h2h", "spreads", "totals"):
+                            continue
+                        for outcome in market.get("outcomes", []):
+                            name = outcome.get("name")
+                            side = name.lower() if key == "totals" else sides.get(name)
+                            decimal = american_to_decimal(outcome.get("price"))
+                            if side and decimal:
+                                yield (snapshot_time, event_key, key, book, side, decimal, outcome.get("point"))
+
+
+# ---------------------------------------------------------------------------
+# Best-price book with lazily invalidated max-heaps
+# ---------------------------------------------------------------------------
+
+def new_scanner_state(max_quote_age_hours=MAX_QUOTE_AGE_HOURS):
+    return {
+        "max_age": timedelta(hours=max_quote_age_hours),
+        "current": {},       # (event, market, book, outcome) -> (decimal, point, time)
+        "price_heaps": {},   # (arb_key, outcome) -> heap of (-decimal, book, time)
+        "point_heaps": {},   # (event, market, outcome) -> heap of (-point_score, -decimal, book, time)
+        "open": {},          # opportunity key -> open opportunity dict
+        "closed": [],
+    }
+
+
+def arb_key(event_key, market, outcome, point):
+    """ Arbitrage only pairs outcomes quoted on the same line. """
+    if market == "h2h":
+        return (event_key, market, None)
+    if market == "spreads":
+        return (event_key, market, point if outcome == "home" else -point)
+    return (event_key, market, point)
+
+
+def point_score(market, outcome, point):
+    """ Larger is better for the bettor: more points on a spread, lower over, higher under. """
+    if market == "totals" and outcome == "over":
+        return -point
+    return point
+
+
+def apply_quote(state, quote):
+    """ Record a quote; superseded heap entries are left in place and skipped on read. """
+    as_of, event_key, market, book, outcome, decimal, point = quote
+    state["current"][(event_key, market, book, outcome)] = (decimal, point, as_of)
+    heapq.heappush(state["price_heaps"].setdefault((arb_key(event_key, market, outcome, point), outcome), []),
+                   (-decimal, book, as_of))
+    if market != "h2h" and point is not None:
+        heapq.heappush(state["point_heaps"].setdefault((event_key, market, outcome), []),
+                       (-point_score(market, outcome, point), -decimal, book, as_of))
+
+
+def _is_live(state, event_key, market, book, outcome, as_of, now):
+    current = state["current"].get((event_key, market, book, outcome))
+    return current is not None and current[2] == as_of and now - as_of <= state["max_age"]
+
+
+def best_price(state, key, outcome, now):
+    """ Best live decimal price for an outcome on a line, popping stale entries. """
+    heap = state["price_heaps"].get((key, outcome))
+    event_key, market, line = key
+    while heap:
+        neg_decimal, book, as_of = heap[0]
+        if _is_live(state, event_key, market, book, outcome, as_of, now):
+            current = state["current"][(event_key, market, book, outcome)]
+            if arb_key(event_key, market, outcome, current[1]) == key:
+                return -neg_decimal, book, as_of
+        heapq.heappop(heap)
+    return None
+
+
+def best_point(state, event_key, market, outcome, now):
+    """ Most favorable live point for an outcome across books. """
+    heap = state["point_heaps"].get((event_key, market, outcome))
+    while heap:
+        neg_score, neg_decimal, book, as_of = heap[0]
+        if _is_live(state, event_key, market, book, outcome, as_of, now):
+            return state["current"][(event_key, market, book, outcome)][1], -neg_decimal, book, as_of
+        heapq.heappop(heap)
+    return None
+
+
+def find_opportunities(state, event_key, market, lines, now):
+    """ Evaluate arbitrage on every touched line and middles for the market. """
+    found = {}
+    for line in lines:
+        key = (event_key, market, line)
+        outcomes = {"h2h": ["home", "away", "draw"], "spreads": ["home", "away"],
+                    "totals": ["over", "under"]}[market]
+        legs = {o: best_price(state, key, o, now) for o in outcomes}
+        if market == "h2h" and legs["draw"] is None:
+            legs.pop("draw")
+        if any(leg is None for leg in legs.values()):
+            continue
+        margin = 1 - sum(1 / leg[0] for leg in legs.values())
+        if margin > MIN_ARB_MARGIN:
+            kind = f"arb_{len(legs)}way"
+            found[(kind, key)] = {
+                "type": kind, "size": round(margin, 6),
+                "expires_at": min(leg[2] for leg in legs.values()) + state["max_age"],
+                "legs": {o: {"book": leg[1], "decimal": round(leg[0], 4)} for o, leg in legs.items()},
+            }
+
+    if market in ("spreads", "totals"):
+        first, second = ("home", "away") if market == "spreads" else ("over", "under")
+        a = best_point(state, event_key, market, first, now)
+        b = best_point(state, event_key, market, second, now)
+        if a and b:
+            size = a[0] + b[0] if market == "spreads" else b[0] - a[0]
+            if size >= MIN_MIDDLE_SIZE:
+                key = (event_key, market, None)
+                found[("middle", key)] = {
+                    "type": "middle", "size": size,
+                    "expires_at": min(a[3], b[3]) + state["max_age"],
+                    "legs": {first: {"book": a[2], "point": a[0], "decimal": round(a[1], 4)},
+                             second: {"book": b[2], "point": b[0], "decimal": round(b[1], 4)}},
+                }
+    return found
+
+
+def close_opportunity(state, opp_key, end_time, still_open=False):
+    opp = state["open"].pop(opp_key)
+    # Without a quote in between, the opportunity lasted at most until its oldest leg went stale
+    opp["ended_at"] = min(end_time, opp.pop("expires_at"))
+    opp["duration_minutes"] = round((opp["ended_at"] - opp["started_at"]).total_seconds() / 60, 2)
+    opp["still_open"] = still_open
+    state["closed"].append(opp)
+
+
+def evaluate(state, touched, now):
+    """ Re-check every market touched at `now` plus the ones with open opportunities. """
+    markets = {}
+    for event_key, market, line in touched:
+        markets.setdefault((event_key, market), set()).add(line)
+    for kind, (event_key, market, line) in state["open"]:
+        lines = markets.setdefault((event_key, market), set())
+        if kind != "middle":
+            lines.add(line)
+
+    for (event_key, market), lines in markets.items():
+        found = find_opportunities(state, event_key, market, lines, now)
+
+        for opp_key in [k for k in state["open"] if k[1][0] == event_key and k[1][1] == market]:
+            if opp_key not in found:
+                close_opportunity(state, opp_key, now)
+
+        for opp_key, opp in found.items():
+            if opp_key in state["open"]:
+                current = state["open"][opp_key]
+                current["max_size"] = max(current["max_size"], opp["size"])
+                current["last_seen"] = now
+                current["expires_at"] = opp["expires_at"]
+                continue
+            event_id, away, home = event_key
+            state["open"][opp_key] = {
+                "event_id": event_id, "away_team": away, "home_team": home, "market": market,
+                "line": opp_key[1][2], "type": opp["type"], "size": opp["size"], "max_size": opp["size"],
+                "legs": json.dumps(opp["legs"]), "started_at": now, "last_seen": now,
+                "expires_at": opp["expires_at"],
+            }
+
+
+def sweep(state, quotes):
+    """ Single pass over time-ordered quotes, evaluating after each distinct timestamp. """
+    touched = set()
+    now = None
+    count = 0
+    for quote in quotes:
+        if now is not None and quote[0] != now:
+            evaluate(state, touched, now)
+            touched = set()
+        now = quote[0]
+        apply_quote(state, quote)
+        touched.add(arb_key(quote[1], quote[2], quote[4], quote[6]))
+        count += 1
+    if now is not None:
+        evaluate(state, touched, now)
+        for opp_key in list(state["open"]):
+            close_opportunity(state, opp_key, now, still_open=True)
+    return count
+
+
+def scan_msf_season(season_year, season_type):
+    """ Scan every stored MSF odds week for a season, one week document at a time. """
+    client = get_mongo_client()
+    odds_collection = client[DATABASE_NAME][ODDS_COLLECTION]
+    state = new_scanner_state()
+    total = 0
+    cursor = odds_collection.find({"season": season_year, "season_type": season_type}).sort("week", 1)
+    while True:
+        with metrics.timer("analysis_phase_seconds", analysis="scan_arbitrage", phase="load"):
+            odds_doc = next(cursor, None)
+        if odds_doc is None:
+            break
+        with metrics.timer("analysis_phase_seconds", analysis="scan_arbitrage", phase="compute"):
+            quotes = sweep(state, msf_document_quotes(odds_doc))
+        total += quotes
+        logging.info(f"Week {odds_doc.get('week')}: {quotes} quotes, {len(state['closed'])} opportunities so far")
+    logging.info(f"Scanned {total} MSF quotes for {season_year} {season_type}")
+    return state["closed"]
+
+
+def scan_files(paths, source):
+    """ Scan saved MSF odds_gamelines or Odds API snapshot JSON files. """
+    state = new_scanner_state()
+    for path in paths:
+        with metrics.timer("analysis_phase_seconds", analysis="scan_arbitrage", phase="load"):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        with metrics.timer("analysis_phase_seconds", analysis="scan_arbitrage", phase="compute"):
+            quotes = msf_document_quotes(data) if source == "msf" else odds_api_snapshot_quotes(data)
+            swept = sweep(state, quotes)
+        logging.info(f"{path}: {swept} quotes")
+    return state["closed"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan historical odds for cross-book arbitrage and middles.")
+    sub = parser.add_subparsers(dest="source", required=True)
+    season = sub.add_parser("msf", help="Scan the MSF odds collection in MongoDB")
+    season.add_argument("season", type=int)
+    season.add_argument("season_type", help="preseason | regular | playoff")
+    files = sub.add_parser("file", help="Scan saved JSON files")
+    files.add_argument("format", choices=["msf", "oddsapi"])
+    files.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    setup_logging("scan_arbitrage")
+
+    if args.source == "msf":
+        opportunities = scan_msf_season(args.season, args.season_type)
+        name = f"arbitrage_{args.season}_{args.season_type}"
+    else:
+        opportunities = scan_files(args.paths, args.format)
+        name = "arbitrage_files"
+
+    if not opportunities:
+        print("No arbitrage or middle opportunities found.")
+        sys.exit(0)
+    with metrics.timer("analysis_phase_seconds", analysis="scan_arbitrage", phase="export"):
+        export_data(opportunities, name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+import os
+import copy
+import json
+import math
+import uuid
+import random
+import logging
+import argparse
+from fractions import Fraction
+from datetime import datetime, timedelta, timezone
+from game_identity import TEAM_NAMES, msf_game_slug, game_date
+from sal_config import get_mongo_db, mongo_endpoints, override_settings, same_instance, setting, setup_logging
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "synthetic")
+
+# Recorded MSF games whose plays are resampled into synthetic play-by-play
+PBP_TEMPLATES = ["playbyplay_20240905-BAL-KC.json", "playbyplay_20240906-GB-PHI.json"]
+
+# MSF sources and their Odds API bookmaker keys
+BOOKS = [
+    {"name": "Bovada", "region": "Americas", "isOnlineSportsbook": True, "isLasVegas": False, "key": "bovada"},
+    {"name": "DraftKings", "region": "Americas", "isOnlineSportsbook": True, "isLasVegas": False, "key": "draftkings"},
+    {"name": "FanDuel", "region": "Americas", "isOnlineSportsbook": True, "isLasVegas": False, "key": "fanduel"},
+    {"name": "BetMGM", "region": "Americas", "isOnlineSportsbook": True, "isLasVegas": False, "key": "betmgm"},
+    {"name": "Caesars", "region": "Americas", "isOnlineSportsbook": True, "isLasVegas": True, "key": "williamhill_us"},
+    {"name": "BetRivers", "region": "Americas", "isOnlineSportsbook": True, "isLasVegas": False, "key": "betrivers"},
+    {"name": "Westgate", "region": "Americas", "isOnlineSportsbook": False, "isLasVegas": True, "key": "westgate"},
+    {"name": "Circa", "region": "Americas", "isOnlineSportsbook": False, "isLasVegas": True, "key": "circasports"},
+]
+
+# Market shape
+HOME_FIELD = 1.8          # Points
+MARGIN_SD = 13.5          # NFL final margin vs the closing spread
+VIG = 0.045               # Overround on two-way markets
+MARKET_OPENS_DAYS = 10    # Lines are quoted from this many days before kickoff
+KICKOFF_SLOTS_ET = [(13, 0), (16, 5), (16, 25), (20, 20)]  # Sunday windows (hour, minute)
+
+# Team and venue ids start here so they never collide with real MSF ids
+SYNTHETIC_ID_BASE = 900000
+
+# Scratch database synthetic documents are loaded into; never the live nfl-msf
+BENCH_DATABASE = "nfl-msf-bench"
+
+
+def normal_cdf(x):
+    return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+
+def poisson(rng, mean):
+    """ Knuth's method; the means used here are small (touchdowns and field goals per team). """
+    limit, k, p = math.exp(-mean), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def price(probability):
+    """ MSF-style american/decimal/fractional prices for an implied probability. """
+    probability = min(max(probability, 0.02), 0.98)
+    if probability >= 0.5:
+        american = -int(round(100 * probability / (1 - probability)))
+        payout = Fraction(100, -american)
+    else:
+        american = int(round(100 * (1 - probability) / probability))
+        payout = Fraction(american, 100)
+    payout = payout.limit_denominator(100)
+    return {"american": american, "decimal": round(1 + float(payout), 2),
+            "fractional": f"{payout.numerator}/{payout.denominator}"}
+
+
+def two_way(probability):
+    """ Both sides of a two-way market with the book's overround split evenly. """
+    return price(probability + VIG / 2), price(1 - probability + VIG / 2)
+
+
+def iso(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+# ----------------------------------------------------------------- Teams
+
+def build_teams(rng):
+    """ The 32 clubs with a synthetic id, venue and power rating (points vs an average team). """
+    teams = {}
+    for i, abbreviation in enumerate(sorted(TEAM_NAMES)):
+        full_name = TEAM_NAMES[abbreviation][0]
+        teams[abbreviation] = {
+            "id": SYNTHETIC_ID_BASE + i,
+            "abbreviation": abbreviation,
+            "name": full_name,
+            "venue": {"id": SYNTHETIC_ID_BASE + i, "name": f"{full_name} Stadium"},
+            "rating": rng.gauss(0, 3.5),
+        }
+    return teams
+
+
+def season_opener(season):
+    """ Kickoff Thursday: the Thursday after Labor Day (the first Monday of September). """
+    day = datetime(season, 9, 1)
+    while day.weekday() != 0:
+        day += timedelta(days=1)
+    return day + timedelta(days=3)
+
+
+def kickoff_utc(day, hour, minute):
+    # September-December kickoffs straddle the DST change; 4 or 5 hours is close enough for fixtures
+    offset = 4 if day.month < 11 else 5
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=timezone.utc) + timedelta(hours=offset)
+
+
+def sample_points(rng, mean):
+    """ A team's final score as touchdowns and field goals, so totals land on football numbers. """
+    mean = max(mean, 3.0)
+    touchdowns = poisson(rng, mean * 0.72 / 7)
+    field_goals = poisson(rng, mean * 0.28 / 3)
+    return 7 * touchdowns + 3 * field_goals - (1 if touchdowns and rng.random() < 0.06 else 0)
+
+
+def generate_schedule(season, teams, rng, weeks=18, games_per_week=16, first_game_id=None):
+    """ MSF games.json 'games' entries for a regular season: schedule, weather and final score. """
+    abbreviations = sorted(teams)
+    games = []
+    game_id = first_game_id or SYNTHETIC_ID_BASE + season * 1000
+    thursday = season_opener(season)
+    for week in range(1, weeks + 1):
+        rng.shuffle(abbreviations)
+        pairs = [(abbreviations[i], abbreviations[i + 1]) for i in range(0, len(abbreviations) - 1, 2)]
+        for slot, (away, home) in enumerate(pairs[:games_per_week]):
+            if slot == 0:
+                start = kickoff_utc(thursday + timedelta(weeks=week - 1), 20, 20)
+            else:
+                hour, minute = KICKOFF_SLOTS_ET[(slot - 1) % len(KICKOFF_SLOTS_ET)]
+                start = kickoff_utc(thursday + timedelta(weeks=week - 1, days=3), hour, minute)
+            spread = teams[home]["rating"] - teams[away]["rating"] + HOME_FIELD
+            total = rng.gauss(44.5, 3.5)
+            home_score = sample_points(rng, total / 2 + spread / 2)
+            away_score = sample_points(rng, total / 2 - spread / 2)
+            fahrenheit = int(rng.gauss(72 - 3 * week, 9))
+            mph = max(0, int(rng.gauss(8, 4)))
+            games.append({
+                "schedule": {
+                    "id": game_id,
+                    "week": week,
+                    "startTime": iso(start),
+                    "endedTime": iso(start + timedelta(minutes=rng.randint(175, 215))),
+                    "awayTeam": {"id": teams[away]["id"], "abbreviation": away},
+                    "homeTeam": {"id": teams[home]["id"], "abbreviation": home},
+                    "venue": teams[home]["venue"],
+                    "venueAllegiance": "HOME",
+                    "scheduleStatus": "NORMAL",
+                    "originalStartTime": None,
+                    "delayedOrPostponedReason": None,
+                    "playedStatus": "COMPLETED",
+                    "attendance": rng.randint(60000, 80000),
+                    "weather": {
+                        "type": rng.choice(["CLEAR_SKY", "FEW_CLOUDS", "OVERCAST", "LIGHT_RAIN"]),
+                        "description": "synthetic",
+                        "wind": {"speed": {"milesPerHour": mph, "kilometersPerHour": int(mph * 1.609)},
+                                 "direction": {"degrees": rng.randint(0, 359), "label": "N"}},
+                        "temperature": {"fahrenheit": fahrenheit, "celsius": int((fahrenheit - 32) / 1.8)},
+                        "humidityPercent": rng.randint(20, 95),
+                    },
+                },
+                "score": {"awayScoreTotal": away_score, "homeScoreTotal": home_score},
+                "_market": {"spread": spread, "total": total},
+            })
+            game_id += 1
+    return games
+
+
+# ------------------------------------------------------------------ Odds
+
+def market_path(rng, game, quotes):
+    """ Consensus spread/total at each quote time: a random walk that settles on the closing number. """
+    start = datetime.fromisoformat(game["schedule"]["startTime"].replace("Z", "+00:00"))
+    opened = start - timedelta(days=MARKET_OPENS_DAYS)
+    times = sorted(opened + timedelta(seconds=rng.uniform(0, MARKET_OPENS_DAYS * 86400)) for _ in range(quotes))
+    spread, total = game["_market"]["spread"] + rng.gauss(0, 1.5), game["_market"]["total"] + rng.gauss(0, 1.5)
+    path = []
+    for as_of in times:
+        spread += rng.choice([0, 0, 0, 0.5, -0.5])
+        total += rng.choice([0, 0, 0, 0.5, -0.5])
+        path.append((as_of, spread, total))
+    return path
+
+
+def msf_book_line(rng, game, book, quotes):
+    """ One MSF source's moneyLines/pointSpreads/overUnders history for a game. """
+    line = {"source": {k: book[k] for k in ("name", "region", "isOnlineSportsbook", "isLasVegas")},
+            "moneyLines": [], "pointSpreads": [], "overUnders": [], "futures": [], "props": []}
+    shade = rng.choice([0, 0, 0.5, -0.5])
+    for as_of, spread, total in market_path(rng, game, quotes):
+        spread_line = round((spread + shade) * 2) / 2
+        total_line = round(total * 2) / 2
+        home_prob = normal_cdf(spread_line / MARGIN_SD)
+        home_ml, away_ml = two_way(home_prob)
+        home_spread_price, away_spread_price = two_way(0.5 + rng.gauss(0, 0.015))
+        over, under = two_way(0.5 + rng.gauss(0, 0.015))
+        as_of_time = iso(as_of)
+        line["moneyLines"].append({"asOfTime": as_of_time, "moneyLine": {
+            "gameSegment": "FULL", "awayLine": away_ml, "homeLine": home_ml,
+            "drawLine": {"american": None, "decimal": None, "fractional": None}}})
+        line["pointSpreads"].append({"asOfTime": as_of_time, "pointSpread": {
+            "gameSegment": "FULL", "awaySpread": spread_line, "awayLine": away_spread_price,
+            "homeSpread": -spread_line, "homeLine": home_spread_price}})
+        line["overUnders"].append({"asOfTime": as_of_time, "overUnder": {
+            "gameSegment": "FULL", "overUnder": total_line, "overLine": over, "underLine": under}})
+    return line
+
+
+def generate_week_odds(rng, games, week, books, quotes_per_book):
+    """ MSF odds_gamelines response for one week. """
+    game_lines = []
+    for game in games:
+        schedule = game["schedule"]
+        if schedule["week"] != week:
+            continue
+        game_lines.append({
+            "game": {"id": schedule["id"], "week": week, "startTime": schedule["startTime"],
+                     "awayTeamAbbreviation": schedule["awayTeam"]["abbreviation"],
+                     "homeTeamAbbreviation": schedule["homeTeam"]["abbreviation"]},
+            "lines": [msf_book_line(rng, game, book, quotes_per_book) for book in books],
+        })
+    return {"lastUpdatedOn": iso(datetime.now(timezone.utc)), "gameLines": game_lines, "references": {}}
+
+
+def odds_api_event(rng, game, teams, books, snapshot):
+    """ Odds API event with h2h/spreads/totals per bookmaker as quoted at a snapshot time. """
+    schedule = game["schedule"]
+    home, away = teams[schedule["homeTeam"]["abbreviation"]], teams[schedule["awayTeam"]["abbreviation"]]
+    spread = game["_market"]["spread"]
+    bookmakers = []
+    for book in books:
+        spread_line = round((spread + rng.choice([0, 0, 0.5, -0.5])) * 2) / 2
+        total_line = round(game["_market"]["total"] * 2) / 2
+        home_ml, away_ml = two_way(normal_cdf(spread_line / MARGIN_SD))
+        last_update = iso(snapshot - timedelta(seconds=rng.randint(5, 900))).replace(".000Z", "Z")
+        bookmakers.append({"key": book["key"], "title": book["name"], "last_update": last_update, "markets": [
+            {"key": "h2h", "last_update": last_update, "outcomes": [
+                {"name": home["name"], "price": home_ml["american"]},
+                {"name": away["name"], "price": away_ml["american"]}]},
+            {"key": "spreads", "last_update": last_update, "outcomes": [
+                {"name": home["name"], "price": -110, "point": -spread_line},
+                {"name": away["name"], "price": -110, "point": spread_line}]},
+            {"key": "totals", "last_update": last_update, "outcomes": [
+                {"name": "Over", "price": -110, "point": total_line},
+                {"name": "Under", "price": -110, "point": total_line}]},
+        ]})
+    return {"id": uuid.UUID(int=rng.getrandbits(128)).hex, "sport_key": "americanfootball_nfl", "sport_title": "NFL",
+            "commence_time": schedule["startTime"].replace(".000Z", "Z"),
+            "home_team": home["name"], "away_team": away["name"], "bookmakers": bookmakers}
+
+
+def generate_odds_api_window(rng, games, teams, books, date_str):
+    """
+    The {snapshot time: {"nfl": snapshot}} file main.py writes for a 12:00-16:00Z window,
+    covering every game in the week that contains date_str.
+    """
+    day = datetime.fromisoformat(date_str)
+    week_games = [g for g in games
+                  if 0 <= (datetime.fromisoformat(g["schedule"]["startTime"][:10]) - day).days < 7]
+    snapshots = {}
+    for hour in range(12, 17):
+        snapshot = datetime(day.year, day.month, day.day, hour, tzinfo=timezone.utc)
+        key = snapshot.strftime("%Y-%m-%dT%H:%M:%SZ")
+        snapshots[key] = {"nfl": {
+            "timestamp": key,
+            "previous_timestamp": (snapshot - timedelta(minutes=5)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "next_timestamp": (snapshot + timedelta(minutes=5)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "data": [odds_api_event(rng, game, teams, books, snapshot) for game in week_games],
+        }}
+    return snapshots
+
+
+# ---------------------------------------------------------- Play-by-play
+
+def load_templates():
+    templates = []
+    for name in PBP_TEMPLATES:
+        path = os.path.join(FIXTURE_DIR, name)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                templates.append(json.load(f))
+    if not templates:
+        raise FileNotFoundError(f"No play-by-play templates found in {FIXTURE_DIR}")
+    return templates
+
+
+def _remap_teams(value, mapping):
+    """ Point every {"id", "abbreviation"} team reference of the template game at the synthetic teams. """
+    if isinstance(value, dict):
+        if "abbreviation" in value and value.get("id") in mapping:
+            value.update(mapping[value["id"]])
+        for item in value.values():
+            _remap_teams(item, mapping)
+    elif isinstance(value, list):
+        for item in value:
+            _remap_teams(item, mapping)
+
+
+def generate_playbyplay(rng, game, templates):
+    """ MSF playbyplay response: a recorded game's plays, re-labelled with this game's teams. """
+    template = rng.choice(templates)
+    schedule = game["schedule"]
+    mapping = {
+        template["game"]["awayTeam"]["id"]: dict(schedule["awayTeam"]),
+        template["game"]["homeTeam"]["id"]: dict(schedule["homeTeam"]),
+    }
+    plays = copy.deepcopy(template["plays"])
+    _remap_teams(plays, mapping)
+    header = {k: v for k, v in schedule.items() if k != "weather"}
+    return {"lastUpdatedOn": iso(datetime.now(timezone.utc)), "game": header, "plays": plays, "references": {}}
+
+
+# --------------------------------------------------------------- Dataset
+
+def generate_dataset(seasons, weeks=18, games_per_week=16, books=len(BOOKS), quotes_per_book=24,
+                     pbp_games=32, seed=2024):
+    """
+    Mongo-ready documents at the requested scale: seasons (games.json), odds (one per week),
+    pbp and one Odds API snapshot window per season. The same seed always yields the same data.
+    """
+    rng = random.Random(seed)
+    teams = build_teams(rng)
+    book_list = BOOKS[:books]
+    templates = load_templates() if pbp_games else []
+    dataset = {"seasons": [], "odds": [], "pbp": [], "odds_api": {}}
+    for season in seasons:
+        games = generate_schedule(season, teams, rng, weeks, games_per_week)
+        dataset["seasons"].append({"season": str(season), "season_type": "regular", "response": {
+            "lastUpdatedOn": iso(datetime.now(timezone.utc)),
+            "games": [{k: v for k, v in game.items() if k != "_market"} for game in games],
+        }})
+        for week in range(1, weeks + 1):
+            # Field types as each fetcher stores them: get_msf_week_odds writes seasons docs with a
+            # str season and odds docs with an int one
+            dataset["odds"].append({"season": season, "season_type": "regular", "week": week,
+                                    "response": generate_week_odds(rng, games, week, book_list, quotes_per_book)})
+        for game in games[:pbp_games]:
+            schedule = game["schedule"]
+            slug = msf_game_slug(schedule["startTime"], schedule["awayTeam"]["abbreviation"],
+                                 schedule["homeTeam"]["abbreviation"])
+            dataset["pbp"].append({"game_id": slug, "response": generate_playbyplay(rng, game, templates)})
+        opener = game_date(games[0]["schedule"]["startTime"])
+        date_str = f"{opener[:4]}-{opener[4:6]}-{opener[6:]}"
+        dataset["odds_api"][date_str] = generate_odds_api_window(rng, games, teams, book_list, date_str)
+    return dataset
+
+
+def dataset_counts(dataset):
+    """ Rows each loader should produce from a dataset, used as the benchmark's rows/sec numerator. """
+    games = sum(len(doc["response"]["games"]) for doc in dataset["seasons"])
+    game_odds = odds = 0
+    for doc in dataset["odds"]:
+        for game_line in doc["response"]["gameLines"]:
+            for line in game_line["lines"]:
+                game_odds += len(line["moneyLines"]) + len(line["pointSpreads"]) + len(line["overUnders"])
+                odds += 2 * (len(line["moneyLines"]) + len(line["pointSpreads"]) + len(line["overUnders"]))
+    plays = sum(len(doc["response"]["plays"]) for doc in dataset["pbp"])
+    outcomes = sum(len(market["outcomes"])
+                   for window in dataset["odds_api"].values() for snapshot in window.values()
+                   for sport in snapshot.values() for event in sport["data"]
+                   for bookmaker in event["bookmakers"] for market in bookmaker["markets"])
+    return {"games": games, "game_odds": game_odds, "odds": odds, "plays": plays, "odds_api_outcomes": outcomes}
+
+
+def load_into_mongo(dataset, database=BENCH_DATABASE):
+    """ Replace the seasons/odds/pbp collections of a scratch database with the dataset. """
+    if database == "nfl-msf":
+        raise ValueError("Refusing to replace collections in nfl-msf; load synthetic data into a scratch database.")
+    db = get_mongo_db(database)
+    for collection in ("seasons", "odds", "pbp"):
+        db[collection].drop()
+        if dataset[collection]:
+            db[collection].insert_many(copy.deepcopy(dataset[collection]))
+        logging.info(f"Loaded {len(dataset[collection])} synthetic documents into {database}.{collection}")
+
+
+def write_files(dataset, output_dir=OUTPUT_DIR):
+    """ Write the dataset in the same shapes as the recorded fixtures in data/. """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {"odds_api": []}
+    for doc in dataset["seasons"]:
+        path = os.path.join(output_dir, f"games_{doc['season']}-{doc['season_type']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc["response"], f)
+    for doc in dataset["odds"]:
+        path = os.path.join(output_dir, f"odds_{doc['season']}-{doc['season_type']}_week{doc['week']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc["response"], f)
+    for doc in dataset["pbp"]:
+        with open(os.path.join(output_dir, f"playbyplay_{doc['game_id']}.json"), "w", encoding="utf-8") as f:
+            json.dump(doc["response"], f)
+    for date_str, window in dataset["odds_api"].items():
+        path = os.path.join(output_dir, f"historical_4hr_window_{date_str}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(window, f)
+        paths["odds_api"].append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic MSF and Odds API data at a configurable scale.")
+    parser.add_argument("--seasons", type=int, nargs="+", default=[2024])
+    parser.add_argument("--weeks", type=int, default=18)
+    parser.add_argument("--games-per-week", type=int, default=16)
+    parser.add_argument("--books", type=int, default=len(BOOKS), choices=range(1, len(BOOKS) + 1))
+    parser.add_argument("--quotes", type=int, default=24, help="Quotes per book per market per game")
+    parser.add_argument("--pbp-games", type=int, default=32, help="Games per season with play-by-play")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--output", default=OUTPUT_DIR, help="Directory for the JSON files")
+    parser.add_argument("--mongo-uri", help="Also load the documents into this (scratch) Mongo instance")
+    parser.add_argument("--database", default=BENCH_DATABASE, help="Scratch database to load into with --mongo-uri")
+    args = parser.parse_args()
+
+    if args.mongo_uri:
+        if args.database == "nfl-msf":
+            parser.error("Refusing to load synthetic data into nfl-msf; pick a scratch --database.")
+        if same_instance(mongo_endpoints(args.mongo_uri), mongo_endpoints(setting("MONGO_URI"))):
+            parser.error("Refusing to load synthetic data into the configured Mongo instance; point at a scratch one.")
+
+    setup_logging("synthetic_data")
+    dataset = generate_dataset(args.seasons, args.weeks, args.games_per_week, args.books, args.quotes,
+                               args.pbp_games, args.seed)
+    write_files(dataset, args.output)
+    if args.mongo_uri:
+        override_settings(MONGO_URI=args.mongo_uri)
+        load_into_mongo(dataset, args.database)
+
+    for name, count in dataset_counts(dataset).items():
+        print(f"{name:>18}: {count}")
+    print(f"Synthetic files written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()